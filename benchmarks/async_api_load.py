@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Sync vs async chat JSON API under concurrent load
+
+Usage:
+  python benchmarks/async_api_load.py --concurrency 32 --duration 5
+  python benchmarks/async_api_load.py --endpoints conversations,search --concurrency 64
+
+Builds a throwaway SQLite database with --users users, each with a private
+conversation holding --messages messages with user 0, starts `daphne` on
+`coony.asgi:application` and, for every endpoint, hammers the sync view
+(`chat/api/...`) and then its async twin (`chat/async/api/...`) with
+--concurrency keep-alive HTTP/1.1 clients for --duration seconds each, all
+logged in as user 0. Reports requests/second, latency percentiles and non-2xx
+responses per run.
+"""
+import argparse
+import asyncio
+import json
+import os
+import secrets
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENDPOINTS = {
+    # name: (method, sync path, async path, body)
+    'conversations': ('GET', '/chat/api/conversations/', '/chat/async/api/conversations/', None),
+    'messages': ('GET', '/chat/api/conversations/{cid}/messages/?limit=50',
+                 '/chat/async/api/conversations/{cid}/messages/?limit=50', None),
+    'search': ('GET', '/chat/api/search/?q=bench', '/chat/async/api/search/?q=bench', None),
+    'send': ('POST', '/chat/api/conversations/{cid}/messages/send/',
+             '/chat/async/api/conversations/{cid}/messages/send/', {'text': 'carga'}),
+}
+
+
+def _env(db_path):
+    env = dict(os.environ)
+    env.update({
+        'DJANGO_SETTINGS_MODULE': 'coony.settings',
+        # Writers take the lock up front and wait for it, as in send_message_load.py.
+        'DATABASE_URL': f'sqlite:///{db_path}?timeout=30&transaction_mode=IMMEDIATE',
+        'DJANGO_DEBUG': 'False',
+        'PYTHONPATH': ROOT,
+    })
+    return env
+
+
+def _prepare(db_path, users, messages):
+    os.environ.update(_env(db_path))
+    sys.path.insert(0, ROOT)
+    import django
+    django.setup()
+    from django.contrib.sessions.backends.db import SessionStore
+    from django.core.management import call_command
+    from django.db import connection
+    from usuarios.models import Conversation, Message, Usuario
+
+    call_command('migrate', verbosity=0)
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA journal_mode=wal')
+    me = Usuario.objects.create(nome='Bench Eu', telefone='0', email='eu@bench.local', senha='x')
+    first = None
+    for index in range(users):
+        other = Usuario.objects.create(
+            nome=f'Bench Pessoa {index}', telefone='0', email=f'p{index}@bench.local', senha='x'
+        )
+        conversation = Conversation.get_or_create_private(me, other)
+        Message.objects.bulk_create([
+            Message(conversation=conversation, autor=other if seq % 2 else me, texto=f'mensagem {seq}')
+            for seq in range(messages)
+        ])
+        conversation.record_message(Message.objects.filter(conversation=conversation).latest('id'))
+        first = first or conversation.pk
+    session = SessionStore()
+    session['usuario_id'] = me.pk
+    session.create()
+    return session.session_key, first
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _start_server(db_path, port):
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'daphne', '-b', '127.0.0.1', '-p', str(port), '-v', '0', 'coony.asgi:application'],
+        cwd=ROOT, env=_env(db_path), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise SystemExit('daphne did not start')
+
+
+async def _request(reader, writer, method, path, headers, body):
+    lines = [f'{method} {path} HTTP/1.1', *headers]
+    if body is not None:
+        lines += ['Content-Type: application/json', f'Content-Length: {len(body)}']
+    writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode() + (body or b''))
+    await writer.drain()
+
+    status_line = await reader.readline()
+    status = int(status_line.split()[1])
+    length, chunked = 0, False
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        name = name.strip().lower()
+        if name == 'content-length':
+            length = int(value)
+        elif name == 'transfer-encoding' and 'chunked' in value.lower():
+            chunked = True
+    if chunked:
+        while True:
+            size = int((await reader.readline()).strip(), 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    else:
+        await reader.readexactly(length)
+    return status
+
+
+async def _client(port, method, path, headers, body, stop_at, latencies, failures):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    try:
+        while time.perf_counter() < stop_at:
+            started = time.perf_counter()
+            status = await _request(reader, writer, method, path, headers, body)
+            latencies.append(time.perf_counter() - started)
+            if status >= 300:
+                failures.append(status)
+    finally:
+        writer.close()
+
+
+async def _run(port, method, path, body, session_key, concurrency, duration):
+    csrf = secrets.token_hex(16)
+    headers = [
+        f'Host: 127.0.0.1:{port}',
+        f'Cookie: sessionid={session_key}; csrftoken={csrf}',
+        f'X-CSRFToken: {csrf}',
+        'Connection: keep-alive',
+    ]
+    payload = json.dumps(body).encode() if body is not None else None
+    latencies, failures = [], []
+    started = time.perf_counter()
+    stop_at = started + duration
+    await asyncio.gather(*(
+        _client(port, method, path, headers, payload, stop_at, latencies, failures)
+        for _ in range(concurrency)
+    ))
+    return latencies, failures, time.perf_counter() - started
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[position]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=5, help='seconds per endpoint and variant')
+    parser.add_argument('--users', type=int, default=50, help='conversations in the inbox')
+    parser.add_argument('--messages', type=int, default=200, help='messages per conversation')
+    parser.add_argument('--endpoints', default=','.join(ENDPOINTS))
+    options = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='coony-bench-')
+    db_path = os.path.join(workdir, 'bench.sqlite3')
+    session_key, conversation_id = _prepare(db_path, options.users, options.messages)
+    port = _free_port()
+    server = _start_server(db_path, port)
+    try:
+        print(f'server       : daphne, sqlite (wal), {options.concurrency} clients x {options.duration:g}s')
+        print(f'{"endpoint":<14} {"variant":<6} {"req/s":>8} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"errors":>7}')
+        for name in options.endpoints.split(','):
+            method, sync_path, async_path, body = ENDPOINTS[name]
+            for variant, path in (('sync', sync_path), ('async', async_path)):
+                latencies, failures, elapsed = asyncio.run(_run(
+                    port, method, path.format(cid=conversation_id), body,
+                    session_key, options.concurrency, options.duration,
+                ))
+                print('{:<14} {:<6} {:>8,.0f} {:>8.1f} {:>8.1f} {:>8.1f} {:>7}'.format(
+                    name, variant, len(latencies) / elapsed,
+                    _percentile(latencies, 50) * 1000,
+                    _percentile(latencies, 95) * 1000,
+                    _percentile(latencies, 99) * 1000,
+                    len(failures),
+                ))
+                if failures:
+                    print(f'{"":<14} statuses: {sorted(set(failures))}')
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Channel layer fan-out benchmark
+
+Usage:
+  python benchmarks/channel_fanout.py --workers 4 --connections 25 --messages 500
+
+Spawns several worker processes, each loading the Coony settings with
+CHANNEL_LAYER_URL pointing at a shared Redis (the in-process stand-in from
+`coony.fake_redis` unless --redis-url is given). Every worker opens
+--connections channels in one group, the way each user's ChatConsumer sockets
+join their `user_<id>` group (`usuarios.realtime.user_group_name`), and the
+parent process publishes to that group. Reports
+delivery latency percentiles and deliveries/second across all workers.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GROUP = 'bench_fanout'
+
+
+def _setup_django(redis_url):
+    sys.path.insert(0, ROOT)
+    os.environ['DJANGO_SETTINGS_MODULE'] = 'coony.settings'
+    os.environ['CHANNEL_LAYER_URL'] = redis_url
+    import django
+    django.setup()
+    from channels.layers import get_channel_layer
+    return get_channel_layer()
+
+
+def _worker(index, redis_url, connections, ready, results):
+    layer = _setup_django(redis_url)
+
+    async def consume(channel):
+        latencies = []
+        first = last = None
+        while True:
+            message = await layer.receive(channel)
+            now = time.time()
+            if message['type'] == 'bench.stop':
+                return latencies, first, last
+            latencies.append(now - message['sent_at'])
+            first = first or now
+            last = now
+
+    async def run():
+        channels = []
+        for _ in range(connections):
+            channel = await layer.new_channel()
+            await layer.group_add(GROUP, channel)
+            channels.append(channel)
+        # Subscriptions are confirmed asynchronously; give them a moment to land.
+        await asyncio.sleep(0.5)
+        ready.put(index)
+        outcome = await asyncio.gather(*(consume(channel) for channel in channels))
+        latencies = [value for item in outcome for value in item[0]]
+        firsts = [item[1] for item in outcome if item[1]]
+        lasts = [item[2] for item in outcome if item[2]]
+        results.put({
+            'worker': index,
+            'latencies': latencies,
+            'first': min(firsts) if firsts else None,
+            'last': max(lasts) if lasts else None,
+        })
+
+    asyncio.run(run())
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[position]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--connections', type=int, default=25, help='group members per worker')
+    parser.add_argument('--messages', type=int, default=500)
+    parser.add_argument('--rate', type=float, default=0, help='messages/second to publish (0 = as fast as possible)')
+    parser.add_argument('--redis-url', default='', help='use a real Redis instead of the in-process stand-in')
+    options = parser.parse_args()
+
+    fake_server = None
+    redis_url = options.redis_url
+    if not redis_url:
+        sys.path.insert(0, ROOT)
+        from coony.fake_redis import FakeRedisServer
+        fake_server = FakeRedisServer().start_in_thread()
+        redis_url = fake_server.url
+
+    ctx = multiprocessing.get_context('spawn')
+    ready, results = ctx.Queue(), ctx.Queue()
+    processes = [
+        ctx.Process(target=_worker, args=(i, redis_url, options.connections, ready, results))
+        for i in range(options.workers)
+    ]
+    for process in processes:
+        process.start()
+    for _ in processes:
+        ready.get(timeout=60)
+
+    layer = _setup_django(redis_url)
+    interval = 1 / options.rate if options.rate else 0
+
+    async def publish():
+        started = time.time()
+        for seq in range(options.messages):
+            await layer.group_send(GROUP, {'type': 'bench.message', 'seq': seq, 'sent_at': time.time()})
+            if interval:
+                await asyncio.sleep(interval)
+        await layer.group_send(GROUP, {'type': 'bench.stop'})
+        return started, time.time()
+
+    started, published = asyncio.run(publish())
+    reports = [results.get(timeout=120) for _ in processes]
+    for process in processes:
+        process.join(timeout=10)
+    if fake_server:
+        fake_server.stop_thread()
+
+    latencies = [value for report in reports for value in report['latencies']]
+    expected = options.workers * options.connections * options.messages
+    finished = max((report['last'] or published) for report in reports)
+    elapsed = max(finished - started, 1e-9)
+
+    print(f'backend      : {redis_url}{" (fake)" if fake_server else ""}')
+    print(f'workers      : {options.workers} x {options.connections} connections')
+    print(f'published    : {options.messages} msgs in {published - started:.3f}s')
+    print(f'delivered    : {len(latencies)}/{expected}')
+    print(f'throughput   : {len(latencies) / elapsed:,.0f} deliveries/s')
+    if latencies:
+        print('latency (ms) : p50={:.2f} p95={:.2f} p99={:.2f} max={:.2f} mean={:.2f}'.format(
+            _percentile(latencies, 50) * 1000,
+            _percentile(latencies, 95) * 1000,
+            _percentile(latencies, 99) * 1000,
+            max(latencies) * 1000,
+            statistics.mean(latencies) * 1000,
+        ))
+    for report in sorted(reports, key=lambda item: item['worker']):
+        print(f'  worker {report["worker"]}: {len(report["latencies"])} deliveries')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Send-message write throughput on SQLite
+
+Usage:
+  python benchmarks/send_message_load.py --workers 4 --conversations 4 --messages 500
+  python benchmarks/send_message_load.py --mode legacy   # the pre-coalescing write path
+
+Builds a throwaway SQLite database (WAL journal unless --journal delete) with
+the Coony schema, then spawns --workers processes that each send --messages
+messages round-robin into --conversations shared conversations, the way
+`chat_send_message_api` does: insert the message and move the conversation's
+preview pointer in one transaction. Every --delete-every'th operation is a
+delete-for-everyone, which bumps `Conversation.updated_at`.
+
+`--mode current` uses `Conversation.record_message`/`touch` (one UPDATE each,
+touches coalesced within `Conversation.TOUCH_WINDOW`); `--mode legacy` replays
+the old path that reloaded the conversation and saved it once for the pointer
+and again for the touch. Reports operations/second, latency percentiles and
+how many operations hit "database is locked".
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _setup_django(db_path):
+    sys.path.insert(0, ROOT)
+    os.environ['DJANGO_SETTINGS_MODULE'] = 'coony.settings'
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    import django
+    django.setup()
+    from django.db import connections
+    options = connections.settings['default'].setdefault('OPTIONS', {})
+    options['timeout'] = 30
+    options['transaction_mode'] = 'IMMEDIATE'
+
+
+def _prepare(db_path, journal, conversations):
+    _setup_django(db_path)
+    from django.core.management import call_command
+    from django.db import connection
+    from usuarios.models import Conversation, Usuario
+
+    call_command('migrate', verbosity=0)
+    with connection.cursor() as cursor:
+        cursor.execute(f'PRAGMA journal_mode={journal}')
+    ids = []
+    for index in range(conversations):
+        alice = Usuario.objects.create(nome=f'Bench A{index}', telefone='0', email=f'a{index}@bench.local', senha='x')
+        bob = Usuario.objects.create(nome=f'Bench B{index}', telefone='0', email=f'b{index}@bench.local', senha='x')
+        ids.append((Conversation.get_or_create_private(alice, bob).pk, alice.pk))
+    return ids
+
+
+def _send_current(conversation, autor_id, text):
+    from django.db import transaction
+    from usuarios.models import Message
+
+    with transaction.atomic():
+        message = Message.objects.create(conversation=conversation, autor_id=autor_id, texto=text)
+        conversation.record_message(message)
+    return message
+
+
+def _send_legacy(conversation, autor_id, text):
+    from django.db import transaction
+    from django.utils import timezone
+    from usuarios.models import Conversation, Message
+
+    with transaction.atomic():
+        conversation = Conversation.objects.get(pk=conversation.pk)
+        message = Message.objects.create(conversation=conversation, autor_id=autor_id, texto=text)
+        conversation.last_message = message
+        conversation.last_message_at = message.created_at
+        conversation.save(update_fields=['last_message', 'last_message_at', 'updated_at'])
+    conversation.updated_at = timezone.now()
+    conversation.save(update_fields=['updated_at'])
+    return message
+
+
+def _delete_for_all(conversation, message, legacy):
+    from django.db import transaction
+    from django.utils import timezone
+
+    message.deleted_for_everyone = True
+    message.deleted_for_everyone_at = timezone.now()
+    if legacy:
+        message.save(update_fields=['deleted_for_everyone', 'deleted_for_everyone_at'])
+        conversation.updated_at = timezone.now()
+        conversation.save(update_fields=['updated_at'])
+        return
+    with transaction.atomic():
+        message.save(update_fields=['deleted_for_everyone', 'deleted_for_everyone_at'])
+        conversation.touch()
+
+
+def _worker(index, db_path, targets, options, results):
+    _setup_django(db_path)
+    from django.db import OperationalError
+    from usuarios.models import Conversation
+
+    legacy = options['mode'] == 'legacy'
+    send = _send_legacy if legacy else _send_current
+    conversations = [(Conversation.objects.get(pk=pk), autor_id) for pk, autor_id in targets]
+    latencies, locked = [], 0
+    first = time.time()
+    for seq in range(options['messages']):
+        conversation, autor_id = conversations[(index + seq) % len(conversations)]
+        started = time.perf_counter()
+        try:
+            message = send(conversation, autor_id, f'worker {index} msg {seq}')
+            if options['delete_every'] and seq % options['delete_every'] == 0:
+                _delete_for_all(conversation, message, legacy)
+        except OperationalError:
+            locked += 1
+            continue
+        latencies.append(time.perf_counter() - started)
+    results.put({'worker': index, 'latencies': latencies, 'locked': locked, 'first': first, 'last': time.time()})
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[position]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--conversations', type=int, default=4, help='shared conversations (fewer = hotter rows)')
+    parser.add_argument('--messages', type=int, default=500, help='messages sent by each worker')
+    parser.add_argument('--delete-every', type=int, default=10, help='delete-for-everyone every N sends (0 = never)')
+    parser.add_argument('--mode', choices=['current', 'legacy'], default='current')
+    parser.add_argument('--journal', choices=['wal', 'delete'], default='wal')
+    options = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='coony-bench-')
+    db_path = os.path.join(workdir, 'bench.sqlite3')
+    targets = _prepare(db_path, options.journal, options.conversations)
+
+    ctx = multiprocessing.get_context('spawn')
+    results = ctx.Queue()
+    worker_options = {'mode': options.mode, 'messages': options.messages, 'delete_every': options.delete_every}
+    processes = [
+        ctx.Process(target=_worker, args=(i, db_path, targets, worker_options, results))
+        for i in range(options.workers)
+    ]
+    for process in processes:
+        process.start()
+    reports = [results.get(timeout=600) for _ in processes]
+    elapsed = max(max(r['last'] for r in reports) - min(r['first'] for r in reports), 1e-9)
+    for process in processes:
+        process.join(timeout=10)
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    latencies = [value for report in reports for value in report['latencies']]
+    locked = sum(report['locked'] for report in reports)
+    print(f'database     : sqlite (journal={options.journal})')
+    print(f'mode         : {options.mode}')
+    print(f'workers      : {options.workers} x {options.messages} msgs over {options.conversations} conversations')
+    print(f'completed    : {len(latencies)} ops, {locked} locked')
+    print(f'throughput   : {len(latencies) / elapsed:,.0f} ops/s')
+    if latencies:
+        print('latency (ms) : p50={:.2f} p95={:.2f} p99={:.2f} max={:.2f} mean={:.2f}'.format(
+            _percentile(latencies, 50) * 1000,
+            _percentile(latencies, 95) * 1000,
+            _percentile(latencies, 99) * 1000,
+            max(latencies) * 1000,
+            statistics.mean(latencies) * 1000,
+        ))
+
+
+if __name__ == '__main__':
+    main()
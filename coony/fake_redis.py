@@ -0,0 +1,350 @@
+"""In-process stand-in for a Redis server, limited to pub/sub and plain string keys.
+
+It speaks enough of RESP2/RESP3 for ``channels_redis.pubsub.RedisPubSubChannelLayer``
+(PUBLISH/SUBSCRIBE/UNSUBSCRIBE plus the handshake commands redis-py sends) and for
+Django's ``RedisCache`` (GET/SET/MGET/DEL/EXISTS/INCRBY/EXPIRE and MULTI/EXEC
+pipelines), so tests and the fan-out benchmark can exercise a real multi-process
+channel layer and shared cache without a Redis install. Keys live in memory with
+lazy expiry; it is not meant for production.
+
+Run it standalone with ``python -m coony.fake_redis --port 6379``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+
+def _encode(value, protocol: int = 2) -> bytes:
+    if value is None:
+        return b'_\r\n' if protocol == 3 else b'$-1\r\n'
+    if isinstance(value, dict):
+        return b'%%%d\r\n' % len(value) + b''.join(
+            _encode(k, protocol) + _encode(v, protocol) for k, v in value.items()
+        )
+    if isinstance(value, int):
+        return b':%d\r\n' % value
+    if isinstance(value, str):
+        value = value.encode()
+    if isinstance(value, bytes):
+        return b'$%d\r\n%s\r\n' % (len(value), value)
+    if isinstance(value, (list, tuple)):
+        return b'*%d\r\n' % len(value) + b''.join(_encode(item, protocol) for item in value)
+    raise TypeError(f'Cannot encode {value!r}')
+
+
+OK = b'+OK\r\n'
+NOT_AN_INTEGER = b'-ERR value is not an integer or out of range\r\n'
+
+
+class _Client:
+    def __init__(self, server: 'FakeRedisServer', writer: asyncio.StreamWriter):
+        self.server = server
+        self.writer = writer
+        self.channels: Set[bytes] = set()
+        self.patterns: Set[bytes] = set()
+        self.protocol = 2
+        self.transaction: Optional[List[List[bytes]]] = None
+        self.captured: Optional[List[bytes]] = None
+
+    def write(self, data: bytes):
+        if self.captured is not None:
+            self.captured.append(data)  # a reply inside EXEC
+        elif not self.writer.is_closing():
+            self.writer.write(data)
+
+    def push(self, items: list):
+        """Pub/sub frames are plain arrays in RESP2 and push ('>') frames in RESP3."""
+        frame = _encode(items, self.protocol)
+        if self.protocol == 3:
+            frame = b'>' + frame[1:]
+        self.write(frame)
+
+    @property
+    def subscription_count(self) -> int:
+        return len(self.channels) + len(self.patterns)
+
+
+class FakeRedisServer:
+    """Asyncio TCP server implementing the Redis pub/sub subset."""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0):
+        self.host = host
+        self.port = port
+        self._server: Optional[asyncio.base_events.Server] = None
+        self._subscribers: Dict[bytes, Set[_Client]] = {}
+        self._clients: Set[_Client] = set()
+        self._handlers: Set[asyncio.Task] = set()
+        self._keys: Dict[bytes, Tuple[bytes, Optional[float]]] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.published = 0
+
+    @property
+    def url(self) -> str:
+        return f'redis://{self.host}:{self.port}/0'
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self._server is None:
+            return
+        self._server.close()
+        for client in list(self._clients):
+            client.writer.close()
+        # Connection handlers may still be parked on a read; finish them before the loop closes.
+        handlers = list(self._handlers)
+        for task in handlers:
+            task.cancel()
+        await asyncio.gather(*handlers, return_exceptions=True)
+        await self._server.wait_closed()
+        self._server = None
+
+    def start_in_thread(self) -> 'FakeRedisServer':
+        """Serve from a daemon thread with its own loop; returns once listening."""
+        ready = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._loop.run_until_complete(self.start())
+            ready.set()
+            self._loop.run_forever()
+            self._loop.run_until_complete(self.stop())
+            self._loop.close()
+
+        self._thread = threading.Thread(target=run, name='fake-redis', daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self
+
+    def stop_thread(self):
+        if self._loop and self._thread:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        client = _Client(self, writer)
+        self._clients.add(client)
+        task = asyncio.current_task()
+        self._handlers.add(task)
+        try:
+            while True:
+                command = await self._read_command(reader)
+                if command is None:
+                    break
+                if not command:
+                    continue
+                if not self._dispatch(client, command):
+                    break
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            pass  # stop(); returning normally keeps the stream callback from re-raising it
+        finally:
+            self._handlers.discard(task)
+            self._drop(client)
+            writer.close()
+
+    async def _read_command(self, reader: asyncio.StreamReader) -> Optional[List[bytes]]:
+        line = await reader.readline()
+        if not line:
+            return None
+        line = line.rstrip(b'\r\n')
+        if not line.startswith(b'*'):
+            return line.split()  # inline command, e.g. from telnet/redis-cli
+        args = []
+        for _ in range(int(line[1:])):
+            header = (await reader.readline()).rstrip(b'\r\n')
+            size = int(header[1:])
+            data = await reader.readexactly(size + 2)
+            args.append(data[:-2])
+        return args
+
+    def _dispatch(self, client: _Client, command: List[bytes]) -> bool:
+        name = command[0].upper()
+        args = command[1:]
+        if client.transaction is not None and name not in {b'MULTI', b'EXEC', b'DISCARD'}:
+            client.transaction.append(command)
+            client.write(b'+QUEUED\r\n')
+            return True
+        reply = self._run_key_command(name, args, client.protocol)
+        if reply is not None:
+            client.write(reply)
+        elif name == b'MULTI':
+            client.transaction = []
+            client.write(OK)
+        elif name == b'EXEC':
+            if client.transaction is None:
+                client.write(b'-ERR EXEC without MULTI\r\n')
+                return True
+            queued, client.transaction = client.transaction, None
+            client.captured = []
+            for queued_command in queued:
+                self._dispatch(client, queued_command)
+            replies, client.captured = client.captured, None
+            client.write(b'*%d\r\n' % len(replies) + b''.join(replies))
+        elif name == b'DISCARD':
+            client.transaction = None
+            client.write(OK)
+        elif name == b'PING':
+            if client.subscription_count and client.protocol == 2:
+                client.write(_encode([b'pong', args[0] if args else b'']))
+            else:
+                client.write(_encode(args[0]) if args else b'+PONG\r\n')
+        elif name == b'HELLO':
+            if args:
+                client.protocol = 3 if args[0] == b'3' else 2
+            info = {b'server': b'redis', b'version': b'7.2.0', b'proto': client.protocol,
+                    b'id': id(client), b'mode': b'standalone', b'role': b'master', b'modules': []}
+            if client.protocol == 3:
+                client.write(_encode(info))
+            else:
+                client.write(_encode([item for pair in info.items() for item in pair]))
+        elif name == b'ECHO':
+            client.write(_encode(args[0]))
+        elif name in {b'SELECT', b'CLIENT'}:
+            client.write(OK)
+        elif name in {b'FLUSHALL', b'FLUSHDB'}:
+            self._keys.clear()
+            client.write(OK)
+        elif name == b'RESET':
+            self._drop(client)
+            client.channels.clear()
+            client.patterns.clear()
+            client.protocol = 2
+            self._clients.add(client)
+            client.write(b'+RESET\r\n')
+        elif name == b'QUIT':
+            client.write(OK)
+            return False
+        elif name == b'PUBLISH':
+            client.write(_encode(self.publish(args[0], args[1])))
+        elif name == b'SUBSCRIBE':
+            for channel in args:
+                client.channels.add(channel)
+                self._subscribers.setdefault(channel, set()).add(client)
+                client.push([b'subscribe', channel, client.subscription_count])
+        elif name == b'UNSUBSCRIBE':
+            targets = args or sorted(client.channels)
+            for channel in targets:
+                client.channels.discard(channel)
+                self._subscribers.get(channel, set()).discard(client)
+                client.push([b'unsubscribe', channel, client.subscription_count])
+            if not targets:
+                client.push([b'unsubscribe', None, client.subscription_count])
+        elif name == b'PSUBSCRIBE':
+            for pattern in args:
+                client.patterns.add(pattern)
+                client.push([b'psubscribe', pattern, client.subscription_count])
+        elif name == b'PUNSUBSCRIBE':
+            for pattern in (args or sorted(client.patterns)):
+                client.patterns.discard(pattern)
+                client.push([b'punsubscribe', pattern, client.subscription_count])
+        else:
+            client.write(b"-ERR unknown command '%s'\r\n" % command[0])
+        return True
+
+    def _lookup(self, key: bytes) -> Optional[bytes]:
+        entry = self._keys.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._keys[key]
+            return None
+        return value
+
+    def _run_key_command(self, name: bytes, args: List[bytes], protocol: int) -> Optional[bytes]:
+        """Reply to a string-keyspace command, or None when `name` is not one."""
+        def encode(value):
+            return _encode(value, protocol)
+
+        if name == b'GET':
+            return encode(self._lookup(args[0]))
+        if name == b'MGET':
+            return encode([self._lookup(key) for key in args])
+        if name == b'SET':
+            key, value, options = args[0], args[1], [option.upper() for option in args[2:]]
+            exists = self._lookup(key) is not None
+            if (b'NX' in options and exists) or (b'XX' in options and not exists):
+                return encode(None)
+            expires_at = None
+            for unit, scale in ((b'EX', 1.0), (b'PX', 0.001)):
+                if unit in options:
+                    expires_at = time.monotonic() + int(args[2 + options.index(unit) + 1]) * scale
+            self._keys[key] = (value, expires_at)
+            return OK
+        if name == b'MSET':
+            for key, value in zip(args[::2], args[1::2]):
+                self._keys[key] = (value, None)
+            return OK
+        if name in {b'INCR', b'DECR', b'INCRBY', b'DECRBY'}:
+            key = args[0]
+            try:
+                delta = int(args[1]) if len(args) > 1 else 1
+                current = int(self._lookup(key) or 0)
+            except ValueError:
+                return NOT_AN_INTEGER
+            value = current - delta if name.startswith(b'DECR') else current + delta
+            expires_at = self._keys[key][1] if key in self._keys else None
+            self._keys[key] = (b'%d' % value, expires_at)
+            return encode(value)
+        if name == b'DEL':
+            removed = 0
+            for key in args:
+                if self._lookup(key) is not None:
+                    del self._keys[key]
+                    removed += 1
+            return encode(removed)
+        if name == b'EXISTS':
+            return encode(sum(self._lookup(key) is not None for key in args))
+        if name in {b'EXPIRE', b'PERSIST'}:
+            value = self._lookup(args[0])
+            if value is None:
+                return encode(0)
+            self._keys[args[0]] = (value, time.monotonic() + int(args[1]) if name == b'EXPIRE' else None)
+            return encode(1)
+        return None
+
+    def publish(self, channel: bytes, payload: bytes) -> int:
+        self.published += 1
+        receivers = 0
+        for subscriber in list(self._subscribers.get(channel, ())):
+            subscriber.push([b'message', channel, payload])
+            receivers += 1
+        return receivers
+
+    def _drop(self, client: _Client):
+        self._clients.discard(client)
+        for channel in client.channels:
+            self._subscribers.get(channel, set()).discard(client)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the in-process Redis pub/sub stand-in.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=6379)
+    options = parser.parse_args()
+
+    async def serve():
+        server = FakeRedisServer(options.host, options.port)
+        await server.start()
+        print(f'Fake Redis listening on {server.url}')
+        await asyncio.Event().wait()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
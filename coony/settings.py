@@ -99,6 +99,11 @@ DATABASES = {
     )
 }
 
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    # A file rather than the in-memory default, so tests that open connections
+    # from several threads (PrivateConversationConcurrencyTests) share one database.
+    DATABASES['default'].setdefault('TEST', {}).setdefault('NAME', str(BASE_DIR / 'test_db.sqlite3'))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -147,11 +152,63 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
-CHANNEL_LAYERS = {
-    'default': {
-        'BACKEND': 'channels.layers.InMemoryChannelLayer',
-    },
-}
+# Channel layers
+# Point CHANNEL_LAYER_URL (or REDIS_URL) at a redis:// server so every ASGI worker
+# shares the realtime groups; without it events only reach sockets in this process.
+# `python -m coony.fake_redis` provides a local pub/sub stand-in for development.
+CHANNEL_LAYER_URL = os.environ.get('CHANNEL_LAYER_URL') or os.environ.get('REDIS_URL', '')
+CHANNEL_LAYER_BACKEND = os.environ.get(
+    'CHANNEL_LAYER_BACKEND',
+    'channels_redis.pubsub.RedisPubSubChannelLayer',
+)
+
+if CHANNEL_LAYER_URL:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': CHANNEL_LAYER_BACKEND,
+            'CONFIG': {
+                'hosts': [CHANNEL_LAYER_URL],
+                'prefix': os.environ.get('CHANNEL_LAYER_PREFIX', 'coony'),
+            },
+        },
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        },
+    }
+
+# The default cache holds state every worker must agree on (usuarios.counters), so
+# it lives in the same Redis as the channel layer whenever one is configured.
+if CHANNEL_LAYER_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CHANNEL_LAYER_URL,
+            'KEY_PREFIX': os.environ.get('CHANNEL_LAYER_PREFIX', 'coony'),
+        },
+    }
+
+# Realtime events are sent after commit (usuarios.dispatch). With a Redis layer a
+# background thread coalesces events arriving within BROADCAST_COALESCE_MS per
+# user group; 'inline' sends from the commit hook ('auto' picks by layer type).
+BROADCAST_DISPATCH = os.environ.get('BROADCAST_DISPATCH', 'auto')
+BROADCAST_COALESCE_MS = float(os.environ.get('BROADCAST_COALESCE_MS', '5'))
+
+# Seconds a logged-in user's snapshot stays in the per-process cache
+# (usuarios.user_cache); saves/deletes invalidate it immediately.
+USUARIO_CACHE_TTL = int(os.environ.get('USUARIO_CACHE_TTL', '60'))
+
+# Unread badges (usuarios.counters) live in the default cache as one integer key per
+# count, moved with atomic incr/decr. Keys are rebuilt from the database when they
+# expire. Without Redis the cache is per process: fine for a single worker only.
+UNREAD_COUNTERS_TTL = int(os.environ.get('UNREAD_COUNTERS_TTL', '300'))
+
+# Typeahead results for chat user search (usuarios.user_search): an LRU of this
+# many recent queries per process, each kept for the TTL in seconds.
+USER_SEARCH_CACHE_SIZE = int(os.environ.get('USER_SEARCH_CACHE_SIZE', '512'))
+USER_SEARCH_CACHE_TTL = int(os.environ.get('USER_SEARCH_CACHE_TTL', '30'))
 
 # Allow iframe display
 X_FRAME_OPTIONS = 'SAMEORIGIN'
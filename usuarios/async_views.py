@@ -0,0 +1,87 @@
+"""ASGI-native versions of the hot chat JSON endpoints.
+
+Same contracts as their namesakes in `views.py`, served under `chat/async/api/`.
+Under Daphne/uvicorn they run on the event loop instead of being handed to the
+sync-view thread pool one request at a time; reads go through the async ORM
+(which still runs each query on the thread-sensitive executor, but no longer
+holds a worker thread across the whole view). The send endpoint keeps its
+transactional write in one `sync_to_async` call because `transaction.atomic`
+has no async counterpart.
+"""
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET, require_POST
+
+from .chat_serializers import aserialize_conversations, serialize_message
+from .decorators import login_required_usuario
+from .models import Conversation, ConversationMember
+from .user_search import asearch_users
+from .views import (
+    _message_anchor,
+    _message_window,
+    _message_window_payload,
+    _parse_message_text,
+    _parse_message_window,
+    _store_message,
+)
+
+
+@require_GET
+@login_required_usuario(json=True)
+async def chat_conversations_api(request):
+    user = request.usuario
+
+    data = await aserialize_conversations(Conversation.inbox_for(user), user)
+    return JsonResponse({'conversations': data})
+
+
+@require_GET
+@login_required_usuario(json=True)
+async def chat_search_users_api(request):
+    term = request.GET.get('q', '').strip()
+    return JsonResponse({'results': await asearch_users(term, exclude_id=request.usuario.id)})
+
+
+@require_GET
+@login_required_usuario(json=True)
+async def chat_messages_api(request, conversation_id):
+    """Keyset-paginated message window; see `views.chat_messages_api`."""
+    user = request.usuario
+
+    member = await ConversationMember.objects.filter(conversation_id=conversation_id, usuario=user).afirst()
+    if member is None:
+        return JsonResponse({'detail': 'Conversa não encontrada.'}, status=404)
+
+    try:
+        before, after, limit = _parse_message_window(request.GET)
+    except ValueError as exc:
+        return JsonResponse({'detail': str(exc)}, status=400)
+
+    anchor_created_at = None
+    if before or after:
+        anchor_created_at = await _message_anchor(conversation_id, before or after).afirst()
+        if anchor_created_at is None:
+            return JsonResponse({'detail': 'Cursor inválido.'}, status=400)
+
+    window = [message async for message in _message_window(member, before, after, anchor_created_at, limit)]
+    return JsonResponse(_message_window_payload(window, limit, after, user))
+
+
+@require_POST
+@login_required_usuario(json=True)
+async def chat_send_message_api(request, conversation_id):
+    user = request.usuario
+
+    conversation = await Conversation.objects.filter(pk=conversation_id, participants=user).afirst()
+    if conversation is None:
+        return JsonResponse({'detail': 'Conversa não encontrada.'}, status=404)
+
+    try:
+        text = _parse_message_text(request)
+    except ValueError as exc:
+        return JsonResponse({'detail': str(exc)}, status=400)
+
+    recipient_ids = [pk async for pk in conversation.participants.values_list('id', flat=True) if pk != user.id]
+    message = await sync_to_async(_store_message)(conversation, user, text, recipient_ids)
+    return JsonResponse({'message': serialize_message(message, user)}, status=201)
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Iterable, List, Optional
 
 from django.templatetags.static import static
 
@@ -27,15 +27,17 @@ def serialize_user(user: Optional[Usuario]) -> Optional[Dict[str, Any]]:
     }
 
 
-def serialize_message(message: Message, current_user: Usuario) -> Dict[str, Any]:
-    is_self = message.autor_id == current_user.id
-    is_deleted_for_all = message.deleted_for_everyone
-    if is_deleted_for_all:
+def get_display_text(message: Message) -> str:
+    if message.deleted_for_everyone:
         deleted_by_name = message.deleted_by.nome if message.deleted_by else 'Usuário'
-        display_text = f'{deleted_by_name} apagou esta mensagem.'
-    else:
-        display_text = message.texto
+        return f'{deleted_by_name} apagou esta mensagem.'
+    return message.texto
+
 
+def serialize_message_payload(message: Message) -> Dict[str, Any]:
+    """Viewer-independent message fields, safe to broadcast to every socket."""
+    is_deleted_for_all = message.deleted_for_everyone
+    display_text = get_display_text(message)
     return {
         'id': message.id,
         'conversation_id': message.conversation_id,
@@ -43,31 +45,114 @@ def serialize_message(message: Message, current_user: Usuario) -> Dict[str, Any]
         'display_text': display_text,
         'created_at': message.created_at.isoformat(),
         'author': serialize_user(message.autor),
-        'is_self': is_self,
         'is_deleted_for_all': is_deleted_for_all,
         'deleted_label': display_text if is_deleted_for_all else None,
+        'is_read': message.is_read,
+    }
+
+
+def personalize_message(payload: Dict[str, Any], viewer_id: int) -> Dict[str, Any]:
+    """Add the per-viewer flags to a `serialize_message_payload()` dict."""
+    author = payload.get('author') or {}
+    is_self = author.get('id') == viewer_id
+    return {
+        **payload,
+        'is_self': is_self,
         'can_delete_for_self': True,
-        'can_delete_for_all': is_self and not is_deleted_for_all,
+        'can_delete_for_all': is_self and not payload['is_deleted_for_all'],
     }
 
 
-def serialize_conversation(conversation: Conversation, current_user: Usuario) -> Dict[str, Any]:
-    other = conversation.other_participant(current_user) or current_user
-    last_message = (
-        conversation.messages
-        .exclude(deleted_for=current_user)
-        .order_by('-created_at')
+def serialize_message(message: Message, current_user: Usuario) -> Dict[str, Any]:
+    return personalize_message(serialize_message_payload(message), current_user.id)
+
+
+def _visible_last_message(conversation: Conversation, current_user: Usuario) -> Optional[Message]:
+    if hasattr(conversation, 'last_message_hidden'):
+        # Annotated by Conversation.inbox_for(); see serialize_conversations().
+        if not conversation.last_message_hidden:
+            return conversation.last_message
+        return getattr(conversation, 'fallback_last_message', None)
+    member = conversation.members.filter(usuario=current_user).first()
+    if member is None:
+        return None
+    return (
+        Message.objects.visible_to(member)
+        .select_related('deleted_by')
+        .order_by('-created_at', '-id')
         .first()
     )
-    if last_message and last_message.deleted_for_everyone:
-        preview_text = serialize_message(last_message, current_user)['display_text']
-    elif last_message:
-        preview_text = last_message.texto
-    else:
-        preview_text = ''
+
+
+def serialize_conversation(conversation: Conversation, current_user: Usuario) -> Dict[str, Any]:
+    other = conversation.other_participant(current_user) or current_user
+    last_message = _visible_last_message(conversation, current_user)
     return {
         'id': conversation.id,
         'partner': serialize_user(other),
-        'last_message': preview_text,
+        'last_message': get_display_text(last_message) if last_message else '',
         'last_message_at': last_message.created_at.isoformat() if last_message else None,
     }
+
+
+def serialize_conversation_payload(conversation: Conversation) -> Dict[str, Any]:
+    """Viewer-independent conversation summary built from the last message pointer.
+
+    Per-user hiding (`ConversationMember` watermark/`HiddenMessage`) is not applied here; it only matters for old
+    messages, never for the new or globally deleted ones that get broadcast.
+    """
+    last_message = conversation.last_message
+    return {
+        'id': conversation.id,
+        'participants': [serialize_user(user) for user in conversation.participants.all()],
+        'last_message': get_display_text(last_message) if last_message else '',
+        'last_message_at': last_message.created_at.isoformat() if last_message else None,
+    }
+
+
+def personalize_conversation(payload: Dict[str, Any], viewer_id: int) -> Dict[str, Any]:
+    """Turn a `serialize_conversation_payload()` dict into the shape the client expects."""
+    participants = payload.get('participants') or []
+    partner = next((p for p in participants if p['id'] != viewer_id), None)
+    if partner is None:
+        partner = next((p for p in participants if p['id'] == viewer_id), None)
+    return {
+        'id': payload['id'],
+        'partner': partner,
+        'last_message': payload['last_message'],
+        'last_message_at': payload['last_message_at'],
+    }
+
+
+def _hidden_fallback_ids(conversations: List[Conversation]) -> List[int]:
+    return [
+        conv.visible_last_message_id
+        for conv in conversations
+        if conv.last_message_hidden and conv.visible_last_message_id
+    ]
+
+
+def _serialize_inbox(conversations: List[Conversation], fallbacks: Dict[int, Message],
+                     current_user: Usuario) -> List[Dict[str, Any]]:
+    for conv in conversations:
+        if conv.last_message_hidden:
+            conv.fallback_last_message = fallbacks.get(conv.visible_last_message_id)
+    return [serialize_conversation(conv, current_user) for conv in conversations]
+
+
+def serialize_conversations(conversations: Iterable[Conversation], current_user: Usuario) -> List[Dict[str, Any]]:
+    """Serialize a `Conversation.inbox_for()` queryset without per-row queries."""
+    conversations = list(conversations)
+    fallback_ids = _hidden_fallback_ids(conversations)
+    fallbacks = (Message.objects.select_related('deleted_by').in_bulk(fallback_ids)
+                 if fallback_ids else {})
+    return _serialize_inbox(conversations, fallbacks, current_user)
+
+
+async def aserialize_conversations(conversations, current_user: Usuario) -> List[Dict[str, Any]]:
+    """Async `serialize_conversations()`: the same two queries, through the async ORM."""
+    conversations = [conv async for conv in conversations]
+    fallback_ids = _hidden_fallback_ids(conversations)
+    fallbacks = (await Message.objects.select_related('deleted_by').ain_bulk(fallback_ids)
+                 if fallback_ids else {})
+    return _serialize_inbox(conversations, fallbacks, current_user)
@@ -2,15 +2,18 @@ from __future__ import annotations
 
 from typing import Any, Dict, Optional
 
-from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncJsonWebsocketConsumer
 
-from .chat_serializers import serialize_conversation, serialize_message
-from .models import Conversation, Message, Usuario
+from .chat_serializers import personalize_conversation, personalize_message
+from .dispatch import broadcaster
+from .models import Usuario
+from .realtime import user_group_name
 
 
 class ChatConsumer(AsyncJsonWebsocketConsumer):
-    conversation_id: Optional[int] = None
+    """Single socket per user: receives events for every conversation they are in."""
+
+    group_name: Optional[str] = None
 
     async def connect(self):
         usuario: Optional[Usuario] = self.scope.get('usuario')
@@ -18,62 +21,66 @@ class ChatConsumer(AsyncJsonWebsocketConsumer):
             await self.close(code=4401)
             return
 
-        conversation_id = self.scope['url_route']['kwargs'].get('conversation_id')
-        if not conversation_id:
-            await self.close(code=4400)
-            return
-
-        has_access = await self._user_in_conversation(usuario.id, conversation_id)
-        if not has_access:
-            await self.close(code=4403)
-            return
-
-        self.conversation_id = conversation_id
-        self.group_name = f'chat_{conversation_id}'
-
+        self.group_name = user_group_name(usuario.id)
         await self.channel_layer.group_add(self.group_name, self.channel_name)
         await self.accept()
 
+    async def dispatch(self, message):
+        broadcaster.record_delivery(message)
+        await super().dispatch(message)
+
+    async def chat_batch_event(self, event: Dict[str, Any]):
+        # Several events for this user coalesced into one group_send; replay in order.
+        for item in event['events']:
+            await self.dispatch(item)
+
     async def disconnect(self, close_code):
-        if getattr(self, 'group_name', None):
+        if self.group_name:
             await self.channel_layer.group_discard(self.group_name, self.channel_name)
 
     async def chat_message_event(self, event: Dict[str, Any]):
+        # The event carries pre-serialized payloads; only per-viewer flags are
+        # derived here, so fan-out never touches the database.
         usuario: Optional[Usuario] = self.scope.get('usuario')
         if not usuario:
             return
 
-        message = await self._serialize_message(event['message_id'], usuario)
-        conversation = await self._serialize_conversation(event['conversation_id'], usuario)
-        if not message or not conversation:
-            return
         payload = {
             'event': 'message',
-            'message': message,
-            'conversation': conversation,
+            'message': personalize_message(event['message'], usuario.id),
+            'conversation': personalize_conversation(event['conversation'], usuario.id),
         }
         await self.send_json(payload)
 
-    @database_sync_to_async
-    def _user_in_conversation(self, user_id: int, conversation_id: int) -> bool:
-        return Conversation.objects.filter(id=conversation_id, participants__id=user_id).exists()
-
-    @database_sync_to_async
-    def _serialize_message(self, message_id: int, current_user: Usuario) -> Dict[str, Any]:
-        try:
-            message = (Message.objects
-                       .select_related('autor', 'deleted_by', 'conversation')
-                       .get(pk=message_id))
-        except Message.DoesNotExist:
-            return {}
-        return serialize_message(message, current_user)
-
-    @database_sync_to_async
-    def _serialize_conversation(self, conversation_id: int, current_user: Usuario) -> Dict[str, Any]:
-        try:
-            conversation = (Conversation.objects
-                            .prefetch_related('participants', 'messages__autor', 'messages__deleted_by')
-                            .get(pk=conversation_id))
-        except Conversation.DoesNotExist:
-            return {}
-        return serialize_conversation(conversation, current_user)
+    async def chat_conversation_event(self, event: Dict[str, Any]):
+        usuario: Optional[Usuario] = self.scope.get('usuario')
+        if not usuario:
+            return
+
+        await self.send_json({
+            'event': 'conversation',
+            'conversation': personalize_conversation(event['conversation'], usuario.id),
+        })
+
+    async def chat_read_event(self, event: Dict[str, Any]):
+        await self.send_json({
+            'event': 'read',
+            'conversation_id': event['conversation_id'],
+            'reader_id': event['reader_id'],
+            'up_to': event['up_to'],
+        })
+
+    async def chat_conversation_cleared_event(self, event: Dict[str, Any]):
+        # Sent only to the user's own group, like message_hidden.
+        await self.send_json({
+            'event': 'conversation_cleared',
+            'conversation': event['conversation'],
+        })
+
+    async def chat_message_hidden_event(self, event: Dict[str, Any]):
+        # Sent only to the user's own group, so the payload is already personal.
+        await self.send_json({
+            'event': 'message_hidden',
+            'message_id': event['message_id'],
+            'conversation': event['conversation'],
+        })
@@ -0,0 +1,132 @@
+"""Per-user unread counters served from the Django cache.
+
+Every count is its own integer key: ``unread:<uid>:conv:<cid>`` per conversation
+and ``unread:<uid>:notif`` for notifications, plus an index key ``unread:<uid>``
+listing the conversations covered. A miss on any of them rebuilds the user's
+keys with two grouped queries and a membership lookup; writers move the counts
+with atomic `incr`/`decr` once their transaction commits, so concurrent writers
+never overwrite each other and the badge endpoint normally never reaches the
+message tables. Writes that cannot cheaply tell how a count moved drop the index
+instead. Keys expire after `UNREAD_COUNTERS_TTL` seconds.
+
+The default cache must be shared by every worker (settings use Redis whenever
+`CHANNEL_LAYER_URL` is set); with a per-process cache a write served by one
+worker is invisible to badge polls served by another.
+"""
+
+from __future__ import annotations
+
+from typing import Dict, Iterable
+
+from django.conf import settings
+from django.core.cache import cache as default_cache
+from django.db import transaction
+from django.db.models import Count, Exists, F, OuterRef, Q
+
+
+class UnreadCounters:
+    def __init__(self, ttl: float, prefix: str = 'unread', cache=None):
+        self.ttl = ttl
+        self.prefix = prefix
+        self._cache = cache
+
+    @property
+    def cache(self):
+        return default_cache if self._cache is None else self._cache
+
+    def _index_key(self, user_id) -> str:
+        return f'{self.prefix}:{user_id}'
+
+    def _conversation_key(self, user_id, conversation_id) -> str:
+        return f'{self.prefix}:{user_id}:conv:{conversation_id}'
+
+    def _notifications_key(self, user_id) -> str:
+        return f'{self.prefix}:{user_id}:notif'
+
+    def get(self, user_id) -> Dict:
+        conversation_ids = self.cache.get(self._index_key(user_id))
+        if conversation_ids is not None:
+            keys = {self._conversation_key(user_id, cid): cid for cid in conversation_ids}
+            notifications_key = self._notifications_key(user_id)
+            values = self.cache.get_many([*keys, notifications_key])
+            if len(values) == len(keys) + 1 and min(values.values()) >= 0:
+                return {
+                    'messages': {cid: values[key] for key, cid in keys.items() if values[key]},
+                    'notifications': values[notifications_key],
+                }
+        return self._build(user_id)
+
+    def _build(self, user_id) -> Dict:
+        from .models import ConversationMember, HiddenMessage, Message, Notification
+
+        hidden = HiddenMessage.objects.filter(message_id=OuterRef('pk'), usuario_id=user_id)
+        # One filter() call so every condition targets the same membership row.
+        per_conversation = (Message.objects
+                            .filter(
+                                Q(conversation__members__hidden_count=0) | ~Exists(hidden),
+                                conversation__members__usuario_id=user_id,
+                                id__gt=F('conversation__members__cleared_up_to'),
+                                is_read=False,
+                                deleted_for_everyone=False,
+                            )
+                            .exclude(autor_id=user_id)
+                            .values_list('conversation_id')
+                            .annotate(total=Count('id')))
+        messages = {conversation_id: total for conversation_id, total in per_conversation}
+        notifications = Notification.objects.filter(recipient_id=user_id, is_read=False).count()
+        # Zero counts are stored too, so the first message into a read conversation
+        # is a plain incr rather than a rebuild.
+        conversation_ids = list(ConversationMember.objects
+                                .filter(usuario_id=user_id)
+                                .values_list('conversation_id', flat=True))
+        values = {self._conversation_key(user_id, cid): messages.get(cid, 0) for cid in conversation_ids}
+        values[self._notifications_key(user_id)] = notifications
+        self.cache.set_many(values, self.ttl)
+        # Written last: readers only trust the counts once the index exists.
+        self.cache.set(self._index_key(user_id), conversation_ids, self.ttl)
+        return {'messages': {cid: total for cid, total in messages.items() if total}, 'notifications': notifications}
+
+    def _incr(self, user_id, key, delta: int):
+        """Move one count by `delta`; a missing key or a negative result drops the index."""
+        try:
+            value = self.cache.incr(key, delta)
+        except ValueError:
+            value = -1  # expired, or a conversation the index does not cover yet
+        if value < 0:
+            self.cache.delete(self._index_key(user_id))
+
+    def message_received(self, user_ids: Iterable[int], conversation_id: int):
+        user_ids = list(user_ids)
+
+        def apply():
+            for user_id in user_ids:
+                self._incr(user_id, self._conversation_key(user_id, conversation_id), 1)
+
+        transaction.on_commit(apply)
+
+    def notifications_added(self, user_ids: Iterable[int], count: int = 1):
+        user_ids = list(user_ids)
+
+        def apply():
+            for user_id in user_ids:
+                self._incr(user_id, self._notifications_key(user_id), count)
+
+        transaction.on_commit(apply)
+
+    def conversation_read(self, user_id: int, conversation_id: int, notifications_read: int = 0):
+        def apply():
+            self.cache.set(self._conversation_key(user_id, conversation_id), 0, self.ttl)
+            if notifications_read:
+                self._incr(user_id, self._notifications_key(user_id), -notifications_read)
+
+        transaction.on_commit(apply)
+
+    def notifications_read(self, user_id: int):
+        transaction.on_commit(lambda: self.cache.set(self._notifications_key(user_id), 0, self.ttl))
+
+    def invalidate(self, user_ids: Iterable[int]):
+        keys = [self._index_key(user_id) for user_id in user_ids]
+        transaction.on_commit(lambda: self.cache.delete_many(keys))
+
+
+unread_counters = UnreadCounters(ttl=getattr(settings, 'UNREAD_COUNTERS_TTL', 300))
@@ -0,0 +1,82 @@
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.http import JsonResponse
+from django.shortcuts import redirect
+
+from .models import Usuario
+from .user_cache import usuario_cache
+
+
+def get_request_usuario(request, fields=None):
+    """Return the session's Usuario, loading it at most once per request.
+
+    The result is memoized on `request.usuario`. By default it comes from the
+    per-process snapshot cache; `fields` loads just those columns with only()
+    instead, for views that need more than the snapshot (e.g. profile editing).
+    """
+    if hasattr(request, 'usuario'):
+        return request.usuario
+
+    user = None
+    uid = request.session.get('usuario_id')
+    if uid:
+        if fields:
+            user = Usuario.objects.only(*fields).filter(pk=uid).first()
+        else:
+            user = usuario_cache.get(uid)
+        if user is None:
+            request.session.pop('usuario_id', None)
+    request.usuario = user
+    return user
+
+
+async def aget_request_usuario(request, fields=None):
+    """Async `get_request_usuario()` for ASGI-native views."""
+    if hasattr(request, 'usuario'):
+        return request.usuario
+
+    user = None
+    uid = await request.session.aget('usuario_id')
+    if uid:
+        if fields:
+            user = await Usuario.objects.only(*fields).filter(pk=uid).afirst()
+        else:
+            user = await usuario_cache.aget(uid)
+        if user is None:
+            await request.session.apop('usuario_id', None)
+    request.usuario = user
+    return user
+
+
+def login_required_usuario(view_func=None, *, fields=None, json=False):
+    """Require a logged-in Usuario and expose it as `request.usuario`.
+
+    Anonymous requests are redirected to `index`, or get a 401 JSON response
+    when `json=True`. `fields` is forwarded to `get_request_usuario`. Works on
+    both sync and `async def` views.
+    """
+    def denied():
+        if json:
+            return JsonResponse({'detail': 'Autenticação requerida'}, status=401)
+        return redirect('index')
+
+    def decorator(func):
+        if iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(request, *args, **kwargs):
+                if await aget_request_usuario(request, fields) is None:
+                    return denied()
+                return await func(request, *args, **kwargs)
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(request, *args, **kwargs):
+            if get_request_usuario(request, fields) is None:
+                return denied()
+            return func(request, *args, **kwargs)
+        return wrapper
+
+    if view_func is not None:
+        return decorator(view_func)
+    return decorator
@@ -0,0 +1,232 @@
+"""Post-commit, coalesced delivery of realtime events to the channel layer.
+
+Views call `broadcaster.broadcast(user_ids, event)`; nothing is sent until the
+surrounding transaction commits (`transaction.on_commit`), so a consumer never
+hears about a row it cannot read yet, and a rolled-back write sends nothing.
+
+With a cross-process layer (Redis) committed events go to an asyncio queue
+drained by one background thread: events that arrive within
+`BROADCAST_COALESCE_MS` of each other are grouped per `user_<id>` group, and a
+group with several pending events gets a single `chat.batch_event` that
+`ChatConsumer` unpacks in order. The request thread never waits on the layer.
+`InMemoryChannelLayer` is bound to the server's own event loop, so with it each
+event is sent inline from the commit hook instead (`BROADCAST_DISPATCH=inline`).
+
+Enqueue-to-layer time (`dispatch`) and enqueue-to-consumer time (`deliver`,
+recorded by the consumer from the `enqueued_at` stamp) are kept as latency
+histograms and exposed by `monitoring_stats_api`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from asgiref.sync import async_to_sync
+from channels.layers import InMemoryChannelLayer, get_channel_layer
+from django.conf import settings
+from django.db import transaction
+
+from .realtime import user_group_name
+
+logger = logging.getLogger(__name__)
+
+BATCH_EVENT = 'chat.batch_event'
+BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+_Item = Tuple[Tuple[str, ...], dict, float]
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram; percentiles are reported as bucket upper bounds."""
+
+    def __init__(self, buckets_ms: Tuple[int, ...] = BUCKETS_MS):
+        self.buckets_ms = buckets_ms
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counts = [0] * (len(self.buckets_ms) + 1)
+            self.count = 0
+            self.total_ms = 0.0
+            self.max_ms = 0.0
+
+    def observe(self, seconds: float):
+        value = max(seconds, 0.0) * 1000
+        index = next((i for i, bound in enumerate(self.buckets_ms) if value <= bound), len(self.buckets_ms))
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total_ms += value
+            self.max_ms = max(self.max_ms, value)
+
+    def _percentile(self, pct: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = pct / 100 * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return float(self.buckets_ms[index]) if index < len(self.buckets_ms) else round(self.max_ms, 2)
+        return round(self.max_ms, 2)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            labels = [f'<={bound}ms' for bound in self.buckets_ms] + [f'>{self.buckets_ms[-1]}ms']
+            return {
+                'count': self.count,
+                'mean_ms': round(self.total_ms / self.count, 2) if self.count else None,
+                'max_ms': round(self.max_ms, 2),
+                'p50_ms': self._percentile(50),
+                'p95_ms': self._percentile(95),
+                'p99_ms': self._percentile(99),
+                'buckets': dict(zip(labels, self.counts)),
+            }
+
+
+class Broadcaster:
+    def __init__(self, coalesce_ms: float, max_batch: int = 500, mode: str = 'auto'):
+        self.coalesce = coalesce_ms / 1000
+        self.max_batch = max_batch
+        self.mode = mode
+        self.dispatch_latency = LatencyHistogram()
+        self.deliver_latency = LatencyHistogram()
+        self.events = 0
+        self.batches = 0
+        self.group_sends = 0
+        self.errors = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._idle = threading.Condition()
+        self._pending = 0
+
+    def broadcast(self, user_ids: Iterable[int], event: dict):
+        """Send `event` to every socket of `user_ids` once the current transaction commits."""
+        groups = tuple(user_group_name(user_id) for user_id in user_ids)
+        if not groups:
+            return
+        transaction.on_commit(lambda: self._submit((groups, event, time.time())))
+
+    def _use_thread(self, layer) -> bool:
+        if self.mode == 'auto':
+            return not isinstance(layer, InMemoryChannelLayer)
+        return self.mode == 'thread'
+
+    def _submit(self, item: _Item):
+        layer = get_channel_layer()
+        if layer is None:
+            return
+        with self._idle:
+            self._pending += 1
+        if not self._use_thread(layer):
+            async_to_sync(self._deliver)(layer, [item])
+            return
+        self._ensure_thread()
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, item)
+
+    def _ensure_thread(self):
+        with self._start_lock:
+            if self._thread and self._thread.is_alive():
+                return
+            ready = threading.Event()
+
+            def run():
+                self._loop = asyncio.new_event_loop()
+                asyncio.set_event_loop(self._loop)
+                self._queue = asyncio.Queue()
+                drain = self._loop.create_task(self._drain())
+                ready.set()
+                self._loop.run_forever()
+                drain.cancel()
+                self._loop.run_until_complete(asyncio.gather(drain, return_exceptions=True))
+                self._loop.close()
+
+            self._thread = threading.Thread(target=run, name='broadcast-dispatch', daemon=True)
+            self._thread.start()
+            ready.wait()
+
+    async def _drain(self):
+        layer = get_channel_layer()
+        while True:
+            batch: List[_Item] = [await self._queue.get()]
+            deadline = self._loop.time() + self.coalesce
+            while len(batch) < self.max_batch:
+                timeout = deadline - self._loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            await self._deliver(layer, batch)
+
+    async def _deliver(self, layer, batch: List[_Item]):
+        per_group: Dict[str, List[dict]] = {}
+        for groups, event, enqueued_at in batch:
+            stamped = dict(event, enqueued_at=enqueued_at)
+            for group in groups:
+                per_group.setdefault(group, []).append(stamped)
+
+        sends = []
+        for group, events in per_group.items():
+            payload = events[0] if len(events) == 1 else {'type': BATCH_EVENT, 'events': events}
+            sends.append(layer.group_send(group, payload))
+        outcomes = await asyncio.gather(*sends, return_exceptions=True)
+
+        now = time.time()
+        for _, _, enqueued_at in batch:
+            self.dispatch_latency.observe(now - enqueued_at)
+        failures = [outcome for outcome in outcomes if isinstance(outcome, Exception)]
+        for failure in failures:
+            logger.warning('Realtime broadcast failed: %s', failure)
+        with self._idle:
+            self.events += len(batch)
+            self.batches += 1
+            self.group_sends += len(sends)
+            self.errors += len(failures)
+            self._pending -= len(batch)
+            self._idle.notify_all()
+
+    def record_delivery(self, event: dict):
+        """Called by consumers for every stamped event they handle."""
+        enqueued_at = event.get('enqueued_at')
+        if enqueued_at is not None:
+            self.deliver_latency.observe(time.time() - enqueued_at)
+
+    def wait_idle(self, timeout: float = 5) -> bool:
+        """Block until every submitted event reached the layer (used by tests and shutdown)."""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._pending <= 0, timeout)
+
+    def stop(self):
+        if self._loop and self._thread:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def stats(self) -> Dict:
+        with self._idle:
+            counters = {
+                'events': self.events,
+                'batches': self.batches,
+                'group_sends': self.group_sends,
+                'errors': self.errors,
+                'pending': self._pending,
+                'coalesce_ms': self.coalesce * 1000,
+            }
+        counters['dispatch_latency'] = self.dispatch_latency.snapshot()
+        counters['deliver_latency'] = self.deliver_latency.snapshot()
+        return counters
+
+
+broadcaster = Broadcaster(
+    coalesce_ms=getattr(settings, 'BROADCAST_COALESCE_MS', 5),
+    mode=getattr(settings, 'BROADCAST_DISPATCH', 'auto'),
+)
@@ -1,4 +1,5 @@
 from django import forms
+from .geo import valid_coordinates
 from .models import Usuario, Post, Evento
 
 class RegistrationForm(forms.ModelForm):
@@ -54,6 +55,8 @@ class EventoForm(forms.ModelForm):
             'data',
             'hora',
             'local',
+            'latitude',
+            'longitude',
             'distancia',
             'max_participantes',
             'imagem_capa',
@@ -69,6 +72,8 @@ class EventoForm(forms.ModelForm):
             'data': 'Data',
             'hora': 'Hora',
             'local': 'Local',
+            'latitude': 'Latitude (opcional)',
+            'longitude': 'Longitude (opcional)',
             'distancia': 'Distância (opcional)',
             'max_participantes': 'Máximo de Participantes (opcional)',
             'imagem_capa': 'Imagem principal (obrigatória)',
@@ -84,6 +89,8 @@ class EventoForm(forms.ModelForm):
             'data': forms.DateInput(attrs={'type': 'date'}),
             'hora': forms.TimeInput(attrs={'type': 'time'}),
             'local': forms.TextInput(attrs={'placeholder': 'Selecione o local'}),
+            'latitude': forms.NumberInput(attrs={'step': 'any', 'min': -90, 'max': 90, 'placeholder': '-8.0631'}),
+            'longitude': forms.NumberInput(attrs={'step': 'any', 'min': -180, 'max': 180, 'placeholder': '-34.8711'}),
             'distancia': forms.TextInput(attrs={'placeholder': '5K, 10 milhas, etc.'}),
             'max_participantes': forms.NumberInput(attrs={'placeholder': 'Ex: 20'}),
             'imagem_capa': forms.ClearableFileInput(attrs={'accept': 'image/*'}),
@@ -97,3 +104,12 @@ class EventoForm(forms.ModelForm):
         if not imagem and not self.instance.pk:
             raise forms.ValidationError('Envie uma imagem principal para o evento.')
         return imagem or self.instance.imagem_capa
+
+    def clean(self):
+        cleaned_data = super().clean()
+        latitude, longitude = cleaned_data.get('latitude'), cleaned_data.get('longitude')
+        if (latitude is None) != (longitude is None):
+            raise forms.ValidationError('Informe latitude e longitude juntas, ou deixe ambas em branco.')
+        if latitude is not None and not valid_coordinates(latitude, longitude):
+            raise forms.ValidationError('Coordenadas fora do intervalo válido.')
+        return cleaned_data
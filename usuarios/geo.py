@@ -0,0 +1,118 @@
+"""Geohash buckets and haversine distance for "events near me" on plain SQLite.
+
+Each located `Evento` stores the geohash of its coordinates (`GEOHASH_PRECISION`
+characters, a cell of a few metres) in an indexed column. A radius query picks
+the longest geohash prefix whose cell is at least as large as the radius; the
+cell holding the origin plus its eight neighbours then cover the whole circle,
+so candidates are fetched with at most nine index range scans. Only those rows
+get the haversine expression, built from the math functions Django registers
+on every backend (SQLite included), and rows outside the radius are dropped.
+"""
+
+from __future__ import annotations
+
+import math
+from typing import List, Optional, Tuple
+
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.functions import ASin, Cos, Least, Power, Radians, Sin, Sqrt
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.32
+GEOHASH_PRECISION = 9
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def valid_coordinates(latitude, longitude) -> bool:
+    return (latitude is not None and longitude is not None
+            and -90 <= latitude <= 90 and -180 <= longitude <= 180)
+
+
+def parse_coordinates(latitude, longitude) -> Optional[Tuple[float, float]]:
+    """`(lat, lng)` from two raw values, None when both are blank; ValueError otherwise."""
+    if latitude in (None, '') and longitude in (None, ''):
+        return None
+    latitude, longitude = float(latitude), float(longitude)
+    if not valid_coordinates(latitude, longitude):
+        raise ValueError((latitude, longitude))
+    return latitude, longitude
+
+
+def encode(latitude: float, longitude: float, precision: int = GEOHASH_PRECISION) -> str:
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        target, coordinate = (lng_range, longitude) if even else (lat_range, latitude)
+        middle = (target[0] + target[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            target[0] = middle
+        else:
+            target[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits, value = 0, 0
+    return ''.join(chars)
+
+
+def cell_size(precision: int) -> Tuple[float, float]:
+    """(height, width) in degrees of a geohash cell with `precision` characters."""
+    total = 5 * precision
+    return 180.0 / 2 ** (total // 2), 360.0 / 2 ** ((total + 1) // 2)
+
+
+def candidate_prefixes(latitude: float, longitude: float, radius_km: float) -> Optional[List[str]]:
+    """Geohash prefixes whose cells cover the circle, or None if it needs the whole table."""
+    lat_span = radius_km / KM_PER_DEGREE
+    # Widest in degrees at the circle's poleward edge.
+    cos_lat = max(math.cos(math.radians(min(abs(latitude) + lat_span, 90.0))), 1e-6)
+    lng_span = radius_km / (KM_PER_DEGREE * cos_lat)
+    precision = 0
+    for candidate in range(1, GEOHASH_PRECISION + 1):
+        height, width = cell_size(candidate)
+        if height < lat_span or width < lng_span:
+            break
+        precision = candidate
+    if precision == 0:
+        return None
+
+    height, width = cell_size(precision)
+    prefixes = set()
+    for dlat in (-height, 0.0, height):
+        for dlng in (-width, 0.0, width):
+            lat = min(max(latitude + dlat, -90.0), 90.0)
+            lng = (longitude + dlng + 180.0) % 360.0 - 180.0
+            prefixes.add(encode(lat, lng, precision))
+    return sorted(prefixes)
+
+
+def prefix_filter(field: str, prefixes: List[str]) -> Q:
+    # Range bounds (not LIKE) so SQLite can seek the index; '~' sorts after every base32 digit.
+    condition = Q()
+    for prefix in prefixes:
+        condition |= Q(**{f'{field}__gte': prefix, f'{field}__lt': prefix + '~'})
+    return condition
+
+
+def distance_km(latitude: float, longitude: float, lat_field: str = 'latitude', lng_field: str = 'longitude'):
+    """Haversine distance from (`latitude`, `longitude`) to the row's coordinates, as an expression."""
+    origin_lat = Value(math.radians(latitude), output_field=FloatField())
+    origin_lng = Value(math.radians(longitude), output_field=FloatField())
+    row_lat = Radians(F(lat_field))
+    row_lng = Radians(F(lng_field))
+    half_chord = (
+        Power(Sin((row_lat - origin_lat) / 2), 2)
+        + Cos(origin_lat) * Cos(row_lat) * Power(Sin((row_lng - origin_lng) / 2), 2)
+    )
+    # Least() keeps rounding from pushing ASin past its domain for antipodal points.
+    return Value(2 * EARTH_RADIUS_KM, output_field=FloatField()) * ASin(Least(Sqrt(half_chord), Value(1.0)))
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    half_chord = (math.sin((phi2 - phi1) / 2) ** 2
+                  + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lng2 - lng1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(half_chord))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from usuarios.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Recompute Post.like_count/comment_count from the likes and comments tables.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('post_ids', nargs='*', type=int, help='limit the repair to these posts')
+
+    def handle(self, *args, **options):
+        queryset = Post.objects.all()
+        if options['post_ids']:
+            queryset = queryset.filter(pk__in=options['post_ids'])
+        fixed = Post.recount_counters(queryset)
+        self.stdout.write(self.style.SUCCESS(f'{fixed} post(s) corrigido(s).'))
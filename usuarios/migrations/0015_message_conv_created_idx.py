@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-17 12:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0014_empresaprofile_gm_permission_level'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['conversation', 'created_at', 'id'], name='message_conv_created_idx'),
+        ),
+    ]
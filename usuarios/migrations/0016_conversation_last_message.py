@@ -0,0 +1,40 @@
+# Generated by Django 5.2.8 on 2026-10-17 12:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_last_message(apps, schema_editor):
+    Conversation = apps.get_model('usuarios', 'Conversation')
+    Message = apps.get_model('usuarios', 'Message')
+    for conversation in Conversation.objects.all().iterator():
+        last = (Message.objects
+                .filter(conversation_id=conversation.pk)
+                .order_by('-created_at', '-id')
+                .first())
+        if last:
+            Conversation.objects.filter(pk=conversation.pk).update(
+                last_message=last,
+                last_message_at=last.created_at,
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0015_message_conv_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='usuarios.message'),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_last_message, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-17 12:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0016_conversation_last_message'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['data_criacao', 'id'], name='post_feed_idx'),
+        ),
+    ]
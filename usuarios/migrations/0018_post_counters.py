@@ -0,0 +1,45 @@
+# Generated by Django 5.2.8 on 2026-10-17 13:05
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    Post = apps.get_model('usuarios', 'Post')
+    Comment = apps.get_model('usuarios', 'Comment')
+    likes = (Post.likes.through.objects
+             .filter(post_id=OuterRef('pk'))
+             .values('post_id')
+             .annotate(total=Count('*'))
+             .values('total'))
+    comments = (Comment.objects
+                .filter(post_id=OuterRef('pk'))
+                .values('post_id')
+                .annotate(total=Count('*'))
+                .values('total'))
+    Post.objects.update(
+        like_count=Coalesce(Subquery(likes), 0),
+        comment_count=Coalesce(Subquery(comments), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0017_post_feed_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,103 @@
+# Generated by Django 5.2.8 on 2026-10-17 12:59
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+BATCH_SIZE = 500
+
+
+def backfill_notifications(apps, schema_editor):
+    """Rebuild the inbox history from the tables the old view merged on the fly.
+
+    The rows are history, not news, so they are stored as read; otherwise the
+    unread badge would cover every user's whole past on the first load.
+    """
+    Notification = apps.get_model('usuarios', 'Notification')
+    Message = apps.get_model('usuarios', 'Message')
+    Comment = apps.get_model('usuarios', 'Comment')
+    PostLikeEvent = apps.get_model('usuarios', 'PostLikeEvent')
+    Conversation = apps.get_model('usuarios', 'Conversation')
+
+    participants = {}
+    for conversation_id, usuario_id in Conversation.participants.through.objects.values_list('conversation_id', 'usuario_id'):
+        participants.setdefault(conversation_id, []).append(usuario_id)
+    hidden = set(Message.deleted_for.through.objects.values_list('message_id', 'usuario_id'))
+
+    rows = []
+
+    def flush(force=False):
+        if rows and (force or len(rows) >= BATCH_SIZE):
+            Notification.objects.bulk_create(rows)
+            rows.clear()
+
+    messages = (Message.objects
+                .filter(deleted_for_everyone=False)
+                .values_list('id', 'conversation_id', 'autor_id', 'texto', 'created_at'))
+    for message_id, conversation_id, autor_id, texto, created_at in messages.iterator():
+        preview = (texto or '').strip()
+        for recipient_id in participants.get(conversation_id, ()):
+            if recipient_id == autor_id or (message_id, recipient_id) in hidden:
+                continue
+            rows.append(Notification(
+                recipient_id=recipient_id, actor_id=autor_id, type='message', message_id=message_id,
+                description=preview[:160] or 'Você tem uma nova resposta na conversa.',
+                created_at=created_at, is_read=True,
+            ))
+        flush()
+
+    comments = (Comment.objects
+                .exclude(autor_id=models.F('post__autor_id'))
+                .values_list('post_id', 'post__autor_id', 'post__texto', 'autor_id', 'texto', 'data_criacao'))
+    for post_id, recipient_id, post_texto, autor_id, texto, created_at in comments.iterator():
+        excerpt = (post_texto or '').strip()
+        rows.append(Notification(
+            recipient_id=recipient_id, actor_id=autor_id, type='comment', post_id=post_id,
+            description=(texto or '').strip()[:200] or 'Novo comentário no seu post.',
+            post_excerpt=excerpt[:120], created_at=created_at, is_read=True,
+        ))
+        flush()
+
+    likes = (PostLikeEvent.objects
+             .exclude(usuario_id=models.F('post__autor_id'))
+             .values_list('post_id', 'post__autor_id', 'post__texto', 'usuario_id', 'created_at'))
+    for post_id, recipient_id, post_texto, usuario_id, created_at in likes.iterator():
+        excerpt = (post_texto or '').strip()
+        rows.append(Notification(
+            recipient_id=recipient_id, actor_id=usuario_id, type='like', post_id=post_id,
+            description=excerpt[:200] or 'Seu post recebeu um novo like.',
+            post_excerpt=excerpt[:120], created_at=created_at, is_read=True,
+        ))
+        flush()
+
+    flush(force=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0018_post_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Notification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type', models.CharField(choices=[('message', 'Chat'), ('comment', 'Comentário'), ('like', 'Curtida')], max_length=20)),
+                ('description', models.CharField(blank=True, max_length=200)),
+                ('post_excerpt', models.CharField(blank=True, max_length=120)),
+                ('is_read', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('actor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='usuarios.usuario')),
+                ('message', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='usuarios.message')),
+                ('post', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='usuarios.post')),
+                ('recipient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to='usuarios.usuario')),
+            ],
+            options={
+                'ordering': ['-created_at', '-id'],
+                'indexes': [models.Index(fields=['recipient', 'created_at', 'id'], name='notification_inbox_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_notifications, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-17 13:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0019_notification'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(condition=models.Q(('is_read', False)), fields=['conversation', 'autor', 'id'], name='message_unread_idx'),
+        ),
+    ]
@@ -0,0 +1,89 @@
+# Generated by Django 5.2.8 on 2026-10-17 13:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+BATCH_SIZE = 500
+
+
+def copy_deleted_for(apps, schema_editor):
+    """Move "apagar para mim" rows into HiddenMessage and count them per member."""
+    Message = apps.get_model('usuarios', 'Message')
+    HiddenMessage = apps.get_model('usuarios', 'HiddenMessage')
+    ConversationMember = apps.get_model('usuarios', 'ConversationMember')
+
+    counts = {}
+    rows = []
+    hidden = Message.deleted_for.through.objects.values_list('message_id', 'usuario_id', 'message__conversation_id')
+    for message_id, usuario_id, conversation_id in hidden.iterator():
+        rows.append(HiddenMessage(message_id=message_id, usuario_id=usuario_id))
+        counts[conversation_id, usuario_id] = counts.get((conversation_id, usuario_id), 0) + 1
+        if len(rows) >= BATCH_SIZE:
+            HiddenMessage.objects.bulk_create(rows, ignore_conflicts=True)
+            rows.clear()
+    HiddenMessage.objects.bulk_create(rows, ignore_conflicts=True)
+
+    for (conversation_id, usuario_id), count in counts.items():
+        ConversationMember.objects.filter(
+            conversation_id=conversation_id, usuario_id=usuario_id,
+        ).update(hidden_count=count)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0020_message_unread_idx'),
+    ]
+
+    operations = [
+        # The auto-created participants table already has the right shape;
+        # only the model state changes so it can grow per-member columns.
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='ConversationMember',
+                    fields=[
+                        ('id', models.AutoField(primary_key=True, serialize=False)),
+                        ('conversation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='members', to='usuarios.conversation')),
+                        ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='conversation_memberships', to='usuarios.usuario')),
+                    ],
+                    options={
+                        'db_table': 'usuarios_conversation_participants',
+                        'unique_together': {('conversation', 'usuario')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='conversation',
+                    name='participants',
+                    field=models.ManyToManyField(related_name='chat_conversations', through='usuarios.ConversationMember', to='usuarios.usuario'),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name='conversationmember',
+            name='cleared_up_to',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='conversationmember',
+            name='hidden_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='HiddenMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('message', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='usuarios.message')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hidden_messages', to='usuarios.usuario')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('message', 'usuario'), name='hidden_message_unique')],
+            },
+        ),
+        migrations.RunPython(copy_deleted_for, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='message',
+            name='deleted_for',
+        ),
+    ]
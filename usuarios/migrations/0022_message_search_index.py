@@ -0,0 +1,95 @@
+# Generated by Django 5.2.8 on 2026-10-17 14:05
+
+from django.db import migrations
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE usuarios_message_fts USING fts5(
+        texto, content='usuarios_message', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    INSERT INTO usuarios_message_fts(rowid, texto)
+    SELECT id, texto FROM usuarios_message WHERE deleted_for_everyone = 0
+    """,
+    """
+    CREATE TRIGGER usuarios_message_fts_insert AFTER INSERT ON usuarios_message
+    WHEN new.deleted_for_everyone = 0 BEGIN
+        INSERT INTO usuarios_message_fts(rowid, texto) VALUES (new.id, new.texto);
+    END
+    """,
+    """
+    CREATE TRIGGER usuarios_message_fts_hide AFTER UPDATE OF deleted_for_everyone ON usuarios_message
+    WHEN new.deleted_for_everyone = 1 AND old.deleted_for_everyone = 0 BEGIN
+        INSERT INTO usuarios_message_fts(usuarios_message_fts, rowid, texto) VALUES ('delete', old.id, old.texto);
+    END
+    """,
+    """
+    CREATE TRIGGER usuarios_message_fts_delete AFTER DELETE ON usuarios_message
+    WHEN old.deleted_for_everyone = 0 BEGIN
+        INSERT INTO usuarios_message_fts(usuarios_message_fts, rowid, texto) VALUES ('delete', old.id, old.texto);
+    END
+    """,
+]
+
+SQLITE_REVERSE = [
+    'DROP TRIGGER IF EXISTS usuarios_message_fts_delete',
+    'DROP TRIGGER IF EXISTS usuarios_message_fts_hide',
+    'DROP TRIGGER IF EXISTS usuarios_message_fts_insert',
+    'DROP TABLE IF EXISTS usuarios_message_fts',
+]
+
+POSTGRES_FORWARD = [
+    """
+    CREATE INDEX message_search_idx ON usuarios_message
+    USING GIN (to_tsvector('portuguese', texto)) WHERE NOT deleted_for_everyone
+    """,
+]
+
+POSTGRES_REVERSE = ['DROP INDEX IF EXISTS message_search_idx']
+
+
+def _sqlite_has_fts5(cursor):
+    try:
+        cursor.execute('CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x)')
+    except Exception:
+        return False
+    cursor.execute('DROP TABLE temp.fts5_probe')
+    return True
+
+
+def _execute(schema_editor, statements):
+    with schema_editor.connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        _execute(schema_editor, POSTGRES_FORWARD)
+    elif vendor == 'sqlite':
+        with schema_editor.connection.cursor() as cursor:
+            if not _sqlite_has_fts5(cursor):
+                return  # usuarios.search falls back to LIKE filters
+        _execute(schema_editor, SQLITE_FORWARD)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        _execute(schema_editor, POSTGRES_REVERSE)
+    elif vendor == 'sqlite':
+        _execute(schema_editor, SQLITE_REVERSE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0021_conversation_member_hidden_message'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.8 on 2026-10-17 14:30
+
+from django.db import migrations, models
+
+from usuarios.utils import normalize_search_text
+
+BATCH_SIZE = 500
+
+POSTGRES_FORWARD = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX usuario_nome_busca_trgm ON usuarios_usuario USING GIN (nome_busca gin_trgm_ops)',
+    'CREATE INDEX usuario_username_trgm ON usuarios_usuario USING GIN (username gin_trgm_ops)',
+]
+
+POSTGRES_REVERSE = [
+    'DROP INDEX IF EXISTS usuario_username_trgm',
+    'DROP INDEX IF EXISTS usuario_nome_busca_trgm',
+]
+
+
+def backfill_nome_busca(apps, schema_editor):
+    Usuario = apps.get_model('usuarios', 'Usuario')
+    batch = []
+    for usuario in Usuario.objects.only('id', 'nome').iterator():
+        usuario.nome_busca = normalize_search_text(usuario.nome)
+        batch.append(usuario)
+        if len(batch) >= BATCH_SIZE:
+            Usuario.objects.bulk_update(batch, ['nome_busca'])
+            batch.clear()
+    Usuario.objects.bulk_update(batch, ['nome_busca'])
+
+
+def _run_postgres(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        with schema_editor.connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0022_message_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usuario',
+            name='nome_busca',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=100),
+        ),
+        migrations.RunPython(backfill_nome_busca, migrations.RunPython.noop),
+        migrations.RunPython(_run_postgres(POSTGRES_FORWARD), _run_postgres(POSTGRES_REVERSE)),
+    ]
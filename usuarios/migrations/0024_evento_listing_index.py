@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-17 13:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0023_usuario_nome_busca'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='evento',
+            index=models.Index(fields=['data', 'hora', 'criado_em', 'id'], name='evento_listing_idx'),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.8 on 2026-10-17 13:25
+
+from django.db import migrations, models
+
+from usuarios.utils import normalize_search_text
+
+BATCH_SIZE = 500
+
+POSTGRES_FORWARD = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX evento_busca_trgm ON usuarios_evento USING GIN (busca gin_trgm_ops)',
+]
+
+POSTGRES_REVERSE = [
+    'DROP INDEX IF EXISTS evento_busca_trgm',
+]
+
+
+def backfill_busca(apps, schema_editor):
+    Evento = apps.get_model('usuarios', 'Evento')
+    batch = []
+    for evento in Evento.objects.only('id', 'titulo', 'local').iterator():
+        evento.busca = normalize_search_text(f'{evento.titulo} {evento.local}')
+        batch.append(evento)
+        if len(batch) >= BATCH_SIZE:
+            Evento.objects.bulk_update(batch, ['busca'])
+            batch.clear()
+    Evento.objects.bulk_update(batch, ['busca'])
+
+
+def _run_postgres(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        with schema_editor.connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0024_evento_listing_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='evento',
+            name='busca',
+            field=models.CharField(blank=True, editable=False, max_length=241),
+        ),
+        migrations.AddIndex(
+            model_name='evento',
+            index=models.Index(fields=['criador', 'busca'], name='evento_criador_busca_idx'),
+        ),
+        migrations.RunPython(backfill_busca, migrations.RunPython.noop),
+        migrations.RunPython(_run_postgres(POSTGRES_FORWARD), _run_postgres(POSTGRES_REVERSE)),
+    ]
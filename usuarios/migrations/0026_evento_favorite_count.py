@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-17 13:30
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_favorite_count(apps, schema_editor):
+    Evento = apps.get_model('usuarios', 'Evento')
+    favorites = (Evento.favorited_by.through.objects
+                 .filter(evento_id=OuterRef('pk'))
+                 .values('evento_id')
+                 .annotate(total=Count('*'))
+                 .values('total'))
+    Evento.objects.update(favorite_count=Coalesce(Subquery(favorites), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0025_evento_busca'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='evento',
+            name='favorite_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_favorite_count, migrations.RunPython.noop),
+    ]
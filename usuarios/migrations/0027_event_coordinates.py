@@ -0,0 +1,38 @@
+# Generated by Django 5.2.8 on 2026-10-17 13:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0026_evento_favorite_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='evento',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=12),
+        ),
+        migrations.AddField(
+            model_name='evento',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='evento',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='usuario',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='usuario',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.8 on 2026-10-17 13:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from usuarios.user_search import name_suffixes
+
+BATCH_SIZE = 500
+
+
+def backfill_name_suffixes(apps, schema_editor):
+    Usuario = apps.get_model('usuarios', 'Usuario')
+    UsuarioNameSuffix = apps.get_model('usuarios', 'UsuarioNameSuffix')
+    batch = []
+    for usuario_id, nome_busca in Usuario.objects.values_list('id', 'nome_busca').iterator():
+        batch += [UsuarioNameSuffix(usuario_id=usuario_id, suffix=suffix) for suffix in name_suffixes(nome_busca)]
+        if len(batch) >= BATCH_SIZE:
+            UsuarioNameSuffix.objects.bulk_create(batch)
+            batch.clear()
+    UsuarioNameSuffix.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0027_event_coordinates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UsuarioNameSuffix',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('suffix', models.CharField(db_index=True, max_length=100)),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='name_suffixes', to='usuarios.usuario')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('usuario', 'suffix'), name='usuario_name_suffix_unique')],
+            },
+        ),
+        migrations.RunPython(backfill_name_suffixes, migrations.RunPython.noop),
+    ]
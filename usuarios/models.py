@@ -1,17 +1,32 @@
 import random
 import string
+from datetime import timedelta
 
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import Case, Count, Exists, F, OuterRef, Prefetch, Q, Subquery, When
+from django.db.models.functions import Coalesce, Greatest
 from django.contrib.auth.hashers import make_password, check_password
+from django.urls import reverse
 from django.utils.text import slugify
 from django.utils import timezone
 
+from . import geo
+from .counters import unread_counters
+from .user_cache import usuario_cache
+from .user_search import SEARCH_FIELDS, name_suffixes, user_search_cache
+from .utils import normalize_search_text
+
 class Usuario(models.Model):
     nome = models.CharField(max_length=100)
+    # Accent-folded, lowercase `nome` for indexed prefix search (usuarios.user_search).
+    nome_busca = models.CharField(max_length=100, blank=True, db_index=True, editable=False)
     telefone = models.CharField(max_length=20)
     email = models.EmailField(unique=True)
     senha = models.CharField(max_length=128)
     localizacao = models.CharField(max_length=100, blank=True, null=True)
+    # Optional coordinates of `localizacao`; the default origin for nearby events.
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
     modalidades = models.CharField(max_length=200, blank=True, null=True)
     bio = models.TextField(blank=True, null=True)
     foto = models.ImageField(upload_to='usuarios/fotos/', blank=True, null=True)
@@ -32,7 +47,38 @@ class Usuario(models.Model):
     def save(self, *args, **kwargs):
         if not self.username:
             self.username = self.generate_unique_username()
-        super().save(*args, **kwargs)
+        self.nome_busca = normalize_search_text(self.nome)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'nome' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'nome_busca'}
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if update_fields is None or 'nome' in update_fields:
+                UsuarioNameSuffix.sync(self)
+        usuario_cache.invalidate(self.pk)
+        if update_fields is None or SEARCH_FIELDS.intersection(update_fields):
+            user_search_cache.clear()
+
+    def delete(self, *args, **kwargs):
+        pk = self.pk
+        with transaction.atomic():
+            # The cascade removes this user's likes/comments without touching the
+            # counters on other people's posts, so settle those first. Greatest() keeps a
+            # counter that already drifted to 0 from failing the >= 0 check and the delete.
+            Post.objects.filter(likes=self).update(like_count=Greatest(F('like_count') - 1, 0))
+            Evento.objects.filter(favorited_by=self).update(favorite_count=Greatest(F('favorite_count') - 1, 0))
+            per_post = (Comment.objects
+                        .filter(autor=self)
+                        .values('post_id')
+                        .annotate(total=Count('id')))
+            for row in per_post:
+                Post.objects.filter(pk=row['post_id']).update(
+                    comment_count=Greatest(F('comment_count') - row['total'], 0)
+                )
+            result = super().delete(*args, **kwargs)
+        usuario_cache.invalidate(pk)
+        user_search_cache.clear()
+        return result
 
     def generate_unique_username(self):
         base = slugify(self.nome or '') or 'usuario'
@@ -48,6 +94,27 @@ class Usuario(models.Model):
         return f'{base}-{fallback}'[:60]
 
 
+class UsuarioNameSuffix(models.Model):
+    """`nome_busca` from its second word on, one row per word, for indexed later-word search."""
+
+    usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='name_suffixes')
+    suffix = models.CharField(max_length=100, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['usuario', 'suffix'], name='usuario_name_suffix_unique'),
+        ]
+
+    @classmethod
+    def sync(cls, usuario):
+        """Bring the rows in line with `usuario.nome_busca`; no writes when the name kept its words."""
+        wanted = name_suffixes(usuario.nome_busca)
+        stored = set(cls.objects.filter(usuario=usuario).values_list('suffix', flat=True))
+        if stored - wanted:
+            cls.objects.filter(usuario=usuario, suffix__in=stored - wanted).delete()
+        cls.objects.bulk_create([cls(usuario=usuario, suffix=suffix) for suffix in wanted - stored])
+
+
 class EmpresaProfile(models.Model):
     TIPO_CHOICES = (
         ('empresa', 'Empresa'),
@@ -118,12 +185,93 @@ class Post(models.Model):
     localizacao = models.CharField(max_length=100, blank=True, null=True)
     data_criacao = models.DateTimeField(auto_now_add=True)
     likes = models.ManyToManyField(Usuario, related_name='liked_posts', blank=True)
+    # Denormalized from `likes` and `comments`; kept in step with F() updates by the
+    # views and repaired in bulk by `manage.py recount_post_counters`.
+    like_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
 
     def __str__(self):
         return f'Post de {self.autor.nome}: {self.texto[:50]}'
 
+    def toggle_like(self, user):
+        """Flip `user`'s like on this post; return `(liked, like_count)` afterwards.
+
+        Works on the through table directly (delete-or-insert) so the cost does not
+        depend on how many people liked the post. The insert runs in a savepoint:
+        if a concurrent request already created the row, the like simply stands.
+        """
+        through = Post.likes.through
+        with transaction.atomic():
+            removed, _ = through.objects.filter(post_id=self.pk, usuario_id=user.pk).delete()
+            if removed:
+                liked, delta = False, -removed
+            else:
+                liked, delta = True, 1
+                try:
+                    with transaction.atomic():
+                        through.objects.create(post_id=self.pk, usuario_id=user.pk)
+                except IntegrityError:
+                    delta = 0
+                else:
+                    PostLikeEvent.objects.bulk_create(
+                        [PostLikeEvent(post_id=self.pk, usuario_id=user.pk)],
+                        update_conflicts=True,
+                        unique_fields=['post', 'usuario'],
+                        update_fields=['created_at'],
+                    )
+                    Notification.for_like(self.pk, user.pk)
+            if delta:
+                Post.objects.filter(pk=self.pk).update(like_count=F('like_count') + delta)
+            self.like_count = Post.objects.filter(pk=self.pk).values_list('like_count', flat=True).get()
+        return liked, self.like_count
+
+    @classmethod
+    def recount_counters(cls, queryset=None):
+        """Recompute like/comment counters from the source tables; return the rows fixed."""
+        likes = (cls.likes.through.objects
+                 .filter(post_id=OuterRef('pk'))
+                 .values('post_id')
+                 .annotate(total=Count('*'))
+                 .values('total'))
+        comments = (Comment.objects
+                    .filter(post_id=OuterRef('pk'))
+                    .values('post_id')
+                    .annotate(total=Count('*'))
+                    .values('total'))
+        queryset = cls.objects.all() if queryset is None else queryset
+        drifted = (queryset
+                   .annotate(actual_likes=Coalesce(Subquery(likes), 0),
+                             actual_comments=Coalesce(Subquery(comments), 0))
+                   .exclude(like_count=F('actual_likes'), comment_count=F('actual_comments'))
+                   .values('pk'))
+        return cls.objects.filter(pk__in=drifted).update(
+            like_count=Coalesce(Subquery(likes), 0),
+            comment_count=Coalesce(Subquery(comments), 0),
+        )
+
+    @classmethod
+    def feed_for(cls, user, comment_limit=3):
+        """Posts ordered newest first with everything the feed renders for `user`.
+
+        Rows carry a `liked_by_me` flag next to the stored counters; the newest
+        `comment_limit` comments of each post are prefetched, newest first, into
+        `recent_comments`. Order is (data_criacao, id) descending for keyset paging.
+        """
+        liked = cls.likes.through.objects.filter(post_id=OuterRef('pk'), usuario_id=user.pk)
+        recent_comments = (Comment.objects
+                           .select_related('autor')
+                           .order_by('-data_criacao', '-id')[:comment_limit])
+        return (cls.objects
+                .select_related('autor')
+                .annotate(liked_by_me=Exists(liked))
+                .prefetch_related(Prefetch('comments', queryset=recent_comments, to_attr='recent_comments'))
+                .order_by('-data_criacao', '-id'))
+
     class Meta:
         ordering = ['-data_criacao']
+        indexes = [
+            models.Index(fields=['data_criacao', 'id'], name='post_feed_idx'),
+        ]
 
 
 class PostLikeEvent(models.Model):
@@ -156,10 +304,21 @@ class Conversation(models.Model):
     """Representa uma conversa entre dois usuários (estilo WhatsApp)."""
 
     conversation_key = models.CharField(max_length=64, unique=True)
-    participants = models.ManyToManyField(Usuario, related_name='chat_conversations')
+    participants = models.ManyToManyField(Usuario, through='ConversationMember', related_name='chat_conversations')
+    # Denormalized pointer to the newest message so the inbox never scans history.
+    last_message = models.ForeignKey(
+        'Message',
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='+'
+    )
+    last_message_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    TOUCH_WINDOW = timedelta(seconds=5)
+
     class Meta:
         ordering = ['-updated_at']
 
@@ -173,24 +332,175 @@ class Conversation(models.Model):
 
     @classmethod
     def get_or_create_private(cls, user_a, user_b):
+        """Return the private conversation between two users, creating it if needed.
+
+        An existing, complete conversation costs one query and no writes. A new
+        one is inserted together with both member rows in a single transaction,
+        so nobody can observe it half-built; when a concurrent caller wins the
+        `conversation_key` race the loser rolls back and returns the winner's row.
+        """
         key = cls.build_key(user_a.id, user_b.id)
-        conversation, created = cls.objects.get_or_create(conversation_key=key)
-        if created:
-            conversation.participants.add(user_a, user_b)
-        else:
-            current_ids = conversation.participants.values_list('id', flat=True)
-            missing = [u.id for u in (user_a, user_b) if u.id not in current_ids]
-            if missing:
-                conversation.participants.add(*missing)
-        conversation.touch()
+        user_ids = {user_a.id, user_b.id}
+        conversation = (cls.objects
+                        .filter(conversation_key=key)
+                        .annotate(member_count=Count('members', filter=Q(members__usuario_id__in=user_ids)))
+                        .first())
+        if conversation is not None and conversation.member_count == len(user_ids):
+            return conversation
+
+        try:
+            with transaction.atomic():
+                if conversation is None:
+                    conversation = cls.objects.create(conversation_key=key)
+                else:
+                    conversation.touch()  # members were missing; surface it in the inbox
+                ConversationMember.objects.bulk_create(
+                    [ConversationMember(conversation=conversation, usuario_id=uid) for uid in sorted(user_ids)],
+                    ignore_conflicts=True,
+                )
+        except IntegrityError:
+            # Another request created the conversation (and its members) first.
+            conversation = cls.objects.get(conversation_key=key)
         return conversation
 
+    @classmethod
+    def inbox_for(cls, user):
+        """Conversations of `user` with everything the inbox needs in one query.
+
+        `last_message_hidden` flags rows whose pointed message `user` cleared or
+        hid; for those `visible_last_message_id` falls back to the newest message
+        still visible to them (the subquery only runs for hidden rows). The
+        exception table is only probed for members with `hidden_count > 0`.
+        """
+        member = ConversationMember.objects.filter(conversation_id=OuterRef('pk'), usuario_id=user.pk)
+        hidden = HiddenMessage.objects.filter(message_id=OuterRef('last_message_id'), usuario_id=user.pk)
+        fallback = (Message.objects
+                    .filter(conversation_id=OuterRef('pk'), id__gt=OuterRef('member_cleared_up_to'))
+                    .exclude(Exists(HiddenMessage.objects.filter(message_id=OuterRef('pk'), usuario_id=user.pk)))
+                    .order_by('-created_at', '-id')
+                    .values('id')[:1])
+        return (cls.objects
+                .filter(participants=user)
+                .select_related('last_message__deleted_by')
+                .prefetch_related('participants')
+                .annotate(
+                    member_cleared_up_to=Subquery(member.values('cleared_up_to')),
+                    member_hidden_count=Subquery(member.values('hidden_count')),
+                )
+                .annotate(last_message_hidden=Case(
+                    When(last_message_id__lte=F('member_cleared_up_to'), then=True),
+                    When(member_hidden_count__gt=0, then=Exists(hidden)),
+                    default=False,
+                    output_field=models.BooleanField(),
+                ))
+                .annotate(visible_last_message_id=Case(
+                    When(last_message_hidden=True, then=Subquery(fallback)),
+                    default=F('last_message_id'),
+                )))
+
     def touch(self):
-        self.updated_at = timezone.now()
-        self.save(update_fields=['updated_at'])
+        """Bump `updated_at` with one UPDATE, coalescing bumps closer than TOUCH_WINDOW.
+
+        Inbox ordering does not need sub-second precision, so a conversation that
+        was bumped moments ago (by this instance or, via the WHERE clause, by any
+        other writer) is left alone. Returns True when the row was written.
+        """
+        now = timezone.now()
+        if self.updated_at and now - self.updated_at < self.TOUCH_WINDOW:
+            return False
+        written = (type(self).objects
+                   .filter(pk=self.pk, updated_at__lt=now - self.TOUCH_WINDOW)
+                   .update(updated_at=now))
+        if written:
+            self.updated_at = now
+        return bool(written)
+
+    def record_message(self, message):
+        """Point the inbox preview at `message` and bump `updated_at` in one UPDATE.
+
+        Meant to run in the transaction that inserted `message`. The pointer only
+        moves forward, so concurrent senders committing out of order cannot
+        leave an older message as the preview.
+        """
+        now = timezone.now()
+        (type(self).objects
+         .filter(Q(last_message__isnull=True) | Q(last_message_id__lt=message.pk), pk=self.pk)
+         .update(last_message=message, last_message_at=message.created_at, updated_at=now))
+        self.last_message = message
+        self.last_message_at = message.created_at
+        self.updated_at = now
 
     def other_participant(self, current_user):
-        return self.participants.exclude(pk=current_user.pk).first()
+        # Iterating .all() reuses prefetch_related('participants') when present.
+        for participant in self.participants.all():
+            if participant.pk != current_user.pk:
+                return participant
+        return None
+
+
+class ConversationMember(models.Model):
+    """A user's membership in a conversation and their view of its history.
+
+    Messages with `id <= cleared_up_to` are hidden for this user (cleared
+    conversation); individually hidden messages newer than that live in
+    `HiddenMessage`, and `hidden_count` lets queries skip that table entirely
+    in the common case of nothing hidden.
+    """
+
+    # Reuses the table Django created for the original auto M2M.
+    id = models.AutoField(primary_key=True)
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='members')
+    usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='conversation_memberships')
+    cleared_up_to = models.PositiveBigIntegerField(default=0)
+    hidden_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'usuarios_conversation_participants'
+        unique_together = ('conversation', 'usuario')
+
+    def __str__(self):
+        return f'{self.usuario_id} em {self.conversation_id}'
+
+    def hide(self, message):
+        """Hide one message for this member; return False if it was already hidden."""
+        if message.id <= self.cleared_up_to:
+            return False
+        _, created = HiddenMessage.objects.get_or_create(message=message, usuario_id=self.usuario_id)
+        if created:
+            type(self).objects.filter(pk=self.pk).update(hidden_count=F('hidden_count') + 1)
+            self.hidden_count += 1
+        return created
+
+    def clear(self, up_to):
+        """Hide everything up to message id `up_to` and fold older exceptions into the watermark."""
+        if up_to <= self.cleared_up_to:
+            return
+        with transaction.atomic():
+            HiddenMessage.objects.filter(
+                usuario_id=self.usuario_id,
+                message__conversation_id=self.conversation_id,
+                message_id__lte=up_to,
+            ).delete()
+            remaining = HiddenMessage.objects.filter(
+                usuario_id=self.usuario_id,
+                message__conversation_id=self.conversation_id,
+            ).count()
+            type(self).objects.filter(pk=self.pk).update(cleared_up_to=up_to, hidden_count=remaining)
+        self.cleared_up_to, self.hidden_count = up_to, remaining
+
+
+class MessageQuerySet(models.QuerySet):
+    def visible_to(self, member):
+        """Messages of `member`'s conversation that the member has not cleared or hidden."""
+        queryset = self.filter(conversation_id=member.conversation_id)
+        if member.cleared_up_to:
+            queryset = queryset.filter(id__gt=member.cleared_up_to)
+        if member.hidden_count:
+            queryset = queryset.exclude(Exists(HiddenMessage.objects.filter(
+                message_id=OuterRef('pk'),
+                usuario_id=member.usuario_id,
+            )))
+        return queryset
 
 
 class Message(models.Model):
@@ -199,7 +509,6 @@ class Message(models.Model):
     texto = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     is_read = models.BooleanField(default=False)
-    deleted_for = models.ManyToManyField(Usuario, related_name='hidden_messages', blank=True)
     deleted_for_everyone = models.BooleanField(default=False)
     deleted_for_everyone_at = models.DateTimeField(null=True, blank=True)
     deleted_by = models.ForeignKey(
@@ -210,13 +519,156 @@ class Message(models.Model):
         related_name='messages_deleted_globally'
     )
 
+    objects = MessageQuerySet.as_manager()
+
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['conversation', 'created_at', 'id'], name='message_conv_created_idx'),
+            # Only unread rows are indexed, so unread counts and read-marking stay
+            # small index scans however long the conversation gets.
+            models.Index(
+                fields=['conversation', 'autor', 'id'],
+                condition=models.Q(is_read=False),
+                name='message_unread_idx',
+            ),
+        ]
 
     def __str__(self):
         return f'Msg {self.autor.nome} -> {self.conversation_id}: {self.texto[:40]}'
 
 
+class HiddenMessage(models.Model):
+    """Sparse per-user exception: a message hidden ("apagar para mim") after the member's watermark."""
+
+    message = models.ForeignKey(Message, on_delete=models.CASCADE, related_name='+')
+    usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='hidden_messages')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['message', 'usuario'], name='hidden_message_unique'),
+        ]
+
+
+
+class Notification(models.Model):
+    """Inbox row for one recipient, written when the message/comment/like happens.
+
+    Title, icon and link are derived from `type` and `actor` at render time, so
+    only the text snippets are copied into the row.
+    """
+
+    MESSAGE = 'message'
+    COMMENT = 'comment'
+    LIKE = 'like'
+    TYPE_CHOICES = (
+        (MESSAGE, 'Chat'),
+        (COMMENT, 'Comentário'),
+        (LIKE, 'Curtida'),
+    )
+    TITLES = {
+        MESSAGE: '{} respondeu no chat',
+        COMMENT: '{} comentou no seu post',
+        LIKE: '{} curtiu seu post',
+    }
+    ICONS = {MESSAGE: 'forum', COMMENT: 'chat_bubble', LIKE: 'favorite'}
+
+    recipient = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='notifications')
+    actor = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='+')
+    type = models.CharField(max_length=20, choices=TYPE_CHOICES)
+    post = models.ForeignKey(Post, null=True, blank=True, on_delete=models.CASCADE, related_name='+')
+    message = models.ForeignKey(Message, null=True, blank=True, on_delete=models.CASCADE, related_name='+')
+    description = models.CharField(max_length=200, blank=True)
+    post_excerpt = models.CharField(max_length=120, blank=True)
+    is_read = models.BooleanField(default=False)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['-created_at', '-id']
+        indexes = [
+            models.Index(fields=['recipient', 'created_at', 'id'], name='notification_inbox_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.type} para {self.recipient_id}'
+
+    @property
+    def title(self):
+        return self.TITLES[self.type].format(self.actor.nome)
+
+    @property
+    def icon(self):
+        return self.ICONS[self.type]
+
+    @property
+    def cta_url(self):
+        return reverse('chat') if self.type == self.MESSAGE else reverse('social')
+
+    @property
+    def cta_label(self):
+        return 'Abrir chat' if self.type == self.MESSAGE else 'Ver na timeline'
+
+    @classmethod
+    def for_message(cls, message, recipient_ids):
+        recipient_ids = [pk for pk in recipient_ids if pk != message.autor_id]
+        unread_counters.notifications_added(recipient_ids)
+        preview = (message.texto or '').strip()
+        return cls.objects.bulk_create([
+            cls(
+                recipient_id=recipient_id,
+                actor_id=message.autor_id,
+                type=cls.MESSAGE,
+                message=message,
+                description=preview[:160] or 'Você tem uma nova resposta na conversa.',
+                created_at=message.created_at,
+            )
+            for recipient_id in recipient_ids
+        ])
+
+    @classmethod
+    def for_comment(cls, comment, post):
+        if post.autor_id == comment.autor_id:
+            return None
+        unread_counters.notifications_added([post.autor_id])
+        excerpt = (post.texto or '').strip()
+        return cls.objects.create(
+            recipient_id=post.autor_id,
+            actor_id=comment.autor_id,
+            type=cls.COMMENT,
+            post=post,
+            description=(comment.texto or '').strip()[:200] or 'Novo comentário no seu post.',
+            post_excerpt=excerpt[:120],
+            created_at=comment.data_criacao,
+        )
+
+    @classmethod
+    def for_like(cls, post_id, actor_id):
+        """Record a like; liking the same post again refreshes the existing row."""
+        row = Post.objects.filter(pk=post_id).values_list('autor_id', 'texto').first()
+        if row is None or row[0] == actor_id:
+            return
+        autor_id, texto = row
+        now = timezone.now()
+        refreshed = (cls.objects
+                     .filter(recipient_id=autor_id, actor_id=actor_id, type=cls.LIKE, post_id=post_id)
+                     .update(created_at=now, is_read=False))
+        if refreshed:
+            unread_counters.invalidate([autor_id])  # the row may or may not have been read
+        else:
+            unread_counters.notifications_added([autor_id])
+            excerpt = (texto or '').strip()
+            cls.objects.create(
+                recipient_id=autor_id,
+                actor_id=actor_id,
+                type=cls.LIKE,
+                post_id=post_id,
+                description=excerpt[:200] or 'Seu post recebeu um novo like.',
+                post_excerpt=excerpt[:120],
+                created_at=now,
+            )
+
+
 class Evento(models.Model):
     criador = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='eventos')
     titulo = models.CharField(max_length=120)
@@ -226,18 +678,143 @@ class Evento(models.Model):
     data = models.DateField()
     hora = models.TimeField()
     local = models.CharField(max_length=120)
+    # Accent-folded "titulo local" for the my_events search box; kept in sync by save().
+    busca = models.CharField(max_length=241, blank=True, editable=False)
+    # Optional coordinates of `local`; `geohash` is derived from them by save() (see usuarios.geo).
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    geohash = models.CharField(max_length=12, blank=True, db_index=True, editable=False)
     distancia = models.CharField(max_length=40, blank=True)
     max_participantes = models.PositiveIntegerField(null=True, blank=True)
     imagem_capa = models.ImageField(upload_to='eventos/capa/', blank=True)
     favorited_by = models.ManyToManyField('Usuario', related_name='favorited_eventos', blank=True)
+    # Denormalized from `favorited_by`; only `set_favorite()` writes the through table.
+    favorite_count = models.PositiveIntegerField(default=0)
     imagem_detalhe_1 = models.ImageField(upload_to='eventos/detalhes/', blank=True)
     imagem_detalhe_2 = models.ImageField(upload_to='eventos/detalhes/', blank=True)
     imagem_detalhe_3 = models.ImageField(upload_to='eventos/detalhes/', blank=True)
     criado_em = models.DateTimeField(auto_now_add=True)
     atualizado_em = models.DateTimeField(auto_now=True)
 
+    def save(self, *args, **kwargs):
+        self.busca = normalize_search_text(f'{self.titulo} {self.local}')
+        located = geo.valid_coordinates(self.latitude, self.longitude)
+        self.geohash = geo.encode(self.latitude, self.longitude) if located else ''
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            derived = set()
+            if {'titulo', 'local'}.intersection(update_fields):
+                derived.add('busca')
+            if {'latitude', 'longitude'}.intersection(update_fields):
+                derived.add('geohash')
+            if derived:
+                kwargs['update_fields'] = {*update_fields, *derived}
+        super().save(*args, **kwargs)
+
+    def set_favorite(self, user, favorited):
+        """Make `user`'s favorite on this event match `favorited`; return the count change.
+
+        Checks the through row directly, so the cost does not depend on how many
+        people favorited the event. The insert runs in a savepoint: if a concurrent
+        request already created the row, the favorite simply stands.
+        """
+        through = Evento.favorited_by.through
+        rows = through.objects.filter(evento_id=self.pk, usuario_id=user.pk)
+        with transaction.atomic():
+            if not favorited:
+                delta = -rows.delete()[0]
+            elif rows.exists():
+                delta = 0
+            else:
+                try:
+                    with transaction.atomic():
+                        through.objects.create(evento_id=self.pk, usuario_id=user.pk)
+                    delta = 1
+                except IntegrityError:
+                    delta = 0
+            if delta:
+                Evento.objects.filter(pk=self.pk).update(favorite_count=F('favorite_count') + delta)
+        return delta
+
+    def toggle_favorite(self, user):
+        """Flip `user`'s favorite on this event; return `(favorited, favorite_count)` afterwards."""
+        with transaction.atomic():
+            favorited = not self.favorited_by.through.objects.filter(evento_id=self.pk, usuario_id=user.pk).exists()
+            self.set_favorite(user, favorited)
+            self.favorite_count = Evento.objects.filter(pk=self.pk).values_list('favorite_count', flat=True).get()
+        return favorited, self.favorite_count
+
+    @classmethod
+    def set_favorites(cls, user, states):
+        """Apply a batch of `{evento_id: favorited}` for `user` in one transaction.
+
+        Unknown ids are skipped. Returns `{evento_id: (favorited, favorite_count)}`
+        for the events that exist, with counts read after every change.
+        """
+        with transaction.atomic():
+            ids = sorted(cls.objects.filter(pk__in=states).values_list('pk', flat=True))
+            for evento_id in ids:
+                cls(pk=evento_id).set_favorite(user, states[evento_id])
+            counts = dict(cls.objects.filter(pk__in=ids).values_list('pk', 'favorite_count'))
+        return {evento_id: (states[evento_id], counts[evento_id]) for evento_id in ids}
+
+    @classmethod
+    def with_favorited(cls, user):
+        """All events, each flagged `is_favorited` for `user`."""
+        favorited = cls.favorited_by.through.objects.filter(evento_id=OuterRef('pk'), usuario_id=user.pk)
+        return cls.objects.annotate(is_favorited=Exists(favorited))
+
+    @classmethod
+    def listing_for(cls, user, *, archive=False, today=None):
+        """Events flagged `is_favorited` for `user`, split at `today` (local date by default).
+
+        The default upcoming listing holds `data >= today`, soonest first; the
+        archive holds older events, newest first. Both order by (data, hora,
+        criado_em, id), a unique key that `keyset_after()` cuts pages on, and
+        both are range scans of `evento_listing_idx`, so the default query never
+        reads past rows.
+        """
+        today = today or timezone.localdate()
+        eventos = cls.with_favorited(user)
+        if archive:
+            return eventos.filter(data__lt=today).order_by('-data', '-hora', '-criado_em', '-id')
+        return eventos.filter(data__gte=today).order_by('data', 'hora', 'criado_em', 'id')
+
+    @classmethod
+    def nearby_for(cls, user, latitude, longitude, radius_km):
+        """Upcoming located events within `radius_km`, nearest first, annotated `distance_km`.
+
+        Candidates come from the geohash cells around the origin (index range
+        scans); only they are ranked by haversine distance.
+        """
+        eventos = cls.listing_for(user).filter(latitude__isnull=False, longitude__isnull=False)
+        prefixes = geo.candidate_prefixes(latitude, longitude, radius_km)
+        if prefixes is not None:
+            eventos = eventos.filter(geo.prefix_filter('geohash', prefixes))
+        return (eventos
+                .annotate(distance_km=geo.distance_km(latitude, longitude))
+                .filter(distance_km__lte=radius_km)
+                .order_by('distance_km', 'data', 'hora', 'id'))
+
+    @classmethod
+    def keyset_after(cls, evento_id, *, archive=False):
+        """Filter for the events listed after `evento_id`, or None if it does not exist."""
+        anchor = cls.objects.filter(pk=evento_id).values('data', 'hora', 'criado_em').first()
+        if anchor is None:
+            return None
+        data, hora, criado_em = anchor['data'], anchor['hora'], anchor['criado_em']
+        op = 'lt' if archive else 'gt'
+        return (Q(**{f'data__{op}': data}) |
+                Q(data=data, **{f'hora__{op}': hora}) |
+                Q(data=data, hora=hora, **{f'criado_em__{op}': criado_em}) |
+                Q(data=data, hora=hora, criado_em=criado_em, **{f'id__{op}': evento_id}))
+
     class Meta:
         ordering = ['-data', '-hora', '-criado_em']
+        indexes = [
+            models.Index(fields=['data', 'hora', 'criado_em', 'id'], name='evento_listing_idx'),
+            models.Index(fields=['criador', 'busca'], name='evento_criador_busca_idx'),
+        ]
 
     def __str__(self):
         return f'{self.titulo} - {self.data:%d/%m/%Y}'
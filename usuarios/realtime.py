@@ -6,6 +6,12 @@ from channels.db import database_sync_to_async
 from channels.middleware import BaseMiddleware
 
 from .models import Usuario
+from .user_cache import usuario_cache
+
+
+def user_group_name(user_id: int) -> str:
+    """Channel layer group every socket of `user_id` joins."""
+    return f'user_{user_id}'
 
 
 @database_sync_to_async
@@ -15,10 +21,7 @@ def _get_usuario_from_session(session) -> Optional[Usuario]:
     user_id = session.get('usuario_id')
     if not user_id:
         return None
-    try:
-        return Usuario.objects.get(pk=user_id)
-    except Usuario.DoesNotExist:
-        return None
+    return usuario_cache.get(user_id)
 
 
 class UsuarioAuthMiddleware(BaseMiddleware):
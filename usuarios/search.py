@@ -0,0 +1,170 @@
+"""Full-text search over chat messages, scoped to the caller's conversations.
+
+The index depends on the database behind `DATABASE_URL`:
+
+* SQLite: the FTS5 table `usuarios_message_fts` (external content over
+  `usuarios_message`), kept in sync by triggers on insert, delete and
+  delete-for-everyone; ranked with `bm25()` and excerpted with `snippet()`.
+* PostgreSQL: the GIN expression index `message_search_idx` on
+  `to_tsvector('portuguese', texto)`; ranked with `ts_rank()` and excerpted
+  with `ts_headline()`.
+
+Any other backend, or SQLite builds without FTS5, falls back to `LIKE` filters
+ordered by recency. Both indexes are created by migration 0022.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Any, Dict, List, Optional
+
+from django.db import connection
+from django.utils.html import escape
+
+FTS_TABLE = 'usuarios_message_fts'
+PG_CONFIG = 'portuguese'
+SNIPPET_WORDS = 16
+
+# Private-use delimiters survive escaping and are swapped for <mark> afterwards.
+_START, _STOP = '\ue000', '\ue001'
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+_fts_available: Dict[str, bool] = {}
+
+# Per-member visibility, the same rules as Message.objects.visible_to().
+_VISIBLE_SQL = '''
+    m.deleted_for_everyone = %s
+    AND m.id > p.cleared_up_to
+    AND (p.hidden_count = 0 OR NOT EXISTS (
+        SELECT 1 FROM usuarios_hiddenmessage h WHERE h.message_id = m.id AND h.usuario_id = p.usuario_id
+    ))
+'''
+
+
+def query_tokens(term: str) -> List[str]:
+    """Words of the user's query; operators and quotes are never passed through."""
+    return _TOKEN_RE.findall(term.lower())[:8]
+
+
+def _highlight(text: str) -> str:
+    return escape(text).replace(_START, '<mark>').replace(_STOP, '</mark>')
+
+
+def _sqlite_has_fts() -> bool:
+    alias = connection.alias
+    if alias not in _fts_available:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+            _fts_available[alias] = cursor.fetchone() is not None
+    return _fts_available[alias]
+
+
+def _run(sql: str, params: list) -> List[tuple]:
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def _filters(conversation_id: Optional[int]):
+    sql = _VISIBLE_SQL
+    params: list = [False]
+    if conversation_id:
+        sql += ' AND m.conversation_id = %s'
+        params.append(conversation_id)
+    return sql, params
+
+
+def _search_sqlite(tokens, user_id, conversation_id, limit, offset):
+    match = ' '.join(f'"{token}"*' for token in tokens)
+    where, params = _filters(conversation_id)
+    sql = f'''
+        SELECT m.id, snippet({FTS_TABLE}, 0, %s, %s, '…', {SNIPPET_WORDS}) AS excerpt
+        FROM {FTS_TABLE} f
+        JOIN usuarios_message m ON m.id = f.rowid
+        JOIN usuarios_conversation_participants p
+            ON p.conversation_id = m.conversation_id AND p.usuario_id = %s
+        WHERE {FTS_TABLE} MATCH %s AND {where}
+        ORDER BY bm25({FTS_TABLE}), m.id DESC
+        LIMIT %s OFFSET %s
+    '''
+    return _run(sql, [_START, _STOP, user_id, match, *params, limit, offset])
+
+
+def _search_postgres(tokens, user_id, conversation_id, limit, offset):
+    tsquery = ' & '.join(f'{token}:*' for token in tokens)
+    where, params = _filters(conversation_id)
+    vector = f"to_tsvector('{PG_CONFIG}', m.texto)"
+    options = f'StartSel={_START}, StopSel={_STOP}, MaxWords={SNIPPET_WORDS}, MinWords=4'
+    sql = f'''
+        SELECT m.id, ts_headline('{PG_CONFIG}', m.texto, q, %s) AS excerpt
+        FROM usuarios_message m
+        JOIN usuarios_conversation_participants p
+            ON p.conversation_id = m.conversation_id AND p.usuario_id = %s
+        CROSS JOIN to_tsquery('{PG_CONFIG}', %s) q
+        WHERE {vector} @@ q AND {where}
+        ORDER BY ts_rank({vector}, q) DESC, m.id DESC
+        LIMIT %s OFFSET %s
+    '''
+    return _run(sql, [options, user_id, tsquery, *params, limit, offset])
+
+
+def _search_fallback(tokens, user_id, conversation_id, limit, offset):
+    where, params = _filters(conversation_id)
+    for token in tokens:
+        where += ' AND LOWER(m.texto) LIKE %s'
+        params.append(f'%{token}%')
+    sql = f'''
+        SELECT m.id, m.texto
+        FROM usuarios_message m
+        JOIN usuarios_conversation_participants p
+            ON p.conversation_id = m.conversation_id AND p.usuario_id = %s
+        WHERE {where}
+        ORDER BY m.id DESC
+        LIMIT %s OFFSET %s
+    '''
+    pattern = re.compile('|'.join(re.escape(token) for token in tokens), re.IGNORECASE)
+    return [
+        (message_id, pattern.sub(lambda match: f'{_START}{match.group(0)}{_STOP}', texto or ''))
+        for message_id, texto in _run(sql, [user_id, *params, limit, offset])
+    ]
+
+
+def search_messages(user, term: str, *, conversation_id: Optional[int] = None,
+                    limit: int = 20, offset: int = 0) -> Dict[str, Any]:
+    """Best matches for `term` among messages `user` can still see.
+
+    Returns `{'results': [...], 'next_offset': int | None}`; each result carries
+    the message and conversation ids, author, timestamp and an HTML-escaped
+    snippet with the matched words wrapped in `<mark>`.
+    """
+    from .chat_serializers import serialize_user
+    from .models import Message
+
+    tokens = query_tokens(term)
+    if not tokens:
+        return {'results': [], 'next_offset': None}
+
+    if connection.vendor == 'postgresql':
+        backend = _search_postgres
+    elif connection.vendor == 'sqlite' and _sqlite_has_fts():
+        backend = _search_sqlite
+    else:
+        backend = _search_fallback
+    rows = backend(tokens, user.pk, conversation_id, limit + 1, offset)
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    messages = Message.objects.select_related('autor').in_bulk([row[0] for row in rows])
+    results = []
+    for message_id, excerpt in rows:
+        message = messages.get(message_id)
+        if message is None:
+            continue
+        results.append({
+            'message_id': message.id,
+            'conversation_id': message.conversation_id,
+            'author': serialize_user(message.autor),
+            'created_at': message.created_at.isoformat(),
+            'snippet': _highlight(excerpt or ''),
+        })
+    return {'results': results, 'next_offset': offset + limit if has_more else None}
@@ -22,6 +22,7 @@ document.addEventListener('DOMContentLoaded', () => {
   const msgInput = document.getElementById('msgInput');
   const sendBtn = document.getElementById('sendBtn');
   const backBtn = document.querySelector('.voltarBtn');
+  const clearBtn = document.querySelector('.limparBtn');
   const sidebar = document.querySelector('.sidebar.contatos');
   const mobileQuery = window.matchMedia('(max-width: 768px)');
   const isMobile = () => mobileQuery.matches;
@@ -31,6 +32,7 @@ document.addEventListener('DOMContentLoaded', () => {
   const defaultAvatar = staticConfig.defaultAvatar || dataset.currentAvatar || '';
   const currentUserName = dataset.currentUser || staticConfig.currentUserName || 'Você';
   const currentUserAvatar = dataset.currentAvatar || staticConfig.currentUserAvatar || defaultAvatar;
+  const currentUserId = Number(dataset.currentUserId) || null;
 
   const endpoints = {
     conversations: dataset.conversationsUrl,
@@ -39,6 +41,9 @@ document.addEventListener('DOMContentLoaded', () => {
     messagesTemplate: dataset.messagesUrlTemplate,
     sendTemplate: dataset.sendUrlTemplate,
     deleteTemplate: dataset.deleteUrlTemplate,
+    readTemplate: dataset.readUrlTemplate,
+    clearTemplate: dataset.clearUrlTemplate,
+    counters: dataset.countersUrl,
   };
 
   const state = {
@@ -46,16 +51,16 @@ document.addEventListener('DOMContentLoaded', () => {
     filteredConversations: null,
     activeConversationId: null,
     messagesCache: {},
+    cursors: {},
+    unread: {},
+    loadingOlder: false,
     searchTimeout: null,
     searchResults: [],
     mobileView: null,
     lastSearchTerm: '',
     hasLoadedConversations: false,
-    liveInterval: null,
-    isRefreshing: false,
-    messageInterval: null,
     socket: null,
-    socketConversationId: null,
+    socketHasConnected: false,
     socketAutoReconnect: false,
     socketReconnectTimer: null,
     socketReconnectAttempts: 0,
@@ -115,6 +120,15 @@ document.addEventListener('DOMContentLoaded', () => {
     return template.replace('__ID__', String(id));
   };
 
+  const withQuery = (url, params) => {
+    const query = Object.entries(params)
+      .filter(([, value]) => value !== null && value !== undefined && value !== '')
+      .map(([key, value]) => `${encodeURIComponent(key)}=${encodeURIComponent(value)}`)
+      .join('&');
+    if (!query) return url;
+    return `${url}${url.includes('?') ? '&' : '?'}${query}`;
+  };
+
   const buildDeleteUrl = (template, messageId) => {
     if (!template || !messageId) return null;
     if (template.includes('__ID__')) {
@@ -264,6 +278,9 @@ document.addEventListener('DOMContentLoaded', () => {
     const time = document.createElement('span');
     time.className = 'time';
     time.textContent = formatTime(message.created_at) || '';
+    if (message.is_self && message.is_read && !isDeleted) {
+      time.textContent += ' · Lida';
+    }
     wrapper.appendChild(time);
 
     if (canDeleteForSelf || canDeleteForAll) {
@@ -356,6 +373,7 @@ document.addEventListener('DOMContentLoaded', () => {
       const item = document.createElement('li');
       item.className = 'contact-card';
       item.dataset.conversationId = conversation.id;
+      const unreadCount = conversation.id === state.activeConversationId ? 0 : (state.unread[conversation.id] || 0);
 
       const avatar = document.createElement('div');
       avatar.className = 'contact-avatar';
@@ -372,6 +390,7 @@ document.addEventListener('DOMContentLoaded', () => {
           <strong>${partner?.name || partner?.handle || 'Contato'}</strong>
           <span class="contact-time">${formatTime(conversation.last_message_at) || ''}</span>
         </div>
+        ${unreadCount ? `<span class="contact-unread" aria-label="${unreadCount} mensagens não lidas">${unreadCount}</span>` : ''}
         <p>${conversation.last_message || 'Sem mensagens ainda'}</p>
       `;
 
@@ -392,6 +411,35 @@ document.addEventListener('DOMContentLoaded', () => {
     });
   };
 
+  // Unread badges come from the server-side counter cache; realtime events and
+  // opening a conversation keep the local copy current in between.
+  async function loadUnreadCounters() {
+    if (!endpoints.counters) return;
+    try {
+      const data = await apiFetch(endpoints.counters);
+      state.unread = {};
+      Object.entries(data.messages || {}).forEach(([conversationId, count]) => {
+        state.unread[Number(conversationId)] = count;
+      });
+      renderConversations();
+    } catch (error) {
+      realtimeLog('loadUnreadCounters error', error?.message);
+    }
+  }
+
+  // Marks up to the newest message we actually hold, so nothing unseen is flagged.
+  const markConversationRead = async (conversationId) => {
+    const url = buildUrl(endpoints.readTemplate, conversationId);
+    if (!url) return;
+    state.unread[conversationId] = 0;
+    const upTo = state.cursors[conversationId]?.next;
+    try {
+      await apiFetch(url, { method: 'POST', body: JSON.stringify(upTo ? { up_to: upTo } : {}) });
+    } catch (error) {
+      realtimeLog('markConversationRead error', error?.message);
+    }
+  };
+
   const upsertConversation = (conversation) => {
     const idx = state.conversations.findIndex((conv) => conv.id === conversation.id);
     if (idx >= 0) {
@@ -409,6 +457,44 @@ document.addEventListener('DOMContentLoaded', () => {
     renderConversations();
   };
 
+  const sortMessages = (cache) => {
+    cache.sort((a, b) => {
+      const diff = new Date(a.created_at).getTime() - new Date(b.created_at).getTime();
+      return diff || a.id - b.id;
+    });
+  };
+
+  const advanceNextCursor = (conversationId, messageId) => {
+    if (!messageId) return;
+    const cursors = state.cursors[conversationId] || (state.cursors[conversationId] = {});
+    if (!cursors.next || messageId > cursors.next) {
+      cursors.next = messageId;
+    }
+  };
+
+  // Merge a window of messages into the cache; returns how many were new.
+  const mergeMessages = (conversationId, messages) => {
+    if (!state.messagesCache[conversationId]) {
+      state.messagesCache[conversationId] = [];
+    }
+    const cache = state.messagesCache[conversationId];
+    let added = 0;
+    messages.forEach((message) => {
+      const existingIndex = cache.findIndex((item) => item.id === message.id);
+      if (existingIndex >= 0) {
+        cache[existingIndex] = message;
+      } else {
+        cache.push(message);
+        added += 1;
+      }
+      advanceNextCursor(conversationId, message.id);
+    });
+    if (added) {
+      sortMessages(cache);
+    }
+    return added;
+  };
+
   const ensureMessages = async (conversationId, { force = false } = {}) => {
     if (!force && state.messagesCache[conversationId]) {
       realtimeLog('ensureMessages using cache', conversationId, state.messagesCache[conversationId].length);
@@ -422,38 +508,84 @@ document.addEventListener('DOMContentLoaded', () => {
 
     const data = await apiFetch(url);
     state.messagesCache[conversationId] = data.messages || [];
+    state.cursors[conversationId] = { prev: data.prev_cursor || null, next: data.next_cursor || null };
     realtimeLog('ensureMessages fetched', conversationId, state.messagesCache[conversationId].length);
     return state.messagesCache[conversationId];
   };
 
+  // Fetch only the messages newer than the last one we have seen.
+  const fetchNewMessages = async (conversationId) => {
+    const cursor = state.cursors[conversationId]?.next;
+    if (!cursor) {
+      await ensureMessages(conversationId, { force: true });
+      return true;
+    }
+
+    const baseUrl = buildUrl(endpoints.messagesTemplate, conversationId);
+    if (!baseUrl) return false;
+    let added = 0;
+    let data;
+    do {
+      data = await apiFetch(withQuery(baseUrl, { after: state.cursors[conversationId].next }));
+      added += mergeMessages(conversationId, data.messages || []);
+    } while (data.has_more && (data.messages || []).length);
+    realtimeLog('fetchNewMessages', conversationId, added);
+    return added > 0;
+  };
+
+  const loadOlderMessages = async (conversationId) => {
+    const cursor = state.cursors[conversationId]?.prev;
+    if (!cursor || state.loadingOlder) return;
+    const baseUrl = buildUrl(endpoints.messagesTemplate, conversationId);
+    if (!baseUrl) return;
+
+    state.loadingOlder = true;
+    try {
+      const data = await apiFetch(withQuery(baseUrl, { before: cursor }));
+      mergeMessages(conversationId, data.messages || []);
+      state.cursors[conversationId].prev = data.prev_cursor || null;
+      if (state.activeConversationId === conversationId) {
+        renderMessages(conversationId, { stickToBottom: false });
+      }
+    } catch (error) {
+      realtimeLog('loadOlderMessages error', error?.message);
+    } finally {
+      state.loadingOlder = false;
+    }
+  };
+
   const selectConversation = async (conversationId) => {
-    stopMessagePolling();
-    disconnectConversationSocket();
     state.activeConversationId = conversationId;
     highlightConversation(conversationId);
     const conversation = state.conversations.find((conv) => conv.id === conversationId);
     updateConversationHeader(conversation?.partner);
     renderEmptyMessagesState('Carregando mensagens...');
 
+    const hadUnread = Boolean(state.unread[conversationId]);
+    if (hadUnread) {
+      state.unread[conversationId] = 0;
+      renderConversations();
+    }
+
     try {
       await ensureMessages(conversationId);
       renderMessages(conversationId);
+      if (hadUnread) {
+        markConversationRead(conversationId);
+      }
       if (isMobile()) {
         setMobileView('chat');
       }
-      connectConversationSocket(conversationId);
-      startMessagePolling();
     } catch (error) {
       notify(error.message, 'error');
       renderEmptyMessagesState('Não foi possível carregar as mensagens.');
-      disconnectConversationSocket();
     }
   };
 
   async function loadConversations({ silent = false } = {}) {
     if (!endpoints.conversations) return;
     try {
-      realtimeLog('loadConversations tick');
+      realtimeLog('loadConversations');
       const data = await apiFetch(endpoints.conversations);
       const previousActive = state.activeConversationId;
       state.conversations = data.conversations || [];
@@ -466,12 +598,9 @@ document.addEventListener('DOMContentLoaded', () => {
         if (state.conversations.length && !previousActive && !isMobile()) {
           selectConversation(state.conversations[0].id);
         }
-        startLiveUpdates();
       } else if (previousActive && !state.conversations.some((conv) => conv.id === previousActive)) {
         state.activeConversationId = null;
         renderEmptyMessagesState('Esta conversa não está mais disponível.');
-        stopMessagePolling();
-        disconnectConversationSocket();
       }
 
       if (state.activeConversationId) {
@@ -501,16 +630,30 @@ document.addEventListener('DOMContentLoaded', () => {
     const wasAtBottom = isNearBottom(messagesContainer);
 
     try {
-      realtimeLog('refreshActiveConversationMessages tick', conversationId);
-      await ensureMessages(conversationId, { force: true });
-      renderMessages(conversationId, { stickToBottom: wasAtBottom });
-      realtimeLog('refreshActiveConversationMessages rendered', conversationId);
+      realtimeLog('refreshActiveConversationMessages', conversationId);
+      const changed = await fetchNewMessages(conversationId);
+      if (changed && state.activeConversationId === conversationId) {
+        renderMessages(conversationId, { stickToBottom: wasAtBottom });
+      }
     } catch (error) {
-      // Falha silenciosa em atualizações em tempo real.
       realtimeLog('refreshActiveConversationMessages error', error?.message);
     }
   }
 
+  // After a reconnect we may have missed events: refresh the inbox, pull the
+  // active conversation's deltas and drop other caches so they reload on open.
+  async function resyncAfterReconnect() {
+    Object.keys(state.messagesCache).forEach((key) => {
+      if (Number(key) !== state.activeConversationId) {
+        delete state.messagesCache[key];
+        delete state.cursors[key];
+      }
+    });
+    await loadConversations({ silent: true });
+    await loadUnreadCounters();
+    await refreshActiveConversationMessages();
+  }
+
   const clearSocketReconnect = () => {
     if (state.socketReconnectTimer) {
       clearTimeout(state.socketReconnectTimer);
@@ -518,7 +661,7 @@ document.addEventListener('DOMContentLoaded', () => {
     }
   };
 
-  const disconnectConversationSocket = () => {
+  const disconnectSocket = () => {
     state.socketAutoReconnect = false;
     clearSocketReconnect();
     if (state.socket) {
@@ -529,30 +672,19 @@ document.addEventListener('DOMContentLoaded', () => {
       }
     }
     state.socket = null;
-    state.socketConversationId = null;
   };
 
-  const scheduleSocketReconnect = (conversationId) => {
+  const scheduleSocketReconnect = () => {
     clearSocketReconnect();
-    if (!state.socketAutoReconnect) {
+    if (!state.socketAutoReconnect || document.hidden) {
       return;
     }
     state.socketReconnectAttempts += 1;
-    if (state.socketReconnectAttempts > state.socketMaxRetries) {
-      state.socketAutoReconnect = false;
-      notify('Conexão em tempo real indisponível. Mantendo atualização a cada 2s.', 'info');
-      startMessagePolling();
-      return;
+    const delay = Math.min(30000, 1000 * 2 ** Math.min(state.socketReconnectAttempts - 1, 5));
+    if (state.socketReconnectAttempts === state.socketMaxRetries) {
+      notify('Conexão em tempo real instável. Tentando reconectar...', 'info');
     }
-
-    state.socketReconnectTimer = setTimeout(() => {
-      if (document.hidden) {
-        return;
-      }
-      if (state.activeConversationId === conversationId) {
-        connectConversationSocket(conversationId);
-      }
-    }, 5000);
+    state.socketReconnectTimer = setTimeout(connectSocket, delay);
   };
 
   const upsertMessageInCache = (message) => {
@@ -560,21 +692,12 @@ document.addEventListener('DOMContentLoaded', () => {
       return;
     }
     const conversationId = message.conversation_id;
-    if (!conversationId) {
+    // Conversations never opened are fetched in full when selected.
+    if (!conversationId || !state.messagesCache[conversationId]) {
       return;
     }
 
-    if (!state.messagesCache[conversationId]) {
-      state.messagesCache[conversationId] = [];
-    }
-    const cache = state.messagesCache[conversationId];
-    const existingIndex = cache.findIndex((item) => item.id === message.id);
-    if (existingIndex >= 0) {
-      cache[existingIndex] = message;
-    } else {
-      cache.push(message);
-      cache.sort((a, b) => new Date(a.created_at).getTime() - new Date(b.created_at).getTime());
-    }
+    mergeMessages(conversationId, [message]);
 
     if (state.activeConversationId === conversationId) {
       const stickToBottom = isNearBottom(messagesContainer);
@@ -582,6 +705,59 @@ document.addEventListener('DOMContentLoaded', () => {
     }
   };
 
+  const removeMessageFromCache = (conversationId, messageId) => {
+    const cache = state.messagesCache[conversationId];
+    if (!cache) return;
+    state.messagesCache[conversationId] = cache.filter((item) => item.id !== messageId);
+    if (state.activeConversationId === conversationId) {
+      renderMessages(conversationId, { stickToBottom: false });
+    }
+  };
+
+  // The server only moved our watermark; everything cached for it is now hidden.
+  const applyConversationCleared = (conversation) => {
+    if (!conversation?.id) return;
+    state.messagesCache[conversation.id] = [];
+    state.cursors[conversation.id] = { prev: null, next: state.cursors[conversation.id]?.next || null };
+    state.unread[conversation.id] = 0;
+    if (state.activeConversationId === conversation.id) {
+      renderEmptyMessagesState('Conversa limpa.');
+    }
+    upsertConversation(conversation);
+  };
+
+  const trackIncomingMessage = (message) => {
+    if (message.is_self || message.is_deleted_for_all) return;
+    const conversationId = message.conversation_id;
+    if (conversationId === state.activeConversationId && !document.hidden) {
+      markConversationRead(conversationId);
+      return;
+    }
+    state.unread[conversationId] = (state.unread[conversationId] || 0) + 1;
+    renderConversations();
+  };
+
+  const applyReadReceipt = ({ conversation_id: conversationId, reader_id: readerId, up_to: upTo }) => {
+    if (readerId === currentUserId) {
+      // Read on another tab/device.
+      state.unread[conversationId] = 0;
+      renderConversations();
+      return;
+    }
+    const cache = state.messagesCache[conversationId];
+    if (!cache) return;
+    let changed = false;
+    cache.forEach((message) => {
+      if (message.is_self && !message.is_read && (!upTo || message.id <= upTo)) {
+        message.is_read = true;
+        changed = true;
+      }
+    });
+    if (changed && state.activeConversationId === conversationId) {
+      renderMessages(conversationId, { stickToBottom: isNearBottom(messagesContainer) });
+    }
+  };
+
   const handleRealtimePayload = (payload) => {
     if (!payload) return;
     if (payload.conversation) {
@@ -592,6 +768,7 @@ document.addEventListener('DOMContentLoaded', () => {
     }
     if (payload.message) {
       upsertMessageInCache(payload.message);
+      trackIncomingMessage(payload.message);
     }
   };
 
@@ -604,122 +781,67 @@ document.addEventListener('DOMContentLoaded', () => {
       return;
     }
 
-    if (payload.event === 'message') {
+    if (payload.event === 'message' || payload.event === 'conversation') {
       handleRealtimePayload(payload);
+    } else if (payload.event === 'read') {
+      applyReadReceipt(payload);
+    } else if (payload.event === 'message_hidden') {
+      removeMessageFromCache(payload.conversation?.id, payload.message_id);
+      handleRealtimePayload({ conversation: payload.conversation });
+    } else if (payload.event === 'conversation_cleared') {
+      applyConversationCleared(payload.conversation);
     }
   };
 
-  const connectConversationSocket = (conversationId) => {
-    if (!conversationId) {
-      disconnectConversationSocket();
+  // One socket per page: the server pushes events for every conversation of
+  // the user, so switching conversations never reconnects.
+  function connectSocket() {
+    if (state.socket) {
       return;
     }
-
-    disconnectConversationSocket();
+    clearSocketReconnect();
     state.socketAutoReconnect = true;
-    state.socketReconnectAttempts = 0;
 
     const protocol = window.location.protocol === 'https:' ? 'wss' : 'ws';
-    const url = `${protocol}://${window.location.host}/ws/chat/${conversationId}/`;
+    const url = `${protocol}://${window.location.host}/ws/chat/`;
     let socket;
     try {
       socket = new WebSocket(url);
     } catch (e) {
       realtimeLog('socket construct failed', e);
-      state.socketAutoReconnect = false;
-      startMessagePolling();
+      scheduleSocketReconnect();
       return;
     }
     state.socket = socket;
-    state.socketConversationId = conversationId;
 
     socket.addEventListener('open', () => {
-      clearSocketReconnect();
+      const isReconnect = state.socketReconnectAttempts > 0 || state.socketHasConnected;
       state.socketReconnectAttempts = 0;
-      realtimeLog('socket connected', conversationId);
+      state.socketHasConnected = true;
+      realtimeLog('socket connected');
+      if (isReconnect) {
+        resyncAfterReconnect();
+      }
     });
 
     socket.addEventListener('message', (event) => handleSocketMessage(event.data));
 
     socket.addEventListener('close', (event) => {
-      realtimeLog('socket closed', conversationId, event.code, event.reason);
-      startMessagePolling();
+      realtimeLog('socket closed', event.code, event.reason);
       if (state.socket === socket) {
         state.socket = null;
-        state.socketConversationId = null;
       }
-      // If abnormal close (e.g., 1006), stop reconnecting this session
-      if (event && event.code === 1006) {
+      // 4401: the session expired; reconnecting will not help.
+      if (event && event.code === 4401) {
         state.socketAutoReconnect = false;
+        return;
       }
-      if (state.socketAutoReconnect && !document.hidden) {
-        startMessagePolling();
-        scheduleSocketReconnect(conversationId);
-      }
+      scheduleSocketReconnect();
     });
 
     socket.addEventListener('error', (event) => {
-      realtimeLog('socket error', conversationId, event);
-      // Disable auto-reconnect on persistent errors to avoid UI flicker
-      state.socketAutoReconnect = false;
-      try {
-        socket.close();
-      } catch (_) {
-        /* noop */
-      }
+      realtimeLog('socket error', event);
     });
-  };
-
-    const stopMessagePolling = () => {
-      if (state.messageInterval) {
-        clearInterval(state.messageInterval);
-        state.messageInterval = null;
-      }
-    };
-
-    const startMessagePolling = () => {
-      stopMessagePolling();
-      if (!state.activeConversationId) {
-        return;
-      }
-
-      const tick = async () => {
-        if (document.hidden || !state.activeConversationId) {
-          return;
-        }
-        realtimeLog('message poll tick', state.activeConversationId);
-        await refreshActiveConversationMessages();
-      };
-
-      tick();
-      state.messageInterval = setInterval(tick, 2000);
-    };
-
-  function stopLiveUpdates() {
-    if (state.liveInterval) {
-      clearInterval(state.liveInterval);
-      state.liveInterval = null;
-    }
-  }
-
-  function startLiveUpdates() {
-    if (state.liveInterval) {
-      return;
-    }
-    const tick = async () => {
-      if (state.isRefreshing || document.hidden) {
-        return;
-      }
-      realtimeLog('live updates tick');
-      state.isRefreshing = true;
-      try {
-        await loadConversations({ silent: true });
-        await refreshActiveConversationMessages();
-      } finally {
-        state.isRefreshing = false;
-      }
-    };
-    state.liveInterval = setInterval(tick, 3000);
   }
 
   const handleSendMessage = async () => {
@@ -741,10 +863,7 @@ document.addEventListener('DOMContentLoaded', () => {
     try {
       const payload = JSON.stringify({ text });
       const data = await apiFetch(url, { method: 'POST', body: payload });
-      if (!state.messagesCache[state.activeConversationId]) {
-        state.messagesCache[state.activeConversationId] = [];
-      }
-      state.messagesCache[state.activeConversationId].push(data.message);
+      mergeMessages(state.activeConversationId, [data.message]);
       renderMessages(state.activeConversationId);
 
       const conversation = state.conversations.find((conv) => conv.id === state.activeConversationId);
@@ -796,6 +915,21 @@ document.addEventListener('DOMContentLoaded', () => {
     }
   };
 
+  const clearConversation = async (conversationId) => {
+    const url = buildUrl(endpoints.clearTemplate, conversationId);
+    if (!url) {
+      notify('Endpoint indisponível.', 'error');
+      return;
+    }
+    try {
+      const data = await apiFetch(url, { method: 'POST' });
+      applyConversationCleared(data.conversation);
+      notify('Conversa limpa para você.', 'success');
+    } catch (error) {
+      notify(error.message, 'error');
+    }
+  };
+
   const startConversation = async (handle) => {
     if (!endpoints.start) {
       notify('Endpoint de criação de conversa indisponível.', 'error');
@@ -1024,6 +1158,12 @@ document.addEventListener('DOMContentLoaded', () => {
       }
     });
 
+    messagesContainer?.addEventListener('scroll', () => {
+      if (state.activeConversationId && messagesContainer.scrollTop < 40) {
+        loadOlderMessages(state.activeConversationId);
+      }
+    });
+
     messagesContainer?.addEventListener('click', (event) => {
       const actionBtn = event.target.closest('.message-action-btn');
       if (!actionBtn) return;
@@ -1051,6 +1191,14 @@ document.addEventListener('DOMContentLoaded', () => {
 
     sendBtn?.addEventListener('click', handleSendMessage);
 
+    clearBtn?.addEventListener('click', () => {
+      if (!state.activeConversationId) return;
+      const confirmText = 'Limpar todas as mensagens desta conversa apenas para você?';
+      const confirmed = typeof window.confirm === 'function' ? window.confirm(confirmText) : true;
+      if (!confirmed) return;
+      clearConversation(state.activeConversationId);
+    });
+
     backBtn?.addEventListener('click', () => {
       if (isMobile()) {
         setMobileView('list');
@@ -1068,24 +1216,18 @@ document.addEventListener('DOMContentLoaded', () => {
     mobileQuery.addListener(handleViewportChange);
   }
   loadConversations();
+  loadUnreadCounters();
+  connectSocket();
 
   document.addEventListener('visibilitychange', () => {
-    if (document.hidden) {
-      stopLiveUpdates();
-      stopMessagePolling();
-      disconnectConversationSocket();
-      return;
+    if (!document.hidden && !state.socket) {
+      connectSocket();
     }
-    loadConversations({ silent: true });
-    startLiveUpdates();
-    startMessagePolling();
-    if (state.activeConversationId) {
-      connectConversationSocket(state.activeConversationId);
+    const activeId = state.activeConversationId;
+    if (!document.hidden && activeId && state.unread[activeId]) {
+      markConversationRead(activeId);
+      renderConversations();
     }
   });
-  window.addEventListener('beforeunload', () => {
-    stopLiveUpdates();
-    stopMessagePolling();
-    disconnectConversationSocket();
-  });
+  window.addEventListener('beforeunload', disconnectSocket);
 });
@@ -0,0 +1,120 @@
+// Favorite hearts on the event cards (dashboard and dashboard mobile).
+//
+// Clicks flip the heart at once and only record the wanted state per event;
+// after a short quiet period every pending state goes to `data-favorites-url`
+// in one POST. Clicking a heart twice before the flush sends nothing new, and a
+// failed request puts the hearts back to the last state the server confirmed.
+document.addEventListener('DOMContentLoaded', () => {
+  const root = document.querySelector('[data-favorites-url]');
+  if (!root) {
+    return;
+  }
+
+  const endpoint = root.dataset.favoritesUrl;
+  const FLUSH_DELAY_MS = 400;
+  const hearts = new Map();
+  const confirmed = new Map();
+  let pending = new Map();
+  let flushTimer = null;
+  let inFlight = false;
+
+  const getCsrfToken = () => {
+    const match = document.cookie.match(/csrftoken=([^;]+)/);
+    return match ? decodeURIComponent(match[1]) : '';
+  };
+
+  const render = (id, favorited) => {
+    (hearts.get(id) || []).forEach((el) => el.classList.toggle('favorited', favorited));
+  };
+
+  const scheduleFlush = () => {
+    clearTimeout(flushTimer);
+    flushTimer = setTimeout(flush, FLUSH_DELAY_MS);
+  };
+
+  const flush = () => {
+    if (inFlight) {
+      scheduleFlush();
+      return;
+    }
+    const batch = {};
+    pending.forEach((favorited, id) => {
+      if (favorited !== confirmed.get(id)) {
+        batch[id] = favorited;
+      }
+    });
+    const sent = pending;
+    pending = new Map();
+    if (!Object.keys(batch).length) {
+      return;
+    }
+
+    inFlight = true;
+    fetch(endpoint, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        'X-Requested-With': 'XMLHttpRequest',
+        'X-CSRFToken': getCsrfToken(),
+      },
+      credentials: 'same-origin',
+      body: JSON.stringify({ favorites: batch }),
+    }).then((response) => {
+      if (!response.ok) {
+        if (response.status === 401) {
+          alert('Faça login para favoritar eventos.');
+        }
+        throw new Error(`favorites request failed: ${response.status}`);
+      }
+      return response.json();
+    }).then((data) => {
+      Object.entries(data.favorites || {}).forEach(([id, state]) => {
+        confirmed.set(id, state.favorited);
+        if (!pending.has(id)) {
+          render(id, state.favorited);
+        }
+      });
+    }).catch((err) => {
+      console.error('Error saving favorites', err);
+      sent.forEach((_, id) => {
+        if (!pending.has(id)) {
+          render(id, confirmed.get(id));
+        }
+      });
+    }).finally(() => {
+      inFlight = false;
+    });
+  };
+
+  document.querySelectorAll('.favorite[data-event-id]').forEach((el) => {
+    const id = el.dataset.eventId;
+    if (!hearts.has(id)) {
+      hearts.set(id, []);
+      confirmed.set(id, el.classList.contains('favorited'));
+    }
+    hearts.get(id).push(el);
+
+    el.addEventListener('click', (event) => {
+      event.stopPropagation();
+      const favorited = !el.classList.contains('favorited');
+      render(id, favorited);
+      pending.set(id, favorited);
+      scheduleFlush();
+    });
+  });
+
+  window.addEventListener('pagehide', () => {
+    if (!pending.size) {
+      return;
+    }
+    // Last chance for clicks still waiting on the timer.
+    const batch = Object.fromEntries(pending);
+    fetch(endpoint, {
+      method: 'POST',
+      keepalive: true,
+      headers: { 'Content-Type': 'application/json', 'X-CSRFToken': getCsrfToken() },
+      credentials: 'same-origin',
+      body: JSON.stringify({ favorites: batch }),
+    });
+  });
+});
@@ -1,7 +1,47 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+from unittest import skipUnless
+from unittest.mock import patch
+
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from channels_redis.pubsub import RedisPubSubChannelLayer
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.cache import cache
+from django.core.cache.backends.redis import RedisCache
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Q, QuerySet
+from django.http import HttpResponse, QueryDict
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+
+from coony.fake_redis import FakeRedisServer
 
-from .models import Usuario, Post
+from .chat_serializers import serialize_conversation_payload, serialize_message_payload
+from .counters import UnreadCounters, unread_counters
+from .decorators import get_request_usuario, login_required_usuario
+from . import geo
+from .dispatch import BATCH_EVENT, Broadcaster, broadcaster
+from .models import (
+	Usuario, Post, PostLikeEvent, Comment, Conversation, ConversationMember, Evento, HiddenMessage, Message,
+	Notification, UsuarioNameSuffix,
+)
+from .realtime import user_group_name
+from .user_cache import usuario_cache
+from .user_search import _word_matches, user_search_cache
+from .views import EVENT_PAGE_SIZE
+from .routing import websocket_urlpatterns
 
 
 class DeletePostViewTests(TestCase):
@@ -67,3 +107,1215 @@ class LoginWithUsernameTests(TestCase):
 		})
 		self.assertRedirects(response, reverse('dashboard'))
 		self.assertEqual(self.client.session.get('usuario_id'), self.user.id)
+
+
+class ChatMessagesPaginationTests(TestCase):
+	def setUp(self):
+		self.alice = Usuario.objects.create(
+			nome='Alice', telefone='1', email='alice@example.com', senha='senha'
+		)
+		self.bob = Usuario.objects.create(
+			nome='Bob', telefone='2', email='bob@example.com', senha='senha'
+		)
+		self.conversation = Conversation.get_or_create_private(self.alice, self.bob)
+		self.messages = [
+			Message.objects.create(conversation=self.conversation, autor=self.alice, texto=f'msg {i}')
+			for i in range(5)
+		]
+		session = self.client.session
+		session['usuario_id'] = self.alice.id
+		session.save()
+		self.url = reverse('chat_messages_api', args=[self.conversation.id])
+
+	def _ids(self, response):
+		return [item['id'] for item in response.json()['messages']]
+
+	def test_latest_page_returns_cursors(self):
+		response = self.client.get(self.url, {'limit': 2})
+		data = response.json()
+		self.assertEqual(self._ids(response), [m.id for m in self.messages[-2:]])
+		self.assertTrue(data['has_more'])
+		self.assertEqual(data['prev_cursor'], self.messages[-2].id)
+		self.assertEqual(data['next_cursor'], self.messages[-1].id)
+
+	def test_before_cursor_walks_backwards(self):
+		response = self.client.get(self.url, {'before': self.messages[3].id, 'limit': 2})
+		self.assertEqual(self._ids(response), [self.messages[1].id, self.messages[2].id])
+		response = self.client.get(self.url, {'before': self.messages[1].id, 'limit': 2})
+		self.assertEqual(self._ids(response), [self.messages[0].id])
+		self.assertIsNone(response.json()['prev_cursor'])
+
+	def test_after_cursor_returns_only_deltas(self):
+		response = self.client.get(self.url, {'after': self.messages[2].id})
+		self.assertEqual(self._ids(response), [self.messages[3].id, self.messages[4].id])
+		response = self.client.get(self.url, {'after': self.messages[4].id})
+		self.assertEqual(self._ids(response), [])
+		self.assertEqual(response.json()['next_cursor'], self.messages[4].id)
+
+	def test_invalid_cursor_is_rejected(self):
+		self.assertEqual(self.client.get(self.url, {'after': 'abc'}).status_code, 400)
+		self.assertEqual(self.client.get(self.url, {'before': 999999}).status_code, 400)
+
+
+class ChatInboxTests(TestCase):
+	def setUp(self):
+		self.alice = Usuario.objects.create(
+			nome='Alice', telefone='1', email='alice@example.com', senha='senha'
+		)
+		session = self.client.session
+		session['usuario_id'] = self.alice.id
+		session.save()
+		self.url = reverse('chat_conversations_api')
+
+	def _start_chat(self, index, texts):
+		partner = Usuario.objects.create(
+			nome=f'Parceiro {index}', telefone=str(index), email=f'p{index}@example.com', senha='senha'
+		)
+		conversation = Conversation.get_or_create_private(self.alice, partner)
+		for text in texts:
+			message = Message.objects.create(conversation=conversation, autor=partner, texto=text)
+			conversation.record_message(message)
+		return conversation
+
+	def test_inbox_query_count_is_constant(self):
+		for index in range(5):
+			self._start_chat(index, ['oi', 'tudo bem?'])
+		# session + user + conversations + prefetched participants
+		with self.assertNumQueries(4):
+			response = self.client.get(self.url)
+		data = response.json()['conversations']
+		self.assertEqual(len(data), 5)
+		self.assertTrue(all(item['last_message'] == 'tudo bem?' for item in data))
+
+	def test_hidden_last_message_falls_back_to_visible_one(self):
+		conversation = self._start_chat(1, ['primeira', 'segunda'])
+		member = ConversationMember.objects.get(conversation=conversation, usuario=self.alice)
+		member.hide(conversation.last_message)
+		data = self.client.get(self.url).json()['conversations']
+		self.assertEqual(data[0]['last_message'], 'primeira')
+
+	def test_messages_skip_hidden_table_when_nothing_is_hidden(self):
+		conversation = self._start_chat(1, ['primeira', 'segunda'])
+		url = reverse('chat_messages_api', args=[conversation.id])
+		with CaptureQueriesContext(connection) as ctx:
+			texts = [item['text'] for item in self.client.get(url).json()['messages']]
+		self.assertEqual(texts, ['primeira', 'segunda'])
+		self.assertFalse(any('usuarios_hiddenmessage' in query['sql'] for query in ctx.captured_queries))
+
+		member = ConversationMember.objects.get(conversation=conversation, usuario=self.alice)
+		self.assertTrue(member.hide(conversation.last_message))
+		self.assertFalse(member.hide(conversation.last_message))
+		texts = [item['text'] for item in self.client.get(url).json()['messages']]
+		self.assertEqual(texts, ['primeira'])
+
+	def test_clear_conversation_moves_watermark_for_requester_only(self):
+		conversation = self._start_chat(1, ['primeira', 'segunda'])
+		partner = conversation.other_participant(self.alice)
+		ConversationMember.objects.get(conversation=conversation, usuario=self.alice).hide(conversation.last_message)
+		response = self.client.post(reverse('chat_clear_conversation_api', args=[conversation.id]))
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(response.json()['cleared_up_to'], conversation.last_message_id)
+
+		member = ConversationMember.objects.get(conversation=conversation, usuario=self.alice)
+		self.assertEqual((member.cleared_up_to, member.hidden_count), (conversation.last_message_id, 0))
+		self.assertFalse(HiddenMessage.objects.filter(usuario=self.alice).exists())
+		messages_url = reverse('chat_messages_api', args=[conversation.id])
+		self.assertEqual(self.client.get(messages_url).json()['messages'], [])
+		self.assertEqual(self.client.get(self.url).json()['conversations'][0]['last_message'], '')
+
+		message = Message.objects.create(conversation=conversation, autor=partner, texto='terceira')
+		conversation.record_message(message)
+		texts = [item['text'] for item in self.client.get(messages_url).json()['messages']]
+		self.assertEqual(texts, ['terceira'])
+		self.assertEqual(Message.objects.visible_to(
+			ConversationMember.objects.get(conversation=conversation, usuario=partner)
+		).count(), 3)
+
+
+class ChatBroadcastPayloadTests(TransactionTestCase):
+	def setUp(self):
+		self.alice = Usuario.objects.create(
+			nome='Alice', telefone='1', email='alice@example.com', senha='senha'
+		)
+		self.bob = Usuario.objects.create(
+			nome='Bob', telefone='2', email='bob@example.com', senha='senha'
+		)
+		self.conversation = Conversation.get_or_create_private(self.alice, self.bob)
+
+	def test_consumer_personalizes_broadcast_without_refetching(self):
+		message = Message.objects.create(conversation=self.conversation, autor=self.alice, texto='oi')
+		self.conversation.record_message(message)
+		event = {
+			'type': 'chat.message_event',
+			'message': serialize_message_payload(message),
+			'conversation': serialize_conversation_payload(self.conversation),
+		}
+		# Consumers must render from the event alone, not re-read the row.
+		Message.objects.filter(pk=message.pk).delete()
+
+		async def receive_as(user):
+			communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), '/ws/chat/')
+			communicator.scope['usuario'] = user
+			connected, _ = await communicator.connect()
+			self.assertTrue(connected)
+			await get_channel_layer().group_send(user_group_name(user.id), event)
+			payload = await communicator.receive_json_from()
+			await communicator.disconnect()
+			return payload
+
+		for_alice = async_to_sync(receive_as)(self.alice)
+		for_bob = async_to_sync(receive_as)(self.bob)
+		self.assertTrue(for_alice['message']['is_self'])
+		self.assertTrue(for_alice['message']['can_delete_for_all'])
+		self.assertEqual(for_alice['conversation']['partner']['id'], self.bob.id)
+		self.assertFalse(for_bob['message']['is_self'])
+		self.assertEqual(for_bob['conversation']['partner']['id'], self.alice.id)
+		self.assertEqual(for_bob['conversation']['last_message'], 'oi')
+
+	def test_user_hub_receives_events_for_all_conversations(self):
+		carol = Usuario.objects.create(
+			nome='Carol', telefone='3', email='carol@example.com', senha='senha'
+		)
+		other_conversation = Conversation.get_or_create_private(self.alice, carol)
+		client = self.client
+		session = client.session
+		session['usuario_id'] = self.alice.id
+		session.save()
+
+		async def scenario():
+			communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), '/ws/chat/')
+			communicator.scope['usuario'] = self.bob
+			connected, _ = await communicator.connect()
+			self.assertTrue(connected)
+			for conversation_id in (self.conversation.id, other_conversation.id):
+				await sync_to_async(client.post)(
+					reverse('chat_send_message_api', args=[conversation_id]),
+					data=json.dumps({'text': f'oi {conversation_id}'}),
+					content_type='application/json',
+				)
+			event = await communicator.receive_json_from()
+			# Bob is not in the Alice/Carol conversation, so nothing else arrives.
+			self.assertTrue(await communicator.receive_nothing())
+			await communicator.disconnect()
+			return event
+
+		event = async_to_sync(scenario)()
+		self.assertEqual(event['event'], 'message')
+		self.assertEqual(event['message']['conversation_id'], self.conversation.id)
+		self.assertFalse(event['message']['is_self'])
+
+
+class RedisChannelLayerTests(SimpleTestCase):
+	def setUp(self):
+		self.server = FakeRedisServer().start_in_thread()
+		self.addCleanup(self.server.stop_thread)
+
+	def test_group_send_reaches_members_in_other_layer_instances(self):
+		async def scenario():
+			# Two layer instances stand in for two ASGI worker processes.
+			sender = RedisPubSubChannelLayer(hosts=[self.server.url], prefix='test')
+			receiver = RedisPubSubChannelLayer(hosts=[self.server.url], prefix='test')
+			channel = await receiver.new_channel()
+			await receiver.group_add('chat_1', channel)
+			await asyncio.sleep(0.1)
+			await sender.group_send('chat_1', {'type': 'chat.message_event', 'text': 'oi'})
+			message = await asyncio.wait_for(receiver.receive(channel), timeout=5)
+			await sender.flush()
+			await receiver.flush()
+			return message
+
+		message = async_to_sync(scenario)()
+		self.assertEqual(message['text'], 'oi')
+
+
+class BroadcastDispatchTests(TestCase):
+	def setUp(self):
+		self.alice = Usuario.objects.create(nome='Alice', telefone='1', email='alice@example.com', senha='senha')
+		self.bob = Usuario.objects.create(nome='Bob', telefone='2', email='bob@example.com', senha='senha')
+		self.conversation = Conversation.get_or_create_private(self.alice, self.bob)
+		session = self.client.session
+		session['usuario_id'] = self.alice.id
+		session.save()
+
+	def test_send_broadcasts_only_after_commit(self):
+		with patch.object(Broadcaster, '_submit') as submit:
+			with self.captureOnCommitCallbacks() as callbacks:
+				self.client.post(
+					reverse('chat_send_message_api', args=[self.conversation.id]),
+					data=json.dumps({'text': 'oi'}), content_type='application/json',
+				)
+				submit.assert_not_called()
+			for callback in callbacks:
+				callback()
+		groups = {group for call in submit.call_args_list for group in call.args[0][0]}
+		self.assertEqual(groups, {user_group_name(self.alice.id), user_group_name(self.bob.id)})
+
+	def test_rolled_back_write_sends_nothing(self):
+		with patch.object(Broadcaster, '_submit') as submit, self.captureOnCommitCallbacks(execute=True):
+			try:
+				with transaction.atomic():
+					broadcaster.broadcast([self.bob.id], {'type': 'chat.conversation_event'})
+					raise IntegrityError
+			except IntegrityError:
+				pass
+		submit.assert_not_called()
+
+	def test_consumer_replays_batched_events_in_order(self):
+		events = [
+			{'type': 'chat.read_event', 'conversation_id': self.conversation.id, 'reader_id': self.bob.id, 'up_to': up_to}
+			for up_to in (1, 2)
+		]
+
+		async def scenario():
+			communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), '/ws/chat/')
+			communicator.scope['usuario'] = self.alice
+			await communicator.connect()
+			await get_channel_layer().group_send(
+				user_group_name(self.alice.id), {'type': BATCH_EVENT, 'events': events},
+			)
+			received = [await communicator.receive_json_from() for _ in events]
+			await communicator.disconnect()
+			return received
+
+		received = async_to_sync(scenario)()
+		self.assertEqual([item['up_to'] for item in received], [1, 2])
+
+
+class BroadcastCoalescingTests(SimpleTestCase):
+	def setUp(self):
+		self.server = FakeRedisServer().start_in_thread()
+		self.addCleanup(self.server.stop_thread)
+
+	def test_burst_for_one_group_becomes_one_group_send(self):
+		sender = RedisPubSubChannelLayer(hosts=[self.server.url], prefix='dispatch')
+		receiver = RedisPubSubChannelLayer(hosts=[self.server.url], prefix='dispatch')
+		dispatcher = Broadcaster(coalesce_ms=50, mode='thread')
+		self.addCleanup(dispatcher.stop)
+
+		async def scenario():
+			channel = await receiver.new_channel()
+			await receiver.group_add(user_group_name(7), channel)
+			await asyncio.sleep(0.1)
+			for seq in range(3):
+				dispatcher._submit(((user_group_name(7),), {'type': 'chat.read_event', 'up_to': seq}, time.time()))
+			message = await asyncio.wait_for(receiver.receive(channel), timeout=5)
+			await receiver.flush()
+			return message
+
+		with patch('usuarios.dispatch.get_channel_layer', return_value=sender):
+			message = async_to_sync(scenario)()
+			self.assertTrue(dispatcher.wait_idle())
+		self.assertEqual(message['type'], BATCH_EVENT)
+		self.assertEqual([event['up_to'] for event in message['events']], [0, 1, 2])
+		self.assertTrue(all('enqueued_at' in event for event in message['events']))
+		stats = dispatcher.stats()
+		self.assertEqual((stats['events'], stats['group_sends']), (3, 1))
+		self.assertEqual(stats['dispatch_latency']['count'], 3)
+
+
+class UsuarioCacheTests(TestCase):
+	def setUp(self):
+		usuario_cache.clear()
+		self.user = Usuario.objects.create(
+			nome='Cacheado', telefone='1', email='cache@example.com', senha='senha'
+		)
+
+	def test_snapshot_is_served_from_cache_after_first_lookup(self):
+		with self.assertNumQueries(1):
+			first = usuario_cache.get(self.user.id)
+		with self.assertNumQueries(0):
+			second = usuario_cache.get(self.user.id)
+		self.assertEqual(second.nome, 'Cacheado')
+		self.assertEqual(second.username, first.username)
+		self.assertIn('bio', second.get_deferred_fields())
+
+	def test_save_and_delete_invalidate_entry(self):
+		usuario_cache.get(self.user.id)
+		self.user.nome = 'Renomeado'
+		self.user.save()
+		self.assertEqual(usuario_cache.get(self.user.id).nome, 'Renomeado')
+		self.user.delete()
+		self.assertIsNone(usuario_cache.get(self.user.id))
+
+	def test_stats_endpoint_requires_gm_level(self):
+		session = self.client.session
+		session['usuario_id'] = self.user.id
+		session.save()
+		url = reverse('monitoring_stats_api')
+		self.assertEqual(self.client.get(url).status_code, 403)
+		self.user.gm_permission_level = 2
+		self.user.save()
+		data = self.client.get(url).json()['usuario_cache']
+		self.assertGreaterEqual(data['hits'] + data['misses'], 1)
+
+
+class LoginRequiredUsuarioTests(TestCase):
+	def setUp(self):
+		usuario_cache.clear()
+		self.user = Usuario.objects.create(
+			nome='Logado', telefone='1', email='logado@example.com', senha='senha', bio='Bio longa'
+		)
+		self.factory = RequestFactory()
+
+	def _request(self, user_id=None):
+		request = self.factory.get('/')
+		request.session = SessionStore()
+		if user_id:
+			request.session['usuario_id'] = user_id
+		return request
+
+	def test_anonymous_requests_are_rejected(self):
+		view = login_required_usuario(lambda request: HttpResponse('ok'))
+		self.assertEqual(view(self._request())['Location'], reverse('index'))
+		json_view = login_required_usuario(json=True)(lambda request: HttpResponse('ok'))
+		self.assertEqual(json_view(self._request()).status_code, 401)
+
+	def test_stale_session_is_cleared(self):
+		request = self._request(user_id=self.user.id + 100)
+		view = login_required_usuario(lambda request: HttpResponse('ok'))
+		self.assertEqual(view(request).status_code, 302)
+		self.assertNotIn('usuario_id', request.session)
+
+	def test_usuario_is_loaded_once_per_request(self):
+		usuario_cache.get(self.user.id)
+		request = self._request(user_id=self.user.id)
+		view = login_required_usuario(lambda request: HttpResponse(get_request_usuario(request).nome))
+		with self.assertNumQueries(0):
+			response = view(request)
+		self.assertEqual(response.content, b'Logado')
+		self.assertIs(get_request_usuario(request), request.usuario)
+
+	def test_fields_load_only_requested_columns(self):
+		request = self._request(user_id=self.user.id)
+		view = login_required_usuario(fields=('nome', 'bio'))(lambda request: HttpResponse('ok'))
+		with self.assertNumQueries(1):
+			view(request)
+		self.assertEqual(request.usuario.bio, 'Bio longa')
+		self.assertIn('senha', request.usuario.get_deferred_fields())
+
+
+class SocialFeedTests(TestCase):
+	def setUp(self):
+		usuario_cache.clear()
+		self.viewer = Usuario.objects.create(nome='Leitor', telefone='1', email='leitor@example.com', senha='senha')
+		self.author = Usuario.objects.create(nome='Autor', telefone='2', email='autor@example.com', senha='senha')
+		session = self.client.session
+		session['usuario_id'] = self.viewer.id
+		session.save()
+
+	def _create_posts(self, count):
+		for index in range(count):
+			post = Post.objects.create(autor=self.author, texto=f'Post {index}')
+			post.likes.add(self.author)
+			for number in range(5):
+				Comment.objects.create(post=post, autor=self.author, texto=f'Comentário {number}')
+		Post.recount_counters()
+
+	def _feed_queries(self, **params):
+		with CaptureQueriesContext(connection) as ctx:
+			response = self.client.get(reverse('social'), params)
+		self.assertEqual(response.status_code, 200)
+		return len(ctx.captured_queries), response
+
+	def test_query_count_does_not_grow_with_feed(self):
+		self._create_posts(2)
+		usuario_cache.get(self.viewer.id)
+		small, _ = self._feed_queries()
+		self._create_posts(8)
+		large, _ = self._feed_queries()
+		self.assertEqual(small, large)
+
+	def test_posts_carry_counts_flags_and_bounded_comments(self):
+		self._create_posts(1)
+		post = Post.objects.get()
+		post.likes.add(self.viewer)
+		Post.recount_counters()
+		_, response = self._feed_queries()
+		item = response.context['posts'][0]
+		self.assertEqual((item.like_count, item.comment_count), (2, 5))
+		self.assertTrue(item.liked_by_me)
+		self.assertEqual([c.texto for c in item.recent_comments], ['Comentário 2', 'Comentário 3', 'Comentário 4'])
+
+	def test_before_cursor_pages_through_feed(self):
+		self._create_posts(25)
+		_, first = self._feed_queries()
+		self.assertEqual(len(first.context['posts']), 20)
+		cursor = first.context['next_cursor']
+		self.assertEqual(cursor, first.context['posts'][-1].id)
+		_, second = self._feed_queries(before=cursor)
+		self.assertEqual(len(second.context['posts']), 5)
+		self.assertIsNone(second.context['next_cursor'])
+		seen = [p.id for p in first.context['posts']] + [p.id for p in second.context['posts']]
+		self.assertEqual(len(set(seen)), 25)
+
+
+class PostCounterTests(TestCase):
+	def setUp(self):
+		usuario_cache.clear()
+		self.author = Usuario.objects.create(nome='Autor', telefone='1', email='autor@example.com', senha='senha')
+		self.fan = Usuario.objects.create(nome='Fã', telefone='2', email='fa@example.com', senha='senha')
+		self.post = Post.objects.create(autor=self.author, texto='Post')
+		session = self.client.session
+		session['usuario_id'] = self.fan.id
+		session.save()
+
+	def test_like_and_comment_views_keep_counters_in_step(self):
+		url = reverse('like_post', args=[self.post.id])
+		self.client.post(url)
+		self.post.refresh_from_db()
+		self.assertEqual(self.post.like_count, 1)
+		self.client.post(url)
+		self.post.refresh_from_db()
+		self.assertEqual(self.post.like_count, 0)
+		self.client.post(reverse('comment_post', args=[self.post.id]), {'texto': 'Boa!'})
+		self.post.refresh_from_db()
+		self.assertEqual(self.post.comment_count, 1)
+
+	def test_deleting_a_user_settles_counters_on_other_posts(self):
+		self.post.likes.add(self.fan)
+		Comment.objects.create(post=self.post, autor=self.fan, texto='Oi')
+		Post.objects.filter(pk=self.post.pk).update(like_count=1, comment_count=1)
+		self.fan.delete()
+		self.post.refresh_from_db()
+		self.assertEqual((self.post.like_count, self.post.comment_count), (0, 0))
+
+	def test_deleting_a_user_tolerates_counters_that_drifted_to_zero(self):
+		self.post.likes.add(self.fan)
+		Comment.objects.create(post=self.post, autor=self.fan, texto='Oi')
+		evento = Evento.objects.create(
+			criador=self.author, titulo='Show', descricao='d', modalidade='corrida',
+			data=datetime.date(2030, 1, 1), hora=datetime.time(20, 0), local='Recife',
+		)
+		evento.favorited_by.add(self.fan)
+		Post.objects.filter(pk=self.post.pk).update(like_count=0, comment_count=0)
+		self.fan.delete()
+		self.assertFalse(Usuario.objects.filter(pk=self.fan.pk).exists())
+		self.post.refresh_from_db()
+		evento.refresh_from_db()
+		self.assertEqual((self.post.like_count, self.post.comment_count, evento.favorite_count), (0, 0, 0))
+
+	def test_recount_command_repairs_drift(self):
+		self.post.likes.add(self.fan)
+		Comment.objects.create(post=self.post, autor=self.fan, texto='Oi')
+		untouched = Post.objects.create(autor=self.author, texto='Sem interação')
+		out = StringIO()
+		call_command('recount_post_counters', stdout=out)
+		self.assertIn('1 post(s)', out.getvalue())
+		self.post.refresh_from_db()
+		self.assertEqual((self.post.like_count, self.post.comment_count), (1, 1))
+		untouched.refresh_from_db()
+		self.assertEqual(untouched.like_count, 0)
+
+	def test_like_api_toggles_without_loading_likers(self):
+		url = reverse('like_post_api', args=[self.post.id])
+		for index in range(5):
+			other = Usuario.objects.create(nome=f'Outro {index}', telefone='3', email=f'outro{index}@example.com', senha='senha')
+			self.post.toggle_like(other)
+		usuario_cache.get(self.fan.id)
+		with CaptureQueriesContext(connection) as ctx:
+			data = self.client.post(url).json()
+		self.assertEqual(data, {'post_id': self.post.id, 'liked': True, 'like_count': 6})
+		self.assertFalse(any('INNER JOIN' in query['sql'] for query in ctx.captured_queries))
+		self.assertTrue(PostLikeEvent.objects.filter(post=self.post, usuario=self.fan).exists())
+		data = self.client.post(url).json()
+		self.assertEqual((data['liked'], data['like_count']), (False, 5))
+		self.assertEqual(self.client.post(reverse('like_post_api', args=[self.post.id + 99])).status_code, 404)
+
+	def test_duplicate_like_insert_is_absorbed(self):
+		Post.likes.through.objects.create(post_id=self.post.id, usuario_id=self.fan.id)
+		with patch.object(QuerySet, 'delete', return_value=(0, {})):
+			liked, like_count = self.post.toggle_like(self.fan)
+		self.assertTrue(liked)
+		self.assertEqual(like_count, 0)
+
+
+class NotificationInboxTests(TestCase):
+	def setUp(self):
+		usuario_cache.clear()
+		self.owner = Usuario.objects.create(nome='Dona', telefone='1', email='dona@example.com', senha='senha')
+		self.fan = Usuario.objects.create(nome='Torcedor', telefone='2', email='torcedor@example.com', senha='senha')
+		self.post = Post.objects.create(autor=self.owner, texto='Treino de domingo')
+		session = self.client.session
+		session['usuario_id'] = self.fan.id
+		session.save()
+
+	def _login_owner(self):
+		session = self.client.session
+		session['usuario_id'] = self.owner.id
+		session.save()
+
+	def test_events_write_notifications_for_the_other_party(self):
+		self.client.post(reverse('like_post_api', args=[self.post.id]))
+		self.client.post(reverse('comment_post', args=[self.post.id]), {'texto': 'Bora!'})
+		conversation = Conversation.get_or_create_private(self.fan, self.owner)
+		self.client.post(
+			reverse('chat_send_message_api', args=[conversation.id]),
+			data=json.dumps({'text': 'Oi'}), content_type='application/json',
+		)
+		rows = Notification.objects.filter(recipient=self.owner).order_by('type')
+		self.assertEqual([row.type for row in rows], ['comment', 'like', 'message'])
+		self.assertEqual(rows[0].post_excerpt, 'Treino de domingo')
+		self.assertFalse(Notification.objects.filter(recipient=self.fan).exists())
+		self.client.post(reverse('like_post_api', args=[self.post.id]))
+		self.client.post(reverse('like_post_api', args=[self.post.id]))
+		self.assertEqual(Notification.objects.filter(type=Notification.LIKE).count(), 1)
+
+	def test_page_filters_searches_and_paginates_in_the_database(self):
+		for index in range(45):
+			comment = Comment.objects.create(post=self.post, autor=self.fan, texto=f'Comentário {index}')
+			Notification.for_comment(comment, self.post)
+		Notification.for_like(self.post.id, self.fan.id)
+		self._login_owner()
+		response = self.client.get(reverse('notifications'))
+		self.assertEqual(response.context['stats'], {'total': 46, 'message': 0, 'comment': 45, 'like': 1})
+		self.assertEqual(len(response.context['notifications']), 40)
+		older = self.client.get(reverse('notifications') + '?' + response.context['next_query'])
+		self.assertEqual(len(older.context['notifications']), 6)
+		self.assertIsNone(older.context['next_query'])
+		filtered = self.client.get(reverse('notifications'), {'type': 'comment', 'q': 'Comentário 7'})
+		self.assertEqual([n.description for n in filtered.context['notifications']], ['Comentário 7'])
+		by_actor = self.client.get(reverse('notifications'), {'type': 'like', 'q': 'torcedor'})
+		self.assertEqual(len(by_actor.context['notifications']), 1)
+
+
+class UnreadCounterTests(TestCase):
+	def setUp(self):
+		usuario_cache.clear()
+		cache.clear()
+		self.alice = Usuario.objects.create(nome='Alice', telefone='1', email='alice@example.com', senha='senha')
+		self.bob = Usuario.objects.create(nome='Bob', telefone='2', email='bob@example.com', senha='senha')
+		self.conversation = Conversation.get_or_create_private(self.alice, self.bob)
+
+	def _login(self, user):
+		session = self.client.session
+		session['usuario_id'] = user.id
+		session.save()
+
+	def _send(self, text):
+		with self.captureOnCommitCallbacks(execute=True):
+			self.client.post(
+				reverse('chat_send_message_api', args=[self.conversation.id]),
+				data=json.dumps({'text': text}), content_type='application/json',
+			)
+
+	def test_counters_are_served_from_cache_and_follow_writes(self):
+		self._login(self.bob)
+		url = reverse('unread_counters_api')
+		self.assertEqual(self.client.get(url).json()['messages_total'], 0)
+		self._login(self.alice)
+		self._send('Oi')
+		self._send('Tudo bem?')
+		self._login(self.bob)
+		usuario_cache.get(self.bob.id)
+		with CaptureQueriesContext(connection) as ctx:
+			data = self.client.get(url).json()
+		self.assertEqual(data['messages'], {str(self.conversation.id): 2})
+		self.assertEqual(data['notifications'], 2)
+		self.assertFalse(any('usuarios_message' in query['sql'] for query in ctx.captured_queries))
+
+	def test_mark_read_updates_messages_in_bulk_and_resets_counters(self):
+		self._login(self.alice)
+		self._send('Oi')
+		self._send('Tudo bem?')
+		self._login(self.bob)
+		self.client.get(reverse('unread_counters_api'))
+		with self.captureOnCommitCallbacks(execute=True):
+			data = self.client.post(reverse('chat_mark_read_api', args=[self.conversation.id])).json()
+		self.assertEqual(data['marked'], 2)
+		self.assertFalse(Message.objects.filter(is_read=False).exists())
+		self.assertFalse(Notification.objects.filter(recipient=self.bob, is_read=False).exists())
+		counters = self.client.get(reverse('unread_counters_api')).json()
+		self.assertEqual((counters['messages_total'], counters['notifications']), (0, 0))
+		cache.clear()
+		rebuilt = self.client.get(reverse('unread_counters_api')).json()
+		self.assertEqual((rebuilt['messages_total'], rebuilt['notifications']), (0, 0))
+
+	def _workers(self):
+		# Two cache clients on one Redis stand in for two Daphne worker processes.
+		server = FakeRedisServer().start_in_thread()
+		self.addCleanup(server.stop_thread)
+		return [UnreadCounters(ttl=60, cache=RedisCache(server.url, {})) for _ in range(2)]
+
+	def test_counters_written_by_one_worker_are_seen_by_another(self):
+		worker_a, worker_b = self._workers()
+		self.assertEqual(worker_b.get(self.bob.id), {'messages': {}, 'notifications': 0})
+		with self.captureOnCommitCallbacks(execute=True):
+			worker_a.message_received([self.bob.id], self.conversation.id)
+			worker_a.notifications_added([self.bob.id])
+		with self.captureOnCommitCallbacks(execute=True):
+			worker_b.message_received([self.bob.id], self.conversation.id)
+			worker_b.notifications_added([self.bob.id])
+		with self.assertNumQueries(0):
+			self.assertEqual(
+				worker_b.get(self.bob.id), {'messages': {self.conversation.id: 2}, 'notifications': 2}
+			)
+		with self.captureOnCommitCallbacks(execute=True):
+			worker_a.conversation_read(self.bob.id, self.conversation.id, notifications_read=2)
+		self.assertEqual(worker_b.get(self.bob.id), {'messages': {}, 'notifications': 0})
+
+	def test_concurrent_increments_from_two_workers_are_not_lost(self):
+		workers = self._workers()
+		workers[0].get(self.bob.id)
+		key = workers[0]._conversation_key(self.bob.id, self.conversation.id)
+		with ThreadPoolExecutor(max_workers=8) as pool:
+			list(pool.map(lambda i: workers[i % 2]._incr(self.bob.id, key, 1), range(50)))
+		self.assertEqual(workers[1].get(self.bob.id)['messages'], {self.conversation.id: 50})
+
+	def test_increment_into_an_uncovered_conversation_forces_a_rebuild(self):
+		self._login(self.bob)
+		self.client.get(reverse('unread_counters_api'))
+		carol = Usuario.objects.create(nome='Carol', telefone='3', email='carol@example.com', senha='senha')
+		other = Conversation.get_or_create_private(carol, self.bob)
+		with self.captureOnCommitCallbacks(execute=True):
+			message = Message.objects.create(conversation=other, autor=carol, texto='Oi')
+			other.record_message(message)
+			unread_counters.message_received([self.bob.id], other.id)
+		data = self.client.get(reverse('unread_counters_api')).json()
+		self.assertEqual(data['messages'], {str(other.id): 1})
+
+	def test_read_up_to_marks_a_prefix_and_broadcasts_a_receipt(self):
+		self._login(self.alice)
+		for text in ('Um', 'Dois', 'Três'):
+			self._send(text)
+		first, second, third = Message.objects.order_by('id')
+		layer = get_channel_layer()
+		channel = async_to_sync(layer.new_channel)()
+		async_to_sync(layer.group_add)(user_group_name(self.alice.id), channel)
+
+		self._login(self.bob)
+		with CaptureQueriesContext(connection) as ctx, self.captureOnCommitCallbacks(execute=True):
+			response = self.client.post(
+				reverse('chat_mark_read_api', args=[self.conversation.id]),
+				data=json.dumps({'up_to': second.id}), content_type='application/json',
+			)
+		self.assertEqual(response.json(), {'conversation_id': self.conversation.id, 'marked': 2, 'up_to': second.id})
+		updates = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('UPDATE "usuarios_message"')]
+		self.assertEqual(len(updates), 1)
+		self.assertEqual(
+			list(Message.objects.order_by('id').values_list('is_read', flat=True)), [True, True, False]
+		)
+		receipt = async_to_sync(layer.receive)(channel)
+		self.assertEqual(receipt['type'], 'chat.read_event')
+		self.assertEqual((receipt['reader_id'], receipt['up_to']), (self.bob.id, second.id))
+
+	@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN output checked against SQLite')
+	def test_unread_lookup_uses_partial_index(self):
+		queryset = Message.objects.filter(conversation=self.conversation, is_read=False).exclude(autor=self.bob)
+		sql, params = queryset.order_by().values('id').query.sql_with_params()
+		with connection.cursor() as cursor:
+			cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+			plan = ' '.join(str(row) for row in cursor.fetchall())
+		self.assertIn('message_unread_idx', plan)
+
+
+class MessageSearchTests(TestCase):
+	def setUp(self):
+		self.alice = Usuario.objects.create(nome='Alice', telefone='1', email='alice@example.com', senha='senha')
+		self.bob = Usuario.objects.create(nome='Bob', telefone='2', email='bob@example.com', senha='senha')
+		self.carol = Usuario.objects.create(nome='Carol', telefone='3', email='carol@example.com', senha='senha')
+		self.conversation = Conversation.get_or_create_private(self.alice, self.bob)
+		self.other = Conversation.get_or_create_private(self.bob, self.carol)
+		session = self.client.session
+		session['usuario_id'] = self.alice.id
+		session.save()
+		self.url = reverse('chat_search_messages_api')
+
+	def _send(self, conversation, autor, text):
+		message = Message.objects.create(conversation=conversation, autor=autor, texto=text)
+		conversation.record_message(message)
+		return message
+
+	def _search(self, **params):
+		response = self.client.get(self.url, params)
+		self.assertEqual(response.status_code, 200)
+		return response.json()
+
+	def test_results_are_scoped_ranked_and_highlighted(self):
+		self._send(self.conversation, self.bob, 'Treino de corrida amanhã cedo')
+		best = self._send(self.conversation, self.alice, 'Corrida, corrida e mais corrida <3')
+		self._send(self.other, self.carol, 'Corrida secreta entre Bob e Carol')
+		data = self._search(q='corr')
+		self.assertEqual(len(data['results']), 2)
+		self.assertEqual(data['results'][0]['message_id'], best.id)
+		self.assertIn('<mark>Corrida</mark>', data['results'][0]['snippet'])
+		self.assertIn('&lt;3', data['results'][0]['snippet'])
+		self.assertIsNone(data['next_offset'])
+
+	def test_index_follows_delete_for_everyone_and_hidden_messages(self):
+		message = self._send(self.conversation, self.alice, 'Encontro no parque')
+		self._send(self.conversation, self.bob, 'Parque fechado hoje')
+		self.assertEqual(len(self._search(q='parque')['results']), 2)
+
+		self.client.post(
+			reverse('chat_delete_message_api', args=[message.id]),
+			data=json.dumps({'scope': 'all'}), content_type='application/json',
+		)
+		self.assertEqual(len(self._search(q='parque')['results']), 1)
+		ConversationMember.objects.get(conversation=self.conversation, usuario=self.alice).hide(
+			Message.objects.get(texto='Parque fechado hoje')
+		)
+		self.assertEqual(self._search(q='parque')['results'], [])
+
+	def test_pagination_and_operator_input(self):
+		for index in range(3):
+			self._send(self.conversation, self.bob, f'bike {index}')
+		first = self._search(q='bike', limit=2)
+		self.assertEqual(len(first['results']), 2)
+		second = self._search(q='bike', limit=2, offset=first['next_offset'])
+		self.assertEqual(len(second['results']), 1)
+		self.assertIsNone(second['next_offset'])
+		self.assertEqual(self._search(q='" OR NEAR(*')['results'], [])
+		self.assertEqual(self.client.get(self.url, {'q': 'bike', 'offset': -1}).status_code, 400)
+
+
+class UserSearchTests(TestCase):
+	def setUp(self):
+		user_search_cache.clear()
+		self.me = Usuario.objects.create(nome='Eu Mesmo', telefone='0', email='me@example.com', senha='senha')
+		self.joana = Usuario.objects.create(nome='Joana Prado', telefone='1', email='joana@example.com', senha='senha', username='joana-prado')
+		self.jo = Usuario.objects.create(nome='Zé Jô', telefone='2', email='jo@example.com', senha='senha', username='jo')
+		self.joao = Usuario.objects.create(nome='João Silva', telefone='3', email='joao@example.com', senha='senha', username='joao-silva')
+		self.maria = Usuario.objects.create(nome='Maria Joaquina', telefone='4', email='maria@example.com', senha='senha', username='maria')
+		session = self.client.session
+		session['usuario_id'] = self.me.id
+		session.save()
+		self.url = reverse('chat_search_users_api')
+
+	def _ids(self, term):
+		return [item['id'] for item in self.client.get(self.url, {'q': term}).json()['results']]
+
+	def test_ranks_exact_handle_then_prefixes_then_later_words(self):
+		self.assertEqual(self._ids('jo'), [self.jo.id, self.joana.id, self.joao.id, self.maria.id])
+		self.assertEqual(self._ids('@JOÃO'), [self.joao.id])
+		self.assertEqual(self._ids('silva'), [self.joao.id])
+		self.assertEqual(self._ids('eu'), [])
+
+	def test_repeated_queries_are_cached_until_a_name_changes(self):
+		self._ids('jo')
+		usuario_cache.get(self.me.id)
+		with CaptureQueriesContext(connection) as ctx:
+			self._ids('jo')
+		self.assertFalse(any('usuarios_usuario' in query['sql'] for query in ctx.captured_queries))
+
+		self.me.save(update_fields=['gm_permission_level'])
+		self.assertEqual(user_search_cache.stats()['entries'], 1)
+		self.maria.nome = 'Maria Souza'
+		self.maria.save(update_fields=['nome'])
+		self.assertEqual(Usuario.objects.get(pk=self.maria.pk).nome_busca, 'maria souza')
+		self.assertEqual(self._ids('jo'), [self.jo.id, self.joana.id, self.joao.id])
+		self.assertEqual(self._ids('souza'), [self.maria.id])
+
+	@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN output checked for SQLite only')
+	def test_prefix_lookup_uses_indexes(self):
+		queryset = Usuario.objects.filter(
+			Q(username__gte='jo', username__lt='jo\uffff') | Q(nome_busca__gte='jo', nome_busca__lt='jo\uffff')
+		).values('id')
+		sql, params = queryset.query.sql_with_params()
+		with connection.cursor() as cursor:
+			cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+			plan = ' '.join(str(row) for row in cursor.fetchall())
+		self.assertNotIn('SCAN usuarios_usuario', plan)
+		self.assertIn('nome_busca', plan)
+
+	@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN output checked for SQLite only')
+	def test_later_word_lookup_uses_the_suffix_index(self):
+		self.assertEqual(
+			set(UsuarioNameSuffix.objects.filter(usuario=self.maria).values_list('suffix', flat=True)), {'joaquina'}
+		)
+		sql, params = _word_matches('joaq', []).values('id')[:9].query.sql_with_params()
+		with connection.cursor() as cursor:
+			cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+			plan = ' '.join(str(row) for row in cursor.fetchall())
+		self.assertNotIn('SCAN', plan)
+		self.assertIn('usuarios_usuarionamesuffix_suffix', plan)
+
+
+class PrivateConversationCreationTests(TestCase):
+	def setUp(self):
+		self.alice = Usuario.objects.create(nome='Alice', telefone='1', email='alice@example.com', senha='senha')
+		self.bob = Usuario.objects.create(nome='Bob', telefone='2', email='bob@example.com', senha='senha')
+
+	def test_existing_conversation_is_one_read_and_no_writes(self):
+		conversation = Conversation.get_or_create_private(self.alice, self.bob)
+		self.assertEqual(
+			set(conversation.participants.values_list('id', flat=True)), {self.alice.id, self.bob.id}
+		)
+		updated_at = conversation.updated_at
+		with self.assertNumQueries(1):
+			again = Conversation.get_or_create_private(self.bob, self.alice)
+		self.assertEqual(again.pk, conversation.pk)
+		self.assertEqual(Conversation.objects.get(pk=conversation.pk).updated_at, updated_at)
+
+	def test_missing_member_is_repaired(self):
+		conversation = Conversation.get_or_create_private(self.alice, self.bob)
+		ConversationMember.objects.filter(conversation=conversation, usuario=self.bob).delete()
+		Conversation.get_or_create_private(self.alice, self.bob)
+		self.assertEqual(conversation.members.count(), 2)
+
+	def test_losing_the_creation_race_returns_the_winner(self):
+		winner = Conversation.get_or_create_private(self.alice, self.bob)
+		# Pretend the existence check ran before the winner committed.
+		with patch.object(QuerySet, 'first', return_value=None):
+			loser = Conversation.get_or_create_private(self.alice, self.bob)
+		self.assertEqual(loser.pk, winner.pk)
+		self.assertEqual(Conversation.objects.count(), 1)
+		self.assertEqual(ConversationMember.objects.count(), 2)
+
+
+class PrivateConversationConcurrencyTests(TransactionTestCase):
+	THREADS = 16
+
+	def setUp(self):
+		if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+			# Threads cannot share an in-memory SQLite database; use a file
+			# (TEST NAME) or PostgreSQL to run this.
+			self.skipTest('needs a test database shared across threads')
+
+	def test_concurrent_starts_create_one_complete_conversation(self):
+		alice = Usuario.objects.create(nome='Alice', telefone='1', email='alice@example.com', senha='senha')
+		bob = Usuario.objects.create(nome='Bob', telefone='2', email='bob@example.com', senha='senha')
+		barrier = threading.Barrier(self.THREADS)
+
+		def start(index):
+			barrier.wait()
+			try:
+				pair = (alice, bob) if index % 2 else (bob, alice)
+				return Conversation.get_or_create_private(*pair).pk
+			finally:
+				connection.close()
+
+		with ThreadPoolExecutor(max_workers=self.THREADS) as pool:
+			ids = set(pool.map(start, range(self.THREADS)))
+		self.assertEqual(len(ids), 1)
+		self.assertEqual(Conversation.objects.count(), 1)
+		self.assertEqual(
+			set(ConversationMember.objects.values_list('usuario_id', flat=True)), {alice.id, bob.id}
+		)
+
+
+class ConversationTouchTests(TestCase):
+	def setUp(self):
+		self.alice = Usuario.objects.create(nome='Alice', telefone='1', email='alice@example.com', senha='senha')
+		self.bob = Usuario.objects.create(nome='Bob', telefone='2', email='bob@example.com', senha='senha')
+		self.conversation = Conversation.get_or_create_private(self.alice, self.bob)
+
+	def test_touch_is_one_update_and_coalesces_recent_bumps(self):
+		stale = timezone.now() - Conversation.TOUCH_WINDOW * 2
+		Conversation.objects.filter(pk=self.conversation.pk).update(updated_at=stale)
+		conversation = Conversation.objects.get(pk=self.conversation.pk)
+		with self.assertNumQueries(1):
+			self.assertTrue(conversation.touch())
+		with self.assertNumQueries(0):
+			self.assertFalse(conversation.touch())
+		# A stale instance still skips the write when another writer bumped the row.
+		stale_copy = Conversation.objects.get(pk=self.conversation.pk)
+		stale_copy.updated_at = stale
+		with self.assertNumQueries(1):
+			self.assertFalse(stale_copy.touch())
+
+	def test_record_message_never_moves_the_pointer_backwards(self):
+		older = Message.objects.create(conversation=self.conversation, autor=self.alice, texto='antiga')
+		newer = Message.objects.create(conversation=self.conversation, autor=self.bob, texto='nova')
+		with self.assertNumQueries(1):
+			self.conversation.record_message(newer)
+		Conversation.objects.get(pk=self.conversation.pk).record_message(older)
+		self.assertEqual(Conversation.objects.get(pk=self.conversation.pk).last_message_id, newer.id)
+
+
+class AsyncChatApiTests(TestCase):
+	def setUp(self):
+		usuario_cache.clear()
+		user_search_cache.clear()
+		self.alice = Usuario.objects.create(nome='Alice Souza', telefone='1', email='alice@example.com', senha='senha')
+		self.bob = Usuario.objects.create(nome='Bob Souza', telefone='2', email='bob@example.com', senha='senha')
+		self.conversation = Conversation.get_or_create_private(self.alice, self.bob)
+		self.messages = [
+			Message.objects.create(conversation=self.conversation, autor=self.bob, texto=f'msg {i}')
+			for i in range(4)
+		]
+		self.conversation.record_message(self.messages[-1])
+		session = self.client.session
+		session['usuario_id'] = self.alice.id
+		session.save()
+		self.async_client.cookies = self.client.cookies
+
+	def _both(self, name, args=(), params=None):
+		sync_response = self.client.get(reverse(name, args=args), params)
+		async_response = async_to_sync(self.async_client.get)(
+			reverse(name.replace('_api', '_async_api'), args=args), params
+		)
+		self.assertEqual(async_response.status_code, sync_response.status_code)
+		self.assertEqual(async_response.json(), sync_response.json())
+		return async_response.json()
+
+	def test_read_endpoints_match_sync_views(self):
+		self.assertEqual(self._both('chat_conversations_api')['conversations'][0]['last_message'], 'msg 3')
+		page = self._both('chat_messages_api', [self.conversation.id], {'limit': 2})
+		self.assertEqual([item['id'] for item in page['messages']], [m.id for m in self.messages[-2:]])
+		self._both('chat_messages_api', [self.conversation.id], {'before': page['prev_cursor'], 'limit': 2})
+		self._both('chat_messages_api', [self.conversation.id], {'after': self.messages[0].id})
+		self._both('chat_messages_api', [self.conversation.id], {'before': 1, 'after': 2})
+		self._both('chat_messages_api', [self.conversation.id + 1])
+		self.assertEqual(self._both('chat_search_users_api', params={'q': 'souza'})['results'][0]['id'], self.bob.id)
+
+	def test_send_stores_message_and_notification(self):
+		url = reverse('chat_send_message_async_api', args=[self.conversation.id])
+		response = async_to_sync(self.async_client.post)(
+			url, json.dumps({'text': ' oi '}), content_type='application/json'
+		)
+		self.assertEqual(response.status_code, 201)
+		message = Message.objects.get(pk=response.json()['message']['id'])
+		self.assertEqual(message.texto, 'oi')
+		self.assertEqual(Conversation.objects.get(pk=self.conversation.pk).last_message_id, message.id)
+		self.assertTrue(Notification.objects.filter(recipient=self.bob).exists())
+		empty = async_to_sync(self.async_client.post)(url, json.dumps({'text': ''}), content_type='application/json')
+		self.assertEqual(empty.status_code, 400)
+
+	def test_anonymous_requests_are_rejected(self):
+		self.async_client.cookies.clear()
+		response = async_to_sync(self.async_client.get)(reverse('chat_conversations_async_api'))
+		self.assertEqual(response.status_code, 401)
+
+
+class EventListingTests(TestCase):
+	def setUp(self):
+		usuario_cache.clear()
+		self.user = Usuario.objects.create(nome='Ana', telefone='1', email='ana@example.com', senha='senha')
+		self.other = Usuario.objects.create(nome='Caio', telefone='2', email='caio@example.com', senha='senha')
+		session = self.client.session
+		session['usuario_id'] = self.user.id
+		session.save()
+
+	def _create_events(self, count):
+		# Shared dates and times so the cursor has to break ties on criado_em/id.
+		return [
+			Evento.objects.create(
+				criador=self.other, titulo=f'Evento {i}', descricao='d', modalidade='corrida',
+				data=datetime.date(2030, 1, 1 + i % 3), hora=datetime.time(8, 0), local='Recife',
+			)
+			for i in range(count)
+		]
+
+	def _walk(self, params=None):
+		seen, params = [], dict(params or {})
+		while True:
+			response = self.client.get(reverse('eventos_list'), params)
+			seen += [evento.id for evento in response.context['eventos']]
+			if response.context['next_query'] is None:
+				return seen
+			params = QueryDict(response.context['next_query'])
+
+	def test_pages_follow_listing_order_without_gaps(self):
+		self._create_events(EVENT_PAGE_SIZE * 2 + 3)
+		expected = list(Evento.objects.order_by('data', 'hora', 'criado_em', 'id').values_list('id', flat=True))
+		self.assertEqual(self._walk(), expected)
+
+	def test_archive_holds_past_events_newest_first(self):
+		upcoming = self._create_events(2)
+		today = timezone.localdate()
+		past = [
+			Evento.objects.create(
+				criador=self.other, titulo=f'Antigo {i}', descricao='d', modalidade='corrida',
+				data=today - datetime.timedelta(days=1 + i % 2), hora=datetime.time(7, 0), local='Recife',
+			)
+			for i in range(EVENT_PAGE_SIZE + 1)
+		]
+		expected = list(Evento.objects.filter(pk__in=[e.pk for e in past])
+						.order_by('-data', '-hora', '-criado_em', '-id').values_list('id', flat=True))
+		self.assertEqual(self._walk({'mode': 'archive'}), expected)
+		self.assertEqual(self._walk(), [evento.id for evento in upcoming])
+
+	def test_is_favorited_flag(self):
+		liked, other = self._create_events(2)
+		liked.favorited_by.add(self.user, self.other)
+		other.favorited_by.add(self.other)
+		flags = {evento.id: evento.is_favorited for evento in Evento.listing_for(self.user)}
+		self.assertEqual(flags, {liked.id: True, other.id: False})
+		response = self.client.get(reverse('evento_detail', args=[liked.id]))
+		self.assertContains(response, 'Favoritado')
+
+	def test_past_event_keeps_its_detail_page(self):
+		past = Evento.objects.create(
+			criador=self.other, titulo='Antigo', descricao='d', modalidade='corrida',
+			data=timezone.localdate() - datetime.timedelta(days=3), hora=datetime.time(7, 0), local='Recife',
+		)
+		past.favorited_by.add(self.user)
+		self.assertEqual(self._walk({'mode': 'archive'}), [past.id])
+		response = self.client.get(reverse('evento_detail', args=[past.id]))
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(response.context['evento'], past)
+		self.assertContains(response, 'Favoritado')
+
+	def test_page_query_count_is_constant(self):
+		def page_queries():
+			with CaptureQueriesContext(connection) as ctx:
+				self.client.get(reverse('eventos_list'))
+			return len(ctx.captured_queries)
+
+		for evento in self._create_events(3):
+			evento.favorited_by.add(self.user)
+		page_queries()  # warms the user snapshot cache
+		small = page_queries()
+		for evento in self._create_events(EVENT_PAGE_SIZE * 2):
+			evento.favorited_by.add(self.user, self.other)
+		self.assertEqual(page_queries(), small)
+
+
+class MyEventsTests(TestCase):
+	def setUp(self):
+		usuario_cache.clear()
+		self.user = Usuario.objects.create(nome='Ana', telefone='1', email='ana@example.com', senha='senha')
+		today = timezone.localdate()
+		self.past = self._create('Trilha Antiga', 'Olinda', today - datetime.timedelta(days=3))
+		self.soon = self._create('Pedal São João', 'Recife Antigo', today + datetime.timedelta(days=1))
+		self.later = self._create('Corrida da Ponte', 'Boa Viagem', today + datetime.timedelta(days=9))
+		session = self.client.session
+		session['usuario_id'] = self.user.id
+		session.save()
+		self.client.get(reverse('my_events'))  # warms the user snapshot cache
+
+	def _create(self, titulo, local, data):
+		return Evento.objects.create(
+			criador=self.user, titulo=titulo, descricao='d', modalidade='corrida',
+			data=data, hora=datetime.time(8, 0), local=local,
+		)
+
+	def test_default_page_is_three_queries(self):
+		# Session, stats aggregate and the ordered list (which also yields next_event).
+		with self.assertNumQueries(3):
+			response = self.client.get(reverse('my_events'))
+		self.assertEqual(response.context['stats'], {'total': 3, 'upcoming': 2, 'past': 1})
+		self.assertEqual([e.id for e in response.context['eventos']], [self.soon.id, self.later.id])
+		self.assertEqual(response.context['next_event'], self.soon)
+
+	def test_search_is_accent_insensitive_and_filtered_views_keep_next_event(self):
+		response = self.client.get(reverse('my_events'), {'q': 'sao joao', 'status': 'all'})
+		self.assertEqual([e.id for e in response.context['eventos']], [self.soon.id])
+		response = self.client.get(reverse('my_events'), {'q': 'olinda', 'status': 'past'})
+		self.assertEqual([e.id for e in response.context['eventos']], [self.past.id])
+		self.assertEqual(response.context['next_event'], self.soon)
+
+	def test_busca_follows_partial_saves(self):
+		self.later.local = 'Praça do Derby'
+		self.later.save(update_fields=['local'])
+		self.assertEqual(Evento.objects.get(pk=self.later.pk).busca, 'corrida da ponte praca do derby')
+
+
+class EventFavoritesTests(TestCase):
+	def setUp(self):
+		usuario_cache.clear()
+		self.user = Usuario.objects.create(nome='Ana', telefone='1', email='ana@example.com', senha='senha')
+		self.other = Usuario.objects.create(nome='Caio', telefone='2', email='caio@example.com', senha='senha')
+		self.eventos = [
+			Evento.objects.create(
+				criador=self.other, titulo=f'Evento {i}', descricao='d', modalidade='corrida',
+				data=datetime.date(2030, 1, 1), hora=datetime.time(8, 0), local='Recife',
+			)
+			for i in range(3)
+		]
+		session = self.client.session
+		session['usuario_id'] = self.user.id
+		session.save()
+
+	def _batch(self, states):
+		return self.client.post(
+			reverse('event_favorites_api'), json.dumps({'favorites': states}), content_type='application/json'
+		)
+
+	def test_toggle_keeps_counter_in_step(self):
+		evento = self.eventos[0]
+		evento.set_favorite(self.other, True)
+		url = reverse('toggle_favorite_event', args=[evento.id])
+		self.assertEqual(self.client.post(url).json(), {'favorited': True, 'favorite_count': 2})
+		self.assertEqual(self.client.post(url).json(), {'favorited': False, 'favorite_count': 1})
+		self.assertEqual(self.client.post(reverse('toggle_favorite_event', args=[999999])).status_code, 404)
+
+	def test_batch_sets_states_idempotently(self):
+		first, second, third = self.eventos
+		second.set_favorite(self.user, True)
+		states = {str(first.id): True, str(second.id): False, str(third.id): True, '999999': True}
+		expected = {
+			str(first.id): {'favorited': True, 'favorite_count': 1},
+			str(second.id): {'favorited': False, 'favorite_count': 0},
+			str(third.id): {'favorited': True, 'favorite_count': 1},
+		}
+		self.assertEqual(self._batch(states).json()['favorites'], expected)
+		# A retried batch changes nothing.
+		self.assertEqual(self._batch(states).json()['favorites'], expected)
+		self.assertEqual(
+			set(self.user.favorited_eventos.values_list('id', flat=True)), {first.id, third.id}
+		)
+		self.assertEqual(self._batch({}).status_code, 400)
+		self.assertEqual(self._batch({'x': True}).status_code, 400)
+
+	def test_deleting_a_user_settles_counts(self):
+		evento = self.eventos[0]
+		evento.set_favorite(self.user, True)
+		evento.set_favorite(self.other, True)
+		self.user.delete()
+		self.assertEqual(Evento.objects.get(pk=evento.pk).favorite_count, 1)
+
+
+class NearbyEventsTests(TestCase):
+	ORIGIN = (-8.0631, -34.8711)
+
+	def setUp(self):
+		usuario_cache.clear()
+		self.user = Usuario.objects.create(nome='Ana', telefone='1', email='ana@example.com', senha='senha')
+		session = self.client.session
+		session['usuario_id'] = self.user.id
+		session.save()
+		self.data = timezone.localdate() + datetime.timedelta(days=2)
+
+	def _create(self, titulo, lat, lng, data=None):
+		return Evento.objects.create(
+			criador=self.user, titulo=titulo, descricao='d', modalidade='corrida',
+			data=data or self.data, hora=datetime.time(8, 0), local='Recife', latitude=lat, longitude=lng,
+		)
+
+	def _nearby(self, **params):
+		return self.client.get(reverse('nearby_events_api'), params)
+
+	def test_ranks_by_distance_within_radius(self):
+		far = self._create('Olinda', -8.0089, -34.8553)        # ~6 km
+		near = self._create('Marco Zero', -8.0632, -34.8712)   # a few metres
+		self._create('Caruaru', -8.2760, -35.9750)              # ~120 km
+		self._create('Ontem', -8.0631, -34.8711, data=timezone.localdate() - datetime.timedelta(days=1))
+		Evento.objects.create(
+			criador=self.user, titulo='Sem local', descricao='d', modalidade='corrida',
+			data=self.data, hora=datetime.time(8, 0), local='Recife',
+		)
+		lat, lng = self.ORIGIN
+		results = self._nearby(lat=lat, lng=lng, radius=10).json()['results']
+		self.assertEqual([item['id'] for item in results], [near.id, far.id])
+		self.assertAlmostEqual(results[1]['distance_km'], geo.haversine_km(lat, lng, -8.0089, -34.8553), places=1)
+
+	def test_matches_a_full_scan_around_cell_edges(self):
+		rng = random.Random(7)
+		# An origin on a geohash boundary (0, 0) and an ordinary one.
+		for lat0, lng0 in ((0.0, 0.0), self.ORIGIN):
+			Evento.objects.all().delete()
+			for i in range(60):
+				self._create(f'E{i}', lat0 + rng.uniform(-0.3, 0.3), lng0 + rng.uniform(-0.3, 0.3))
+			for radius in (2, 15, 40):
+				expected = sorted(
+					(geo.haversine_km(lat0, lng0, e.latitude, e.longitude), e.id)
+					for e in Evento.objects.all()
+				)
+				expected = [pk for distance, pk in expected if distance <= radius]
+				found = [e.id for e in Evento.nearby_for(self.user, lat0, lng0, radius)]
+				self.assertEqual(found, expected, (lat0, lng0, radius))
+
+	def test_defaults_to_profile_coordinates(self):
+		self.assertEqual(self._nearby().status_code, 400)
+		self.assertEqual(self._nearby(lat=200, lng=0).status_code, 400)
+		evento = self._create('Marco Zero', -8.0632, -34.8712)
+		Usuario.objects.filter(pk=self.user.pk).update(latitude=self.ORIGIN[0], longitude=self.ORIGIN[1])
+		self.assertEqual([item['id'] for item in self._nearby().json()['results']], [evento.id])
+
+	def test_geohash_follows_coordinates(self):
+		evento = self._create('Marco Zero', *self.ORIGIN)
+		self.assertEqual(evento.geohash, geo.encode(*self.ORIGIN))
+		evento.latitude = evento.longitude = None
+		evento.save(update_fields=['latitude', 'longitude'])
+		self.assertEqual(Evento.objects.get(pk=evento.pk).geohash, '')
@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import async_views, views
 
 urlpatterns = [
     path('', views.index, name='index'),
@@ -15,10 +15,15 @@ urlpatterns = [
     path('eventos/criar/', views.create_event, name='create_event'),
     path('eventos/meus/', views.my_events, name='my_events'),
     path('eventos/toggle_favorite/<int:evento_id>/', views.toggle_favorite_event, name='toggle_favorite_event'),
+    path('eventos/api/favorites/', views.event_favorites_api, name='event_favorites_api'),
+    path('eventos/api/nearby/', views.nearby_events_api, name='nearby_events_api'),
     path('social/like/<int:post_id>/', views.like_post, name='like_post'),
+    path('social/api/posts/<int:post_id>/like/', views.like_post_api, name='like_post_api'),
     path('social/comment/<int:post_id>/', views.comment_post, name='comment_post'),
     path('social/delete/<int:post_id>/', views.delete_post, name='delete_post'),
     path('notifications/', views.notifications, name='notifications'),
+    path('notifications/api/read/', views.notifications_mark_read_api, name='notifications_mark_read_api'),
+    path('api/counters/', views.unread_counters_api, name='unread_counters_api'),
     path('empresas/cadastro/', views.empresa_cadastro_tipo, name='empresa_cadastro_tipo'),
     path('empresas/cadastro/empresa/', views.empresa_cadastro_empresa, name='empresa_cadastro_empresa'),
     path('empresas/cadastro/profissional/', views.empresa_cadastro_profissional, name='empresa_cadastro_profissional'),
@@ -28,11 +33,19 @@ urlpatterns = [
     path('empresas/profissionais/', views.empresa_buscar_profissionais, name='empresa_buscar_profissionais'),
     path('empresas/profissionais/<int:prof_id>/', views.empresa_profissional_detail, name='empresa_profissional_detail'),
     path('perfil/', views.perfil, name='perfil'),
+    path('monitoring/stats/', views.monitoring_stats_api, name='monitoring_stats_api'),
     path('chat/', views.chat, name='chat'),
     path('chat/api/conversations/', views.chat_conversations_api, name='chat_conversations_api'),
     path('chat/api/search/', views.chat_search_users_api, name='chat_search_users_api'),
+    path('chat/api/search/messages/', views.chat_search_messages_api, name='chat_search_messages_api'),
     path('chat/api/conversations/start/', views.chat_start_conversation_api, name='chat_start_conversation_api'),
     path('chat/api/conversations/<int:conversation_id>/messages/', views.chat_messages_api, name='chat_messages_api'),
     path('chat/api/conversations/<int:conversation_id>/messages/send/', views.chat_send_message_api, name='chat_send_message_api'),
+    path('chat/api/conversations/<int:conversation_id>/read/', views.chat_mark_read_api, name='chat_mark_read_api'),
+    path('chat/api/conversations/<int:conversation_id>/clear/', views.chat_clear_conversation_api, name='chat_clear_conversation_api'),
     path('chat/api/messages/<int:message_id>/delete/', views.chat_delete_message_api, name='chat_delete_message_api'),
+    path('chat/async/api/conversations/', async_views.chat_conversations_api, name='chat_conversations_async_api'),
+    path('chat/async/api/search/', async_views.chat_search_users_api, name='chat_search_users_async_api'),
+    path('chat/async/api/conversations/<int:conversation_id>/messages/', async_views.chat_messages_api, name='chat_messages_async_api'),
+    path('chat/async/api/conversations/<int:conversation_id>/messages/send/', async_views.chat_send_message_api, name='chat_send_message_async_api'),
 ]
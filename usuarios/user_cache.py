@@ -0,0 +1,105 @@
+"""Per-process cache of logged-in users, keyed by the session's `usuario_id`.
+
+Only a compact snapshot of each user is kept (see SNAPSHOT_FIELDS); cached lookups
+return a `Usuario` built from it with every other field deferred, so pages that only
+render name/handle/avatar skip the primary-key query entirely. Entries expire after
+`USUARIO_CACHE_TTL` seconds and are dropped explicitly by `Usuario.save()`/`delete()`.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Dict, Tuple
+
+from django.conf import settings
+
+SNAPSHOT_FIELDS = ('id', 'nome', 'foto', 'username', 'gm_permission_level')
+
+
+class UsuarioCache:
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._entries: Dict[int, Tuple[float, tuple]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, user_id):
+        """Return a snapshot `Usuario` for `user_id`, or None if it does not exist."""
+        from .models import Usuario
+
+        user_id, values = self._lookup(user_id)
+        if user_id is None:
+            return None
+        if values is None:
+            row = Usuario.objects.filter(pk=user_id).values_list(*SNAPSHOT_FIELDS).first()
+            values = self._remember(user_id, row)
+        return self._build(values)
+
+    async def aget(self, user_id):
+        """Async `get()` for ASGI views; a hit never leaves the event loop."""
+        from .models import Usuario
+
+        user_id, values = self._lookup(user_id)
+        if user_id is None:
+            return None
+        if values is None:
+            row = await Usuario.objects.filter(pk=user_id).values_list(*SNAPSHOT_FIELDS).afirst()
+            values = self._remember(user_id, row)
+        return self._build(values)
+
+    def _lookup(self, user_id):
+        try:
+            user_id = int(user_id)
+        except (TypeError, ValueError):
+            return None, None
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry and entry[0] > time.monotonic():
+                self.hits += 1
+                return user_id, entry[1]
+            self.misses += 1
+            return user_id, None
+
+    def _remember(self, user_id, values):
+        if values is not None:
+            with self._lock:
+                self._entries[user_id] = (time.monotonic() + self.ttl, values)
+        return values
+
+    @staticmethod
+    def _build(values):
+        from .models import Usuario
+
+        if values is None:
+            return None
+        # A fresh instance per call: callers may mutate and save it.
+        return Usuario.from_db('default', SNAPSHOT_FIELDS, values)
+
+    def invalidate(self, user_id):
+        if user_id is None:
+            return
+        with self._lock:
+            if self._entries.pop(int(user_id), None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'ttl_seconds': self.ttl,
+            }
+
+
+usuario_cache = UsuarioCache(ttl=getattr(settings, 'USUARIO_CACHE_TTL', 60))
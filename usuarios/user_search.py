@@ -0,0 +1,201 @@
+"""Typeahead search for users by @handle or name, for the chat's "new conversation" box.
+
+Matches come from indexed columns only: `username` and the accent-folded
+`Usuario.nome_busca`. Handle and name prefixes are answered by B-tree range
+scans (PostgreSQL uses the `pg_trgm` GIN indexes from migration 0023 instead).
+Matches on later words of the name ("silva" for "João Silva") are prefix scans
+over `UsuarioNameSuffix`, which stores `nome_busca` from each later word on, and
+are only looked up when the prefix tiers do not fill the page. Results are
+ranked exact handle, handle prefix, name prefix, word prefix, then alphabetically.
+
+Recent queries are kept in a per-process LRU (`USER_SEARCH_CACHE_SIZE` entries,
+`USER_SEARCH_CACHE_TTL` seconds), cleared whenever a name, handle or photo changes.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, Value, When
+
+from .utils import normalize_search_text, normalize_username
+
+# Fields whose change can alter a cached result.
+SEARCH_FIELDS = frozenset({'nome', 'nome_busca', 'username', 'foto'})
+
+
+def name_suffixes(nome_busca: str) -> Set[str]:
+    """Every tail of `nome_busca` that starts at its second or a later word."""
+    words = (nome_busca or '').split(' ')
+    return {' '.join(words[index:]) for index in range(1, len(words))}
+
+
+def _prefix(field: str, value: str) -> Q:
+    if connection.vendor == 'postgresql':
+        # Served by the trigram GIN index; a U+FFFF upper bound is not collation-safe there.
+        return Q(**{f'{field}__startswith': value})
+    return Q(**{f'{field}__gte': value, f'{field}__lt': value + '\uffff'})
+
+
+def _rank(handle: str, name: str) -> Case:
+    whens = []
+    if handle:
+        whens += [
+            When(username=handle, then=Value(0)),
+            When(_prefix('username', handle), then=Value(1)),
+        ]
+    if name:
+        whens.append(When(_prefix('nome_busca', name), then=Value(2)))
+    return Case(*whens, default=Value(3), output_field=IntegerField())
+
+
+_FIELDS = ('id', 'nome', 'username', 'foto')
+
+
+def _prefix_matches(handle: str, name: str):
+    """Handle/name prefix matches, best first, or None when there is nothing to look up."""
+    from .models import Usuario
+
+    indexed = Q()
+    if handle:
+        indexed |= _prefix('username', handle)
+    if name:
+        indexed |= _prefix('nome_busca', name)
+    if not indexed:
+        return None
+    return (Usuario.objects
+            .filter(indexed)
+            .annotate(search_rank=_rank(handle, name))
+            .order_by('search_rank', 'nome_busca', 'id')
+            .only(*_FIELDS))
+
+
+def _word_matches(name: str, found: List[Any]):
+    """Matches on a later word of the name, skipping the users already `found`."""
+    from .models import Usuario, UsuarioNameSuffix
+
+    suffixes = UsuarioNameSuffix.objects.filter(_prefix('suffix', name)).values('usuario_id')
+    return (Usuario.objects
+            .filter(pk__in=suffixes)
+            .exclude(pk__in=[user.pk for user in found])
+            .order_by('nome_busca', 'id')
+            .only(*_FIELDS))
+
+
+def find_users(handle: str, name: str, limit: int) -> List[Any]:
+    """Up to `limit` Usuarios matching the normalized `handle`/`name`, best first."""
+    queryset = _prefix_matches(handle, name)
+    if queryset is None:
+        return []
+    matches = list(queryset[:limit])
+    if name and len(matches) < limit:
+        matches += list(_word_matches(name, matches)[:limit - len(matches)])
+    return matches
+
+
+async def afind_users(handle: str, name: str, limit: int) -> List[Any]:
+    """Async `find_users()`."""
+    queryset = _prefix_matches(handle, name)
+    if queryset is None:
+        return []
+    matches = [user async for user in queryset[:limit]]
+    if name and len(matches) < limit:
+        matches += [user async for user in _word_matches(name, matches)[:limit - len(matches)]]
+    return matches
+
+
+class UserSearchCache:
+    def __init__(self, size: int, ttl: float):
+        self.size = size
+        self.ttl = ttl
+        self._entries: OrderedDict[Tuple[str, str], Tuple[float, list]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'max_entries': self.size,
+                'ttl_seconds': self.ttl,
+            }
+
+
+user_search_cache = UserSearchCache(
+    size=getattr(settings, 'USER_SEARCH_CACHE_SIZE', 512),
+    ttl=getattr(settings, 'USER_SEARCH_CACHE_TTL', 30),
+)
+
+
+def _search_key(term: str) -> Optional[Tuple[str, str]]:
+    raw = (term or '').strip()
+    handle = normalize_username(raw)
+    name = normalize_search_text(raw.lstrip('@'))
+    if not handle and not name:
+        return None
+    return handle, name
+
+
+def _serialize(users: List[Any]) -> List[Dict[str, Any]]:
+    from .chat_serializers import serialize_user
+
+    return [serialize_user(user) for user in users]
+
+
+def search_users(term: str, *, exclude_id: Optional[int] = None, limit: int = 8) -> List[Dict[str, Any]]:
+    """Serialized users for the chat search box, served from the LRU when possible."""
+    key = _search_key(term)
+    if key is None:
+        return []
+
+    results = user_search_cache.get(key)
+    if results is None:
+        # One spare row so excluding the caller still fills the page.
+        results = _serialize(find_users(*key, limit + 1))
+        user_search_cache.set(key, results)
+    return [item for item in results if item['id'] != exclude_id][:limit]
+
+
+async def asearch_users(term: str, *, exclude_id: Optional[int] = None, limit: int = 8) -> List[Dict[str, Any]]:
+    """Async `search_users()`; a cache hit never leaves the event loop."""
+    key = _search_key(term)
+    if key is None:
+        return []
+
+    results = user_search_cache.get(key)
+    if results is None:
+        results = _serialize(await afind_users(*key, limit + 1))
+        user_search_cache.set(key, results)
+    return [item for item in results if item['id'] != exclude_id][:limit]
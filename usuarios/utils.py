@@ -1,3 +1,5 @@
+import unicodedata
+
 from django.utils.text import slugify
 
 
@@ -8,3 +10,10 @@ def normalize_username(value: str) -> str:
         raw = raw[1:]
     slug = slugify(raw)
     return slug[:60]
+
+
+def normalize_search_text(value: str) -> str:
+    """Lowercase, accent-folded, single-spaced form of a name for indexed search."""
+    folded = unicodedata.normalize('NFKD', value or '')
+    folded = ''.join(char for char in folded if not unicodedata.combining(char))
+    return ' '.join(folded.lower().split())
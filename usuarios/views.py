@@ -1,13 +1,10 @@
-from collections import Counter
 from copy import deepcopy
 from decimal import Decimal, InvalidOperation
 import json
 from django.core.exceptions import MultipleObjectsReturned
 
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
-from django.db import IntegrityError
-from django.db.models import Q
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, Q, When
 from django.shortcuts import render, redirect
 from django.contrib import messages
 from django.http import JsonResponse
@@ -16,54 +13,79 @@ from django.views.decorators.http import require_POST, require_GET
 from django.utils import timezone
 from django.utils.timesince import timesince
 
+from .counters import unread_counters
+from .dispatch import broadcaster
+from .geo import parse_coordinates
+from .search import search_messages
+from .user_search import search_users, user_search_cache
+from .decorators import get_request_usuario, login_required_usuario
 from .forms import RegistrationForm, LoginForm, PostForm, CommentForm, EventoForm
 from .models import (
     Usuario,
     Post,
     Comment,
     Conversation,
+    ConversationMember,
     Message,
-    PostLikeEvent,
+    Notification,
     Evento,
     EmpresaProfile,
     EmpresaAnuncio,
 )
-from .utils import normalize_username
-from .chat_serializers import serialize_user, serialize_message, serialize_conversation
-
-
-def _get_logged_user(request):
-    uid = request.session.get('usuario_id')
-    if not uid:
-        return None
-    try:
-        return Usuario.objects.get(pk=uid)
-    except Usuario.DoesNotExist:
-        request.session.pop('usuario_id', None)
-        return None
+from .user_cache import usuario_cache
+from .utils import normalize_search_text, normalize_username
+from .chat_serializers import (
+    serialize_message,
+    serialize_conversation,
+    serialize_conversations,
+    serialize_message_payload,
+    serialize_conversation_payload,
+)
 
 
-def _json_auth_required(request):
-    user = _get_logged_user(request)
-    if not user:
-        return None, JsonResponse({'detail': 'Autenticação requerida'}, status=401)
-    return user, None
+def _broadcast_to_users(user_ids, event):
+    # Sent after the current transaction commits; see usuarios.dispatch.
+    broadcaster.broadcast(user_ids, event)
 
 
 def _broadcast_message_event(message):
-    channel_layer = get_channel_layer()
-    if not channel_layer:
-        return
-    async_to_sync(channel_layer.group_send)(
-        f'chat_{message.conversation_id}',
+    conversation_payload = serialize_conversation_payload(message.conversation)
+    _broadcast_to_users(
+        [participant['id'] for participant in conversation_payload['participants']],
         {
             'type': 'chat.message_event',
-            'message_id': message.id,
-            'conversation_id': message.conversation_id,
+            'message': serialize_message_payload(message),
+            'conversation': conversation_payload,
         }
     )
 
 
+def _broadcast_conversation_event(conversation):
+    conversation_payload = serialize_conversation_payload(conversation)
+    _broadcast_to_users(
+        [participant['id'] for participant in conversation_payload['participants']],
+        {
+            'type': 'chat.conversation_event',
+            'conversation': conversation_payload,
+        }
+    )
+
+
+MESSAGE_PAGE_SIZE = 50
+MESSAGE_PAGE_MAX = 200
+FEED_PAGE_SIZE = 20
+FEED_COMMENT_LIMIT = 3
+EVENT_PAGE_SIZE = 24
+FAVORITES_BATCH_MAX = 50
+NEARBY_RADIUS_KM = 10
+NEARBY_RADIUS_MAX_KM = 200
+NEARBY_PAGE_SIZE = 20
+NEARBY_PAGE_MAX = 50
+NOTIFICATION_PAGE_SIZE = 40
+SEARCH_PAGE_SIZE = 20
+SEARCH_PAGE_MAX = 50
+
+
 DEFAULT_EMPRESA_PROFILE = {
     'tipo': 'empresa',
     'nome_empresa': 'Esporte Total Academia',
@@ -274,62 +296,64 @@ def login_view(request):
 
 
 def logout_view(request):
-    usuario_nome = None
-    uid = request.session.get('usuario_id')
-    if uid:
-        try:
-            user = Usuario.objects.get(pk=uid)
-            usuario_nome = user.nome
-        except Usuario.DoesNotExist:
-            pass
-    
+    user = get_request_usuario(request)
+    usuario_nome = user.nome if user else None
+
     request.session.pop('usuario_id', None)
     if usuario_nome:
         messages.success(request, f'Até logo, {usuario_nome}! Você foi desconectado.', extra_tags='toast')
     return redirect('index')
 
 
-def dashboard(request):
-    uid = request.session.get('usuario_id')
-    if not uid:
-        return redirect('index')
+def _event_page(request, user):
+    """One page of `Evento.listing_for(user)` plus the context that links to the next one.
+
+    `?mode=archive` lists past events instead of upcoming ones; the cursor is
+    the last event id shown (`?after=`). A stale or bogus cursor falls back to
+    page one, as in the social feed.
+    """
+    archive = request.GET.get('mode') == 'archive'
+    eventos = Evento.listing_for(user, archive=archive)
     try:
-        user = Usuario.objects.get(pk=uid)
-    except Usuario.DoesNotExist:
-        request.session.pop('usuario_id', None)
-        return redirect('index')
+        after = _parse_cursor_param(request.GET.get('after'))
+    except ValueError:
+        after = None
+    if after:
+        keyset = Evento.keyset_after(after, archive=archive)
+        if keyset is not None:
+            eventos = eventos.filter(keyset)
+
+    eventos = list(eventos[:EVENT_PAGE_SIZE + 1])
+    has_more = len(eventos) > EVENT_PAGE_SIZE
+    eventos = eventos[:EVENT_PAGE_SIZE]
+    next_query = None
+    if has_more:
+        params = request.GET.copy()
+        params['after'] = eventos[-1].id
+        next_query = params.urlencode()
+    return {'eventos': eventos, 'archive': archive, 'next_query': next_query}
+
+
+@login_required_usuario
+def dashboard(request):
+    user = request.usuario
     if getattr(request.user_agent, 'is_mobile', False):
         return redirect('dashboard_mobile')
-    # Show events created by all users, most recent first
-    eventos = Evento.objects.all().order_by('-data', '-hora', '-criado_em')
-    return render(request, 'usuarios/dashboard.html', {'user': user, 'eventos': eventos})
+    return render(request, 'usuarios/dashboard.html', {'user': user, **_event_page(request, user)})
 
+@login_required_usuario
 def dashboard_mobile(request):
     """Render mobile version of the dashboard."""
-    uid = request.session.get('usuario_id')
-    if not uid:
-        return redirect('index')
-    try:
-        user = Usuario.objects.get(pk=uid)
-    except Usuario.DoesNotExist:
-        request.session.pop('usuario_id', None)
-        return redirect('index')
+    user = request.usuario
     if not getattr(request.user_agent, 'is_mobile', False):
         return redirect('dashboard')
-    # Show events created by all users, most recent first
-    eventos = Evento.objects.all().order_by('-data', '-hora', '-criado_em')
-    return render(request, 'usuarios/dashboard_mobile.html', {'user': user, 'eventos': eventos})
+    return render(request, 'usuarios/dashboard_mobile.html', {'user': user, **_event_page(request, user)})
+
 
+@login_required_usuario
 def social(request):
     """Render social network page."""
-    uid = request.session.get('usuario_id')
-    if not uid:
-        return redirect('index')
-    try:
-        user = Usuario.objects.get(pk=uid)
-    except Usuario.DoesNotExist:
-        request.session.pop('usuario_id', None)
-        return redirect('index')
+    user = request.usuario
     
     if request.method == 'POST':
         form = PostForm(request.POST, request.FILES)
@@ -342,36 +366,48 @@ def social(request):
     else:
         form = PostForm()
     
-    posts = Post.objects.all().order_by('-data_criacao')
+    posts = Post.feed_for(user, comment_limit=FEED_COMMENT_LIMIT)
+    # Keyset pagination on (data_criacao, id); a stale or bogus cursor falls back to page one.
+    try:
+        before = _parse_cursor_param(request.GET.get('before'))
+    except ValueError:
+        before = None
+    if before:
+        anchor = Post.objects.filter(pk=before).values_list('data_criacao', flat=True).first()
+        if anchor is not None:
+            posts = posts.filter(Q(data_criacao__lt=anchor) | Q(data_criacao=anchor, id__lt=before))
+
+    posts = list(posts[:FEED_PAGE_SIZE + 1])
+    has_more = len(posts) > FEED_PAGE_SIZE
+    posts = posts[:FEED_PAGE_SIZE]
+    for post in posts:
+        post.recent_comments.reverse()
+
     return render(request, 'usuarios/social.html', {
         'user': user,
         'form': form,
         'posts': posts,
+        'next_cursor': posts[-1].id if has_more else None,
         'comment_form': CommentForm()
     })
 
 
+@login_required_usuario
 def eventos_list(request):
     """Render events listing page."""
-    user = _get_logged_user(request)
-    if not user:
-        return redirect('index')
+    user = request.usuario
     
-    eventos = Evento.objects.all().order_by('-data', '-hora', '-criado_em')
-    return render(request, 'usuarios/eventos.html', {
-        'user': user,
-        'eventos': eventos,
-    })
+    return render(request, 'usuarios/eventos.html', {'user': user, **_event_page(request, user)})
 
 
+@login_required_usuario
 def evento_detail(request, evento_id):
     """Render event detail page."""
-    user = _get_logged_user(request)
-    if not user:
-        return redirect('index')
+    user = request.usuario
     
     try:
-        evento = Evento.objects.select_related('criador').get(pk=evento_id)
+        # Not listing_for(): past events keep their detail page.
+        evento = Evento.with_favorited(user).select_related('criador').get(pk=evento_id)
     except Evento.DoesNotExist:
         messages.error(request, 'Evento não encontrado.', extra_tags='toast')
         return redirect('eventos_list')
@@ -382,10 +418,9 @@ def evento_detail(request, evento_id):
     })
 
 
+@login_required_usuario
 def create_event(request):
-    user = _get_logged_user(request)
-    if not user:
-        return redirect('index')
+    user = request.usuario
 
     if request.method == 'POST':
         form = EventoForm(request.POST, request.FILES)
@@ -409,40 +444,44 @@ def create_event(request):
     })
 
 
+@login_required_usuario
 def my_events(request):
-    user = _get_logged_user(request)
-    if not user:
-        return redirect('index')
+    user = request.usuario
 
     search = request.GET.get('q', '').strip()
     status = request.GET.get('status', 'future')
+    if status not in ('future', 'past'):
+        status = 'all'
 
     now = timezone.localtime()
     future_filter = Q(data__gt=now.date()) | (Q(data=now.date()) & Q(hora__gte=now.time()))
     past_filter = Q(data__lt=now.date()) | (Q(data=now.date()) & Q(hora__lt=now.time()))
 
-    eventos_qs = user.eventos.all()
-    stats = {
-        'total': eventos_qs.count(),
-        'upcoming': eventos_qs.filter(future_filter).count(),
-        'past': eventos_qs.filter(past_filter).count(),
-    }
+    own = Evento.objects.filter(criador=user)
+    stats = own.aggregate(
+        total=Count('id'),
+        upcoming=Count('id', filter=future_filter),
+        past=Count('id', filter=past_filter),
+    )
 
+    eventos_qs = own.annotate(is_upcoming=Case(When(future_filter, then=True), default=False))
     if status == 'future':
         eventos_qs = eventos_qs.filter(future_filter)
     elif status == 'past':
         eventos_qs = eventos_qs.filter(past_filter)
-    else:
-        status = 'all'
-
     if search:
-        eventos_qs = eventos_qs.filter(
-            Q(titulo__icontains=search) |
-            Q(local__icontains=search)
-        )
-
-    eventos = eventos_qs.order_by('data', 'hora')
-    next_event = user.eventos.filter(future_filter).order_by('data', 'hora').first()
+        # Accent-folded `titulo local`; see Evento.busca and migration 0025.
+        eventos_qs = eventos_qs.filter(busca__contains=normalize_search_text(search))
+
+    eventos = list(eventos_qs.order_by('data', 'hora', 'id'))
+    # The list is ordered by date, so when it holds every upcoming event its first
+    # upcoming row is the next one; only filtered views need a lookup of their own.
+    next_event = None
+    if stats['upcoming']:
+        if status != 'past' and not search:
+            next_event = next((evento for evento in eventos if evento.is_upcoming), None)
+        else:
+            next_event = own.filter(future_filter).order_by('data', 'hora', 'id').first()
 
     return render(request, 'usuarios/my_events.html', {
         'user': user,
@@ -454,19 +493,19 @@ def my_events(request):
     })
 
 
+@login_required_usuario
 def notifications(request):
-    user = _get_logged_user(request)
-    if not user:
-        return redirect('index')
+    user = request.usuario
 
     if request.method == 'POST':
         action = request.POST.get('action')
         if action == 'clear':
             request.session['notifications_cleared_at'] = timezone.now().timestamp()
+            Notification.objects.filter(recipient=user, is_read=False).update(is_read=True)
+            unread_counters.notifications_read(user.id)
             messages.info(request, 'Seu feed foi limpo. Novas interações aparecerão automaticamente.', extra_tags='toast')
             return redirect('notifications')
 
-    notifications = []
     now = timezone.now()
     type_filter = (request.GET.get('type') or 'all').lower()
     search_query = request.GET.get('q', '').strip()
@@ -479,128 +518,83 @@ def notifications(request):
         except (TypeError, ValueError, OverflowError):
             cleared_at = None
 
-    conversation_ids = list(user.chat_conversations.values_list('id', flat=True))
-    if conversation_ids:
-        message_events = (
-            Message.objects
-            .filter(conversation_id__in=conversation_ids)
-            .exclude(autor=user)
-            .exclude(deleted_for=user)
-            .exclude(deleted_for_everyone=True)
-            .select_related('autor', 'conversation')
-            .order_by('-created_at')[:20]
-        )
-        chat_url = reverse('chat')
-        for message in message_events:
-            preview = message.texto.strip() if message.texto else ''
-            notifications.append({
-                'type': 'message',
-                'icon': 'forum',
-                'title': f'{message.autor.nome} respondeu no chat',
-                'description': preview[:160] if preview else 'Você tem uma nova resposta na conversa.',
-                'timestamp': message.created_at,
-                'cta_url': chat_url,
-                'cta_label': 'Abrir chat'
-            })
-
-    comment_events = (
-        Comment.objects
-        .filter(post__autor=user)
-        .exclude(autor=user)
-        .select_related('autor', 'post')
-        .order_by('-data_criacao')[:20]
-    )
-    social_url = reverse('social')
-    for comment in comment_events:
-        post_excerpt = (comment.post.texto or '').strip()
-        notifications.append({
-            'type': 'comment',
-            'icon': 'chat_bubble',
-            'title': f'{comment.autor.nome} comentou no seu post',
-            'description': comment.texto.strip()[:200] if comment.texto else 'Novo comentário no seu post.',
-            'timestamp': comment.data_criacao,
-            'post_excerpt': post_excerpt[:120] if post_excerpt else None,
-            'cta_url': social_url,
-            'cta_label': 'Ver na timeline'
-        })
-
-    like_events = (
-        PostLikeEvent.objects
-        .filter(post__autor=user)
-        .exclude(usuario=user)
-        .select_related('usuario', 'post')
-        .order_by('-created_at')[:20]
-    )
-    for event in like_events:
-        post_excerpt = (event.post.texto or '').strip()
-        notifications.append({
-            'type': 'like',
-            'icon': 'favorite',
-            'title': f'{event.usuario.nome} curtiu seu post',
-            'description': post_excerpt[:200] if post_excerpt else 'Seu post recebeu um novo like.',
-            'timestamp': event.created_at,
-            'post_excerpt': post_excerpt[:120] if post_excerpt else None,
-            'cta_url': social_url,
-            'cta_label': 'Ver na timeline'
-        })
-
-    notifications.sort(key=lambda item: item['timestamp'] or now, reverse=True)
-    notifications = notifications[:60]
-
+    inbox = Notification.objects.filter(recipient=user)
     if cleared_at:
-        notifications = [item for item in notifications if (item.get('timestamp') or now) > cleared_at]
+        inbox = inbox.filter(created_at__gt=cleared_at)
 
-    type_counts = Counter(item['type'] for item in notifications)
-    stats = {
-        'total': len(notifications),
-        'message': type_counts.get('message', 0),
-        'comment': type_counts.get('comment', 0),
-        'like': type_counts.get('like', 0),
-    }
+    stats = inbox.aggregate(
+        total=Count('id'),
+        message=Count('id', filter=Q(type=Notification.MESSAGE)),
+        comment=Count('id', filter=Q(type=Notification.COMMENT)),
+        like=Count('id', filter=Q(type=Notification.LIKE)),
+    )
 
     if type_filter not in {'message', 'comment', 'like', 'all'}:
         type_filter = 'all'
-
-    filtered_notifications = notifications
     if type_filter != 'all':
-        filtered_notifications = [item for item in filtered_notifications if item['type'] == type_filter]
+        inbox = inbox.filter(type=type_filter)
 
     if search_query:
-        lowered = search_query.lower()
-
-        def matches(item):
-            for field in ('title', 'description', 'post_excerpt'):
-                value = item.get(field)
-                if value and lowered in value.lower():
-                    return True
-            return False
-
-        filtered_notifications = [item for item in filtered_notifications if matches(item)]
-
-    filtered_notifications = filtered_notifications[:40]
+        inbox = inbox.filter(
+            Q(actor__nome__icontains=search_query) |
+            Q(description__icontains=search_query) |
+            Q(post_excerpt__icontains=search_query)
+        )
 
-    for item in filtered_notifications:
-        ts = item.get('timestamp') or now
-        delta = timesince(ts, now)
-        item['relative_time'] = f'{delta} atrás' if delta else 'agora mesmo'
+    try:
+        before = _parse_cursor_param(request.GET.get('before'))
+    except ValueError:
+        before = None
+    if before:
+        anchor = Notification.objects.filter(pk=before, recipient=user).values_list('created_at', flat=True).first()
+        if anchor is not None:
+            inbox = inbox.filter(Q(created_at__lt=anchor) | Q(created_at=anchor, id__lt=before))
+
+    page = list(inbox.select_related('actor').order_by('-created_at', '-id')[:NOTIFICATION_PAGE_SIZE + 1])
+    has_more = len(page) > NOTIFICATION_PAGE_SIZE
+    page = page[:NOTIFICATION_PAGE_SIZE]
+
+    for item in page:
+        delta = timesince(item.created_at, now)
+        item.relative_time = f'{delta} atrás' if delta else 'agora mesmo'
+
+    next_query = None
+    if has_more:
+        params = request.GET.copy()
+        params['before'] = page[-1].id
+        next_query = params.urlencode()
 
     return render(request, 'usuarios/notifications.html', {
         'user': user,
-        'notifications': filtered_notifications,
+        'notifications': page,
         'stats': stats,
         'filter_type': type_filter,
         'search_query': search_query,
         'has_filters': bool(search_query) or type_filter != 'all',
+        'next_query': next_query,
         'last_synced': timezone.localtime(now),
         'cleared_at': timezone.localtime(cleared_at) if cleared_at else None,
     })
 
 
+@require_GET
+@login_required_usuario(json=True)
+def monitoring_stats_api(request):
+    """Per-process counters for monitoring; restricted to GM level 2+."""
+    user = request.usuario
+    if (user.gm_permission_level or 0) < 2:
+        return JsonResponse({'detail': 'Acesso restrito.'}, status=403)
+    return JsonResponse({
+        'usuario_cache': usuario_cache.stats(),
+        'user_search_cache': user_search_cache.stats(),
+        'broadcast': broadcaster.stats(),
+    })
+
+
+@login_required_usuario
 def chat(request):
     """Render chat interface."""
-    user = _get_logged_user(request)
-    if not user:
-        return redirect('index')
+    user = request.usuario
 
     return render(request, 'usuarios/chat.html', {
         'user': user,
@@ -608,54 +602,50 @@ def chat(request):
 
 
 @require_GET
+@login_required_usuario(json=True)
 def chat_conversations_api(request):
-    user, error = _json_auth_required(request)
-    if error:
-        return error
-
-    conversations = (Conversation.objects
-                     .filter(participants=user)
-                     .prefetch_related('participants', 'messages__autor', 'messages__deleted_by'))
-    data = [serialize_conversation(conv, user) for conv in conversations]
+    user = request.usuario
+
+    data = serialize_conversations(Conversation.inbox_for(user), user)
     return JsonResponse({'conversations': data})
 
 
 @require_GET
+@login_required_usuario(json=True)
 def chat_search_users_api(request):
-    user, error = _json_auth_required(request)
-    if error:
-        return error
-
     term = request.GET.get('q', '').strip()
-    if not term:
-        return JsonResponse({'results': []})
-
-    search_name = term.lstrip('@') if term.startswith('@') else term
-    normalized_handle = normalize_username(term)
+    return JsonResponse({'results': search_users(term, exclude_id=request.usuario.id)})
 
-    filters = Q()
-    if search_name:
-        filters |= Q(nome__icontains=search_name)
-    if normalized_handle:
-        filters |= Q(username__icontains=normalized_handle)
 
-    if not filters:
-        return JsonResponse({'results': []})
-
-    matches = (Usuario.objects
-               .exclude(pk=user.pk)
-               .filter(filters)
-               .order_by('nome')[:8])
-
-    results = [serialize_user(match) for match in matches]
-    return JsonResponse({'results': results})
+@require_GET
+@login_required_usuario(json=True)
+def chat_search_messages_api(request):
+    """Ranked full-text search over the caller's messages (`?q=&conversation=&offset=&limit=`)."""
+    term = request.GET.get('q', '').strip()
+    try:
+        conversation_id = _parse_cursor_param(request.GET.get('conversation'))
+        offset = int(request.GET.get('offset') or 0)
+        limit = _parse_cursor_param(request.GET.get('limit')) or SEARCH_PAGE_SIZE
+        if offset < 0:
+            raise ValueError(offset)
+    except ValueError:
+        return JsonResponse({'detail': 'Parâmetros de busca inválidos.'}, status=400)
+    if len(term) < 2:
+        return JsonResponse({'results': [], 'next_offset': None})
+
+    page = search_messages(
+        request.usuario, term,
+        conversation_id=conversation_id,
+        limit=min(limit, SEARCH_PAGE_MAX),
+        offset=offset,
+    )
+    return JsonResponse(page)
 
 
 @require_POST
+@login_required_usuario(json=True)
 def chat_start_conversation_api(request):
-    user, error = _json_auth_required(request)
-    if error:
-        return error
+    user = request.usuario
 
     try:
         payload = json.loads(request.body.decode('utf-8')) if request.body else {}
@@ -676,60 +666,150 @@ def chat_start_conversation_api(request):
         return JsonResponse({'detail': 'Você não pode iniciar uma conversa consigo mesmo.'}, status=400)
 
     conversation = Conversation.get_or_create_private(user, partner)
+    _broadcast_conversation_event(conversation)
     data = serialize_conversation(conversation, user)
     return JsonResponse({'conversation': data}, status=201)
 
 
+def _parse_cursor_param(value):
+    """Return a positive int from a query param, None when absent; raise ValueError otherwise."""
+    if value in (None, ''):
+        return None
+    number = int(value)
+    if number < 1:
+        raise ValueError(value)
+    return number
+
+
+def _parse_message_window(params):
+    """`(before, after, limit)` from the query string; ValueError carries the client-facing detail."""
+    try:
+        before = _parse_cursor_param(params.get('before'))
+        after = _parse_cursor_param(params.get('after'))
+        limit = _parse_cursor_param(params.get('limit')) or MESSAGE_PAGE_SIZE
+    except ValueError:
+        raise ValueError('Parâmetros de paginação inválidos.')
+    if before and after:
+        raise ValueError('Use apenas before ou after.')
+    return before, after, min(limit, MESSAGE_PAGE_MAX)
+
+
+def _message_anchor(conversation_id, anchor_id):
+    return (Message.objects
+            .filter(pk=anchor_id, conversation_id=conversation_id)
+            .values_list('created_at', flat=True))
+
+
+def _message_window(member, before, after, anchor_created_at, limit):
+    """Unevaluated queryset of up to `limit + 1` rows, in fetch order; see `_message_window_payload`."""
+    queryset = (Message.objects
+                .visible_to(member)
+                .select_related('autor', 'deleted_by'))
+    if after:
+        return queryset.filter(
+            Q(created_at__gt=anchor_created_at) |
+            Q(created_at=anchor_created_at, id__gt=after)
+        ).order_by('created_at', 'id')[:limit + 1]
+    if before:
+        queryset = queryset.filter(
+            Q(created_at__lt=anchor_created_at) |
+            Q(created_at=anchor_created_at, id__lt=before)
+        )
+    return queryset.order_by('-created_at', '-id')[:limit + 1]
+
+
+def _message_window_payload(window, limit, after, user):
+    has_more = len(window) > limit
+    window = window[:limit]
+    if not after:
+        window.reverse()
+    return {
+        'messages': [serialize_message(message, user) for message in window],
+        'has_more': has_more,
+        # `prev_cursor` feeds `before` (older page), `next_cursor` feeds `after` (polling).
+        'prev_cursor': window[0].id if window and has_more and not after else None,
+        'next_cursor': window[-1].id if window else after,
+    }
+
+
 @require_GET
+@login_required_usuario(json=True)
 def chat_messages_api(request, conversation_id):
-    user, error = _json_auth_required(request)
-    if error:
-        return error
+    """Return a window of messages using keyset pagination on (created_at, id).
 
-    try:
-        conversation = Conversation.objects.prefetch_related('messages__autor', 'participants').get(pk=conversation_id, participants=user)
-    except Conversation.DoesNotExist:
+    `?before=<id>` loads the page older than that message, `?after=<id>` loads
+    only the messages newer than it (used by the client to poll for deltas) and
+    no cursor returns the latest page. `limit` caps the window size.
+    """
+    user = request.usuario
+
+    member = ConversationMember.objects.filter(conversation_id=conversation_id, usuario=user).first()
+    if member is None:
         return JsonResponse({'detail': 'Conversa não encontrada.'}, status=404)
 
-    queryset = (conversation.messages
-                .select_related('autor', 'deleted_by')
-                .exclude(deleted_for=user))
-    messages = [serialize_message(message, user) for message in queryset]
-    return JsonResponse({'messages': messages})
+    try:
+        before, after, limit = _parse_message_window(request.GET)
+    except ValueError as exc:
+        return JsonResponse({'detail': str(exc)}, status=400)
 
+    anchor_created_at = None
+    if before or after:
+        anchor_created_at = _message_anchor(conversation_id, before or after).first()
+        if anchor_created_at is None:
+            return JsonResponse({'detail': 'Cursor inválido.'}, status=400)
 
-@require_POST
-def chat_send_message_api(request, conversation_id):
-    user, error = _json_auth_required(request)
-    if error:
-        return error
+    window = list(_message_window(member, before, after, anchor_created_at, limit))
+    return JsonResponse(_message_window_payload(window, limit, after, user))
 
-    try:
-        conversation = Conversation.objects.get(pk=conversation_id, participants=user)
-    except Conversation.DoesNotExist:
-        return JsonResponse({'detail': 'Conversa não encontrada.'}, status=404)
 
+def _parse_message_text(request):
+    """The trimmed `text` of a send request; ValueError carries the client-facing detail."""
     try:
         payload = json.loads(request.body.decode('utf-8')) if request.body else {}
     except json.JSONDecodeError:
-        return JsonResponse({'detail': 'JSON inválido.'}, status=400)
+        raise ValueError('JSON inválido.')
 
     text = (payload.get('text') or '').strip()
     if not text:
-        return JsonResponse({'detail': 'A mensagem não pode estar vazia.'}, status=400)
+        raise ValueError('A mensagem não pode estar vazia.')
+    return text
+
+
+def _store_message(conversation, user, text, recipient_ids):
+    """Insert the message and everything that follows from it in one transaction."""
+    with transaction.atomic():
+        message = Message.objects.create(conversation=conversation, autor=user, texto=text)
+        conversation.record_message(message)
+        Notification.for_message(message, recipient_ids)
+        unread_counters.message_received(recipient_ids, conversation.id)
+        _broadcast_message_event(message)
+    return message
 
-    message = Message.objects.create(conversation=conversation, autor=user, texto=text)
-    conversation.touch()
-    _broadcast_message_event(message)
 
+@require_POST
+@login_required_usuario(json=True)
+def chat_send_message_api(request, conversation_id):
+    user = request.usuario
+
+    try:
+        conversation = Conversation.objects.get(pk=conversation_id, participants=user)
+    except Conversation.DoesNotExist:
+        return JsonResponse({'detail': 'Conversa não encontrada.'}, status=404)
+
+    try:
+        text = _parse_message_text(request)
+    except ValueError as exc:
+        return JsonResponse({'detail': str(exc)}, status=400)
+
+    recipient_ids = [pk for pk in conversation.participants.values_list('id', flat=True) if pk != user.id]
+    message = _store_message(conversation, user, text, recipient_ids)
     return JsonResponse({'message': serialize_message(message, user)}, status=201)
 
 
 @require_POST
+@login_required_usuario(json=True)
 def chat_delete_message_api(request, message_id):
-    user, error = _json_auth_required(request)
-    if error:
-        return error
+    user = request.usuario
 
     try:
         message = (Message.objects
@@ -757,77 +837,197 @@ def chat_delete_message_api(request, message_id):
         message.deleted_for_everyone = True
         message.deleted_for_everyone_at = timezone.now()
         message.deleted_by = user
-        message.save(update_fields=['deleted_for_everyone', 'deleted_for_everyone_at', 'deleted_by'])
-        message.conversation.touch()
+        conversation = message.conversation
+        with transaction.atomic():
+            message.save(update_fields=['deleted_for_everyone', 'deleted_for_everyone_at', 'deleted_by'])
+            Notification.objects.filter(message=message).delete()
+            unread_counters.invalidate(p.id for p in conversation.participants.all())
+            conversation.touch()
+        if conversation.last_message_id == message.id:
+            # Keep the pointer's cached row in sync so the preview shows the deletion label.
+            conversation.last_message = message
         _broadcast_message_event(message)
         return JsonResponse({
             'scope': 'all',
             'message': serialize_message(message, user),
-            'conversation': serialize_conversation(message.conversation, user)
+            'conversation': serialize_conversation(conversation, user)
         })
 
     # Delete for self (default)
-    message.deleted_for.add(user)
-    conversation = message.conversation
+    member = ConversationMember.objects.get(conversation_id=message.conversation_id, usuario=user)
+    if member.hide(message):
+        Notification.objects.filter(message=message, recipient=user).delete()
+        unread_counters.invalidate([user.id])
+    conversation_data = serialize_conversation(message.conversation, user)
+    # Let the user's other tabs/devices drop the message too.
+    _broadcast_to_users([user.id], {
+        'type': 'chat.message_hidden_event',
+        'message_id': message.id,
+        'conversation': conversation_data,
+    })
     return JsonResponse({
         'scope': 'self',
         'message_id': message.id,
-        'conversation': serialize_conversation(conversation, user)
+        'conversation': conversation_data
     })
 
 
-def like_post(request, post_id):
-    uid = request.session.get('usuario_id')
-    if not uid or request.method != 'POST':
-        return redirect('social')
+@require_POST
+@login_required_usuario(json=True)
+def chat_mark_read_api(request, conversation_id):
+    """Mark the partner's messages up to `up_to` (default: all) as read and send a receipt.
+
+    Messages are flipped with one UPDATE served by the partial unread index; the
+    chat notifications for them follow, and every participant's socket gets a
+    `read` event when anything changed.
+    """
+    user = request.usuario
+    row = (Conversation.objects
+           .filter(pk=conversation_id, participants=user)
+           .values_list('id', 'last_message_id')
+           .first())
+    if row is None:
+        return JsonResponse({'detail': 'Conversa não encontrada.'}, status=404)
+
     try:
-        user = Usuario.objects.get(pk=uid)
-        post = Post.objects.get(pk=post_id)
-    except (Usuario.DoesNotExist, Post.DoesNotExist):
-        return redirect('social')
+        is_json = request.content_type == 'application/json' and request.body
+        payload = json.loads(request.body.decode('utf-8')) if is_json else {}
+        up_to = _parse_cursor_param(payload.get('up_to'))
+    except (json.JSONDecodeError, ValueError, TypeError):
+        return JsonResponse({'detail': 'Parâmetro up_to inválido.'}, status=400)
+
+    unread = Message.objects.filter(conversation_id=conversation_id, is_read=False).exclude(autor=user)
+    notifications = Notification.objects.filter(
+        recipient=user, type=Notification.MESSAGE, is_read=False, message__conversation_id=conversation_id,
+    )
+    if up_to:
+        unread = unread.filter(id__lte=up_to)
+        notifications = notifications.filter(message_id__lte=up_to)
+
+    with transaction.atomic():
+        marked = unread.update(is_read=True)
+        notifications_read = notifications.update(is_read=True)
+        if up_to and (row[1] is None or up_to < row[1]):
+            unread_counters.invalidate([user.id])  # a partial read: recount on the next badge fetch
+        else:
+            unread_counters.conversation_read(user.id, conversation_id, notifications_read)
+
+    receipt_up_to = up_to or row[1]
+    if marked:
+        participant_ids = Conversation.participants.through.objects.filter(
+            conversation_id=conversation_id,
+        ).values_list('usuario_id', flat=True)
+        _broadcast_to_users(list(participant_ids), {
+            'type': 'chat.read_event',
+            'conversation_id': conversation_id,
+            'reader_id': user.id,
+            'up_to': receipt_up_to,
+        })
+    return JsonResponse({'conversation_id': conversation_id, 'marked': marked, 'up_to': receipt_up_to})
 
-    if user in post.likes.all():
-        post.likes.remove(user)
-    else:
-        post.likes.add(user)
-        PostLikeEvent.objects.update_or_create(
-            post=post,
-            usuario=user,
-            defaults={'created_at': timezone.now()}
-        )
+
+@require_POST
+@login_required_usuario(json=True)
+def chat_clear_conversation_api(request, conversation_id):
+    """Hide the whole current history of a conversation for the logged-in user only.
+
+    Clearing just moves the member's watermark to the last message, so it costs
+    the same for ten messages or ten thousand.
+    """
+    user = request.usuario
+    member = (ConversationMember.objects
+              .select_related('conversation')
+              .filter(conversation_id=conversation_id, usuario=user)
+              .first())
+    if member is None:
+        return JsonResponse({'detail': 'Conversa não encontrada.'}, status=404)
+
+    conversation = member.conversation
+    if conversation.last_message_id:
+        with transaction.atomic():
+            member.clear(conversation.last_message_id)
+            Notification.objects.filter(
+                recipient=user, message__conversation_id=conversation_id,
+                message_id__lte=conversation.last_message_id,
+            ).delete()
+            unread_counters.invalidate([user.id])
+
+    conversation_data = serialize_conversation(conversation, user)
+    _broadcast_to_users([user.id], {
+        'type': 'chat.conversation_cleared_event',
+        'conversation': conversation_data,
+    })
+    return JsonResponse({'conversation': conversation_data, 'cleared_up_to': member.cleared_up_to})
+
+
+@require_GET
+@login_required_usuario(json=True)
+def unread_counters_api(request):
+    """Unread badges for the logged-in user, served from the counter cache."""
+    counters = unread_counters.get(request.usuario.id)
+    return JsonResponse({
+        'messages': counters['messages'],
+        'messages_total': sum(counters['messages'].values()),
+        'notifications': counters['notifications'],
+    })
+
+
+@require_POST
+@login_required_usuario(json=True)
+def notifications_mark_read_api(request):
+    user = request.usuario
+    marked = Notification.objects.filter(recipient=user, is_read=False).update(is_read=True)
+    unread_counters.notifications_read(user.id)
+    return JsonResponse({'marked': marked})
+
+
+@login_required_usuario
+def like_post(request, post_id):
+    """Form fallback for the like button; the feed uses `like_post_api` when JS is on."""
+    if request.method != 'POST':
+        return redirect('social')
+    post = Post.objects.filter(pk=post_id).only('id').first()
+    if post:
+        post.toggle_like(request.usuario)
     return redirect('social')
 
 
+@require_POST
+@login_required_usuario(json=True)
+def like_post_api(request, post_id):
+    post = Post.objects.filter(pk=post_id).only('id').first()
+    if post is None:
+        return JsonResponse({'detail': 'Post não encontrado.'}, status=404)
+    liked, like_count = post.toggle_like(request.usuario)
+    return JsonResponse({'post_id': post.id, 'liked': liked, 'like_count': like_count})
+
+
+@login_required_usuario
 def comment_post(request, post_id):
-    uid = request.session.get('usuario_id')
-    if not uid or request.method != 'POST':
+    user = request.usuario
+    if request.method != 'POST':
         return redirect('social')
     try:
-        user = Usuario.objects.get(pk=uid)
         post = Post.objects.get(pk=post_id)
-    except (Usuario.DoesNotExist, Post.DoesNotExist):
+    except Post.DoesNotExist:
         return redirect('social')
 
     form = CommentForm(request.POST)
     if form.is_valid():
         texto = form.cleaned_data['texto'].strip()
         if texto:
-            Comment.objects.create(post=post, autor=user, texto=texto)
+            with transaction.atomic():
+                comment = Comment.objects.create(post=post, autor=user, texto=texto)
+                Post.objects.filter(pk=post.pk).update(comment_count=F('comment_count') + 1)
+                Notification.for_comment(comment, post)
     return redirect('social')
 
 
 @require_POST
+@login_required_usuario
 def delete_post(request, post_id):
     """Allow the post author to delete their own post."""
-    uid = request.session.get('usuario_id')
-    if not uid:
-        return redirect('index')
-
-    try:
-        user = Usuario.objects.get(pk=uid)
-    except Usuario.DoesNotExist:
-        request.session.pop('usuario_id', None)
-        return redirect('index')
+    user = request.usuario
 
     try:
         post = Post.objects.get(pk=post_id)
@@ -844,15 +1044,16 @@ def delete_post(request, post_id):
     return redirect('social')
 
 
+# Everything the profile page renders or edits; skips senha/telefone.
+PERFIL_FIELDS = (
+    'nome', 'username', 'email', 'localizacao', 'latitude', 'longitude', 'modalidades', 'bio', 'foto',
+    'gm_permission_level',
+)
+
+
+@login_required_usuario(fields=PERFIL_FIELDS)
 def perfil(request):
-    uid = request.session.get('usuario_id')
-    if not uid:
-        return redirect('index')
-    try:
-        user = Usuario.objects.get(pk=uid)
-    except Usuario.DoesNotExist:
-        request.session.pop('usuario_id', None)
-        return redirect('index')
+    user = request.usuario
 
     if request.method == 'POST':
         has_error = False
@@ -883,6 +1084,13 @@ def perfil(request):
         if email:
             user.email = email
         user.localizacao = localizacao or ''
+        try:
+            user.latitude, user.longitude = parse_coordinates(
+                request.POST.get('latitude', '').strip(), request.POST.get('longitude', '').strip()
+            ) or (None, None)
+        except ValueError:
+            messages.error(request, 'Informe latitude e longitude válidas, ou deixe ambas em branco.', extra_tags='toast')
+            has_error = True
         user.modalidades = modalidades or ''
         user.bio = bio or ''
         if foto:
@@ -907,31 +1115,86 @@ def perfil(request):
 
 
 @require_POST
+@login_required_usuario(json=True)
 def toggle_favorite_event(request, evento_id):
     """Toggle favorite for an event via AJAX POST. Returns JSON with new state."""
-    user = _get_logged_user(request)
-    if not user:
-        return JsonResponse({'detail': 'Autenticação requerida'}, status=401)
+    evento = Evento.objects.filter(pk=evento_id).only('id').first()
+    if evento is None:
+        return JsonResponse({'detail': 'Evento não encontrado.'}, status=404)
+    favorited, favorite_count = evento.toggle_favorite(request.usuario)
+    return JsonResponse({'favorited': favorited, 'favorite_count': favorite_count})
+
 
+@require_POST
+@login_required_usuario(json=True)
+def event_favorites_api(request):
+    """Apply a batch of favorite states: `{"favorites": {"<evento_id>": true|false, ...}}`.
+
+    The dashboards coalesce rapid clicks into the final state per event and send
+    them here in one request; setting a state (not flipping it) makes retries safe.
+    """
     try:
-        evento = Evento.objects.get(pk=evento_id)
-    except Evento.DoesNotExist:
-        return JsonResponse({'detail': 'Evento não encontrado.'}, status=404)
+        payload = json.loads(request.body.decode('utf-8')) if request.body else {}
+        states = {int(evento_id): bool(state) for evento_id, state in (payload.get('favorites') or {}).items()}
+    except (json.JSONDecodeError, AttributeError, TypeError, ValueError):
+        return JsonResponse({'detail': 'JSON inválido.'}, status=400)
+    if not states or len(states) > FAVORITES_BATCH_MAX:
+        return JsonResponse({'detail': f'Envie de 1 a {FAVORITES_BATCH_MAX} eventos.'}, status=400)
+
+    applied = Evento.set_favorites(request.usuario, states)
+    return JsonResponse({'favorites': {
+        str(evento_id): {'favorited': favorited, 'favorite_count': favorite_count}
+        for evento_id, (favorited, favorite_count) in applied.items()
+    }})
 
-    if user in evento.favorited_by.all():
-        evento.favorited_by.remove(user)
-        favorited = False
-    else:
-        evento.favorited_by.add(user)
-        favorited = True
 
-    return JsonResponse({'favorited': favorited})
+@require_GET
+@login_required_usuario(json=True)
+def nearby_events_api(request):
+    """Upcoming events near `?lat=&lng=` (default: the profile's coordinates), nearest first.
 
+    `radius` is in km (default 10, at most 200) and `limit` caps the results.
+    """
+    user = request.usuario
+    try:
+        origin = parse_coordinates(request.GET.get('lat'), request.GET.get('lng'))
+        radius = float(request.GET.get('radius') or NEARBY_RADIUS_KM)
+        limit = _parse_cursor_param(request.GET.get('limit')) or NEARBY_PAGE_SIZE
+        if not 0 < radius <= NEARBY_RADIUS_MAX_KM:
+            raise ValueError(radius)
+    except ValueError:
+        return JsonResponse({'detail': 'Parâmetros de localização inválidos.'}, status=400)
+    if origin is None:
+        origin = Usuario.objects.filter(pk=user.pk).values_list('latitude', 'longitude').first()
+        if not origin or None in origin:
+            return JsonResponse({'detail': 'Informe lat e lng ou cadastre sua localização no perfil.'}, status=400)
+
+    eventos = Evento.nearby_for(user, *origin, radius)[:min(limit, NEARBY_PAGE_MAX)]
+    return JsonResponse({
+        'origin': {'lat': origin[0], 'lng': origin[1]},
+        'radius_km': radius,
+        'results': [
+            {
+                'id': evento.id,
+                'titulo': evento.titulo,
+                'local': evento.local,
+                'data': evento.data.isoformat(),
+                'hora': evento.hora.strftime('%H:%M'),
+                'lat': evento.latitude,
+                'lng': evento.longitude,
+                'distance_km': round(evento.distance_km, 2),
+                'is_favorited': evento.is_favorited,
+                'favorite_count': evento.favorite_count,
+                'url': reverse('evento_detail', args=[evento.id]),
+            }
+            for evento in eventos
+        ],
+    })
 
+
+@login_required_usuario
 def empresa_cadastro_tipo(request):
-    user = _get_logged_user(request)
-    if not user:
-        return redirect('index')
+    user = request.usuario
     profile = _get_empresa_profile_obj(user)
 
     if request.method == 'POST':
@@ -948,10 +1211,13 @@ def empresa_cadastro_tipo(request):
     })
 
 
+# Contact details copied from the account into the empresa/profissional profile.
+EMPRESA_CONTACT_FIELDS = ('nome', 'username', 'email', 'telefone', 'localizacao', 'foto', 'gm_permission_level')
+
+
+@login_required_usuario(fields=EMPRESA_CONTACT_FIELDS)
 def empresa_cadastro_empresa(request):
-    user = _get_logged_user(request)
-    if not user:
-        return redirect('index')
+    user = request.usuario
     profile = _get_empresa_profile_obj(user)
     form_data = deepcopy(DEFAULT_EMPRESA_PROFILE)
 
@@ -1035,10 +1301,9 @@ def empresa_cadastro_empresa(request):
     })
 
 
+@login_required_usuario(fields=EMPRESA_CONTACT_FIELDS)
 def empresa_cadastro_profissional(request):
-    user = _get_logged_user(request)
-    if not user:
-        return redirect('index')
+    user = request.usuario
     profile = _get_empresa_profile_obj(user)
     empty_defaults = {
         'esportes': '',
@@ -1100,10 +1365,9 @@ def empresa_cadastro_profissional(request):
     })
 
 
+@login_required_usuario
 def empresa_painel(request):
-    user = _get_logged_user(request)
-    if not user:
-        return redirect('index')
+    user = request.usuario
     profile = _get_empresa_profile_obj(user)
     if profile:
         anuncios_qs = profile.anuncios.all()
@@ -1128,10 +1392,9 @@ def empresa_painel(request):
     })
 
 
+@login_required_usuario
 def empresa_anunciar(request):
-    user = _get_logged_user(request)
-    if not user:
-        return redirect('index')
+    user = request.usuario
 
     profile = _get_empresa_profile_obj(user)
     if not profile:
@@ -1170,10 +1433,9 @@ def empresa_anunciar(request):
     })
 
 
+@login_required_usuario
 def empresa_meus_anuncios(request):
-    user = _get_logged_user(request)
-    if not user:
-        return redirect('index')
+    user = request.usuario
     profile = _get_empresa_profile_obj(user)
     if not profile:
         messages.warning(request, 'Complete o cadastro da empresa para visualizar anúncios.', extra_tags='toast')
@@ -1191,10 +1453,9 @@ def empresa_meus_anuncios(request):
     })
 
 
+@login_required_usuario
 def empresa_buscar_profissionais(request):
-    user = _get_logged_user(request)
-    if not user:
-        return redirect('index')
+    user = request.usuario
 
     query = (request.GET.get('q') or '').strip().lower()
     esporte = (request.GET.get('esporte') or '').strip().lower()
@@ -1238,10 +1499,9 @@ def empresa_buscar_profissionais(request):
     })
 
 
+@login_required_usuario
 def empresa_profissional_detail(request, prof_id):
-    user = _get_logged_user(request)
-    if not user:
-        return redirect('index')
+    user = request.usuario
 
     profissional = _get_professional_by_id(prof_id)
     if not profissional: